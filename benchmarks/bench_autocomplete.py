@@ -0,0 +1,70 @@
+"""Benchmark for the title completions behind Tab at the prompts (features/autocomplete.py).
+
+Builds a PrefixTrie over --titles synthetic titles plus their English aliases
+(the same generator as bench_title_index.py), then times complete() for
+prefixes of 1 to 10 characters against the 16 ms budget of one frame at
+60 Hz, and times incremental add() of new titles.
+
+Usage:
+    python benchmarks/bench_autocomplete.py [--titles 100000] [--queries 300]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_title_index import make_titles, percentile, timed  # noqa: E402
+
+FRAME_MS = 16.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--titles", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=300)
+    opts = parser.parse_args()
+
+    from features.autocomplete import PrefixTrie
+
+    titles = make_titles(opts.titles)
+    names = [name for pair in titles for name in pair]
+    start = time.perf_counter()
+    trie = PrefixTrie(names)
+    build = time.perf_counter() - start
+    # Memory comes from a second, traced build: tracing slows the build down.
+    tracemalloc.start()
+    traced_trie = PrefixTrie(names)
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del traced_trie
+    print(f"{opts.titles} titles (+ English aliases), {len(trie)} names in {build:.2f}s, "
+          f"{memory / 1e6:.1f} MB")
+
+    rng = random.Random(5)
+    print(f"{'prefix':<8}{'p50 ms':>9}{'p95 ms':>9}{'max ms':>9}{'results':>9}")
+    worst = 0.0
+    for length in range(1, 11):
+        samples, found = [], 0
+        for _ in range(opts.queries):
+            name = rng.choice(names)
+            found += len(timed(samples, trie.complete, name[:length]))
+        worst = max(worst, max(samples))
+        print(f"{length:<8}{percentile(samples, 50):>9.3f}{percentile(samples, 95):>9.3f}{max(samples):>9.3f}"
+              f"{found / opts.queries:>9.1f}")
+
+    samples = []
+    for title, _ in make_titles(opts.queries, seed=99):
+        timed(samples, trie.add, title + " Zero")
+    print(f"add(): p50 {percentile(samples, 50):.3f} ms, p95 {percentile(samples, 95):.3f} ms")
+    print(f"slowest completion {worst:.2f} ms: {'within' if worst < FRAME_MS else 'OVER'} one {FRAME_MS:.0f} ms frame")
+
+
+if __name__ == "__main__":
+    main()
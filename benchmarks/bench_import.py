@@ -0,0 +1,184 @@
+"""Benchmark for bulk list imports (python main.py --import).
+
+Generates a MyAnimeList XML export (plain and gzipped) and an AniList JSON
+export with --entries entries each, in a scratch directory whose watchlist
+already holds some of those titles, and imports each one into a fresh store.
+Each import runs in its own process, which reports the wall time, how much
+its peak RSS grew during the import and how many entries were added.
+
+With --baseline the same XML is also imported the naive way, parsing the
+whole tree and adding titles one transaction at a time, for comparison.
+
+Usage:
+    python benchmarks/bench_import.py [--entries 50000] [--existing 2000] [--baseline]
+"""
+
+import argparse
+import gzip
+import json
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+MAL_ENTRY = """  <anime>
+    <series_animedb_id>{id}</series_animedb_id>
+    <series_title><![CDATA[{title}]]></series_title>
+    <series_type>TV</series_type>
+    <series_episodes>{episodes}</series_episodes>
+    <my_id>0</my_id>
+    <my_watched_episodes>{watched}</my_watched_episodes>
+    <my_start_date>0000-00-00</my_start_date>
+    <my_finish_date>0000-00-00</my_finish_date>
+    <my_score>{score}</my_score>
+    <my_status>{status}</my_status>
+    <my_comments><![CDATA[]]></my_comments>
+    <my_times_watched>0</my_times_watched>
+    <my_tags><![CDATA[]]></my_tags>
+    <update_on_import>1</update_on_import>
+  </anime>
+"""
+STATUSES = ["Watching", "Completed", "On-Hold", "Dropped", "Plan to Watch"]
+
+
+def title_of(i):
+    # Every 50th entry repeats an earlier title, as exports of merged lists do.
+    return f"Imported Show {i - 1 if i % 50 == 0 and i else i}"
+
+
+def write_mal_xml(path, count, opener=open):
+    with opener(path, "wt", encoding="utf-8") as f:
+        f.write('<?xml version="1.0" encoding="UTF-8" ?>\n<myanimelist>\n')
+        f.write("  <myinfo>\n    <user_export_type>1</user_export_type>\n  </myinfo>\n")
+        for i in range(count):
+            f.write(MAL_ENTRY.format(id=i + 1, title=title_of(i), episodes=12 + i % 13, watched=i % 12,
+                                     score=i % 10, status=STATUSES[i % len(STATUSES)]))
+        f.write("</myanimelist>\n")
+
+
+def write_anilist_json(path, count):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write('{"data": {"MediaListCollection": {"lists": [')
+        per_list = count // len(STATUSES) + 1
+        for n, status in enumerate(STATUSES):
+            f.write(("," if n else "") + f'{{"name": "{status}", "entries": [')
+            indexes = range(n * per_list, min(count, (n + 1) * per_list))
+            f.write(",".join(json.dumps({
+                "status": status.upper(),
+                "progress": i % 12,
+                "media": {
+                    "id": i + 1,
+                    "type": "ANIME",
+                    "title": {"romaji": title_of(i), "english": None},
+                    "genres": ["Action", "Drama"],
+                    "episodes": 12 + i % 13,
+                    "format": "TV",
+                    "coverImage": {"large": f"https://img.example/{i + 1}.jpg"},
+                },
+            }) for i in indexes))
+            f.write("]}")
+        f.write("]}}}")
+
+
+def naive_import(path):
+    """Loads the whole tree, then adds each title in its own transaction."""
+    from lxml import etree
+    from features import storage
+
+    added = 0
+    for elem in etree.parse(path).getroot().iter("anime"):
+        added += storage.add_entry("watchlist", elem.findtext("series_title"),
+                                   {"episodes_watched": int(elem.findtext("my_watched_episodes") or 0)})
+    return {"watchlist": (None, added)}
+
+
+def reset_store(workdir, existing):
+    """Starts a fresh store whose watchlist holds `existing` titles overlapping the exports."""
+    from features import storage
+
+    if storage._conn is not None:
+        storage._conn.close()
+        storage._conn = None
+    for name in os.listdir(workdir):
+        if name.startswith("anime.db"):
+            os.remove(os.path.join(workdir, name))
+    storage.add_entries("watchlist", [{"title": title_of(i * 7)} for i in range(existing)])
+
+
+def _current_rss():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+def _run_import(workdir, path, existing, naive, results):
+    os.chdir(workdir)
+    from features.list_import import import_lists
+
+    reset_store(workdir, existing)
+    before = _current_rss()
+    start = time.perf_counter()
+    counts = (naive_import if naive else import_lists)(path)
+    elapsed = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    results.put((elapsed, max(0, peak - before), sum(added for _, added in counts.values())))
+
+
+def measure(workdir, label, path, existing, naive=False):
+    """Imports path in a fresh process; returns its time and peak memory growth (RSS).
+
+    RSS rather than tracemalloc, since most of lxml's memory is allocated in C.
+    """
+    ctx = multiprocessing.get_context("spawn")
+    results = ctx.Queue()
+    proc = ctx.Process(target=_run_import, args=(workdir, path, existing, naive, results))
+    proc.start()
+    elapsed, peak, added = results.get()
+    proc.join()
+    return label, os.path.getsize(path), elapsed, peak, added
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--entries", type=int, default=50000)
+    parser.add_argument("--existing", type=int, default=2000,
+                        help="titles already on the watchlist (overlapping the export)")
+    parser.add_argument("--baseline", action="store_true", help="also time a whole-tree, per-title import")
+    opts = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        xml_path = os.path.join(workdir, "animelist.xml")
+        gz_path = os.path.join(workdir, "animelist.xml.gz")
+        json_path = os.path.join(workdir, "anilist.json")
+        write_mal_xml(xml_path, opts.entries)
+        write_mal_xml(gz_path, opts.entries, opener=gzip.open)
+        write_anilist_json(json_path, opts.entries)
+
+        rows = [
+            measure(workdir, "MAL XML (streamed)", xml_path, opts.existing),
+            measure(workdir, "MAL XML .gz (streamed)", gz_path, opts.existing),
+            measure(workdir, "AniList JSON (streamed)", json_path, opts.existing),
+        ]
+        if opts.baseline:
+            rows.append(measure(workdir, "MAL XML (whole tree, per-title)", xml_path, opts.existing, naive=True))
+
+    unique = len({title_of(i) for i in range(opts.entries)})
+    already = len({title_of(i * 7) for i in range(opts.existing)} & {title_of(i) for i in range(opts.entries)})
+    print(f"{opts.entries} entries per export ({unique} unique titles, {already} already on the watchlist)")
+    print(f"{'export':<34}{'size':>10}{'time':>10}{'entries/s':>12}{'peak RSS +':>12}{'added':>8}")
+    for label, size, elapsed, peak, added in rows:
+        print(f"{label:<34}{size / 1e6:>8.1f}MB{elapsed:>9.2f}s{opts.entries / elapsed:>12,.0f}"
+              f"{peak / 1e6:>10.1f}MB{added:>8}")
+    expected = unique - already
+    if any(added != expected for *_, added in rows):
+        print(f"FAIL: expected {expected} new entries per import")
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Side-by-side benchmark of the title search backends (ANIME_SEARCH_BACKEND).
+
+Runs the same anime and manga queries through the MyAnimeList scraper and the
+AniList GraphQL backend against the local stand-ins from offline_bench.py: a
+MAL results page of real size (~200 KB of HTML) and an AniList endpoint that
+returns only the fields a query asks for. Both stand-ins answer after the same
+--latency-ms, so the difference is transfer and parsing. The cache is bypassed;
+every query goes to the server.
+
+Reports p50/p95 latency, response bytes per query and results per query.
+
+Usage:
+    python benchmarks/bench_search_backends.py [--iterations 5] [--latency-ms 50]
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+from http.server import ThreadingHTTPServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from offline_bench import FakeServices, SEARCH_TITLES, make_handler, percentile  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=5)
+    parser.add_argument("--latency-ms", type=float, default=50, help="server delay for both backends")
+    opts = parser.parse_args()
+
+    services = FakeServices(opts.latency_ms, opts.latency_ms, 0, rate_limit=10 ** 6, rate_window=60.0)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(services))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    os.environ["ANILIST_URL"] = f"{base_url}/graphql"
+    import mal.config
+    mal.config.MAL_ENDPOINT = f"{base_url}/"
+    from features.search_backend import BACKENDS
+
+    rows = []
+    try:
+        for media_type in ("ANIME", "MANGA"):
+            for name, backend in BACKENDS.items():
+                server_name = "mal" if name == "mal" else "anilist"
+                backend.search(SEARCH_TITLES[0], media_type)  # warm up imports and the connection pool
+                before = services.bytes_sent[server_name]
+                samples, results = [], 0
+                for _ in range(opts.iterations):
+                    for query in SEARCH_TITLES:
+                        start = time.perf_counter()
+                        results += len(backend.search(query, media_type))
+                        samples.append((time.perf_counter() - start) * 1000)
+                sent = services.bytes_sent[server_name] - before
+                rows.append((media_type.lower(), name, samples, sent / len(samples), results / len(samples)))
+    finally:
+        server.shutdown()
+
+    print(f"{len(SEARCH_TITLES)} queries x {opts.iterations} iterations, {opts.latency_ms:g} ms server delay")
+    print(f"{'type':<7}{'backend':<9}{'p50 ms':>9}{'p95 ms':>9}{'KB/query':>10}{'results':>9}")
+    for media_type, name, samples, per_query, results in rows:
+        print(f"{media_type:<7}{name:<9}{percentile(samples, 50):>9.1f}{percentile(samples, 95):>9.1f}"
+              f"{per_query / 1024:>10.1f}{results:>9.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""Benchmark for the similarity-based recommendation engine.
+
+Stores a synthetic catalog shaped like the local AniList catalog and a
+200-title watchlist (half known by AniList id, half only by title) in a
+temporary directory, then times the full recommend_anime_results() path:
+reading the watchlist and liked genres, the profile, excluding watched titles
+and the ranking. The first call, which also loads the catalog and builds its
+vectors, is reported separately, as is rank_catalog() on its own. Exits with
+status 1 if the median of the later calls goes over the budget (50 ms for
+20k titles by default) or a watched title is recommended.
+
+Usage:
+    python benchmarks/bench_similarity.py [--titles 20000] [--runs 50] [--max-ms 50]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+GENRES = [
+    "Action", "Adventure", "Comedy", "Drama", "Ecchi", "Fantasy", "Horror", "Mahou Shoujo",
+    "Mecha", "Music", "Mystery", "Psychological", "Romance", "Sci-Fi", "Slice of Life",
+    "Sports", "Supernatural", "Thriller",
+]
+TAGS = [f"Tag {i}" for i in range(300)]
+
+
+def synthetic_catalog(size, seed=0):
+    rng = random.Random(seed)
+    return [
+        {
+            "id": i,
+            "title": {"romaji": f"Title {i}", "english": None},
+            "genres": rng.sample(GENRES, rng.randint(1, 4)),
+            "tags": [{"name": tag} for tag in rng.sample(TAGS, rng.randint(0, 12))],
+            "popularity": rng.randint(0, 500000),
+            "averageScore": rng.randint(30, 95),
+        }
+        for i in range(size)
+    ]
+
+
+def timed_runs(runs, func, *args, **kwargs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return result, statistics.median(timings), timings[int(len(timings) * 0.95) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--titles", type=int, default=20000)
+    parser.add_argument("--runs", type=int, default=50)
+    parser.add_argument("--max-ms", type=float, default=50.0)
+    opts = parser.parse_args()
+
+    catalog = synthetic_catalog(opts.titles)
+    rng = random.Random(1)
+    watched = rng.sample(catalog, 200)
+    watchlist = [
+        {"title": media["title"]["romaji"], "anilist_id": media["id"] if i % 2 else None, "genres": media["genres"]}
+        for i, media in enumerate(watched)
+    ]
+
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        try:
+            from features import catalog_index, rcm_system, storage
+
+            conn = catalog_index._connect()
+            with conn:
+                catalog_index._store_page(conn, catalog)
+            conn.close()
+            storage.add_entries("watchlist", watchlist)
+            storage.add_genres(["Romance", "Slice of Life"])
+
+            start = time.perf_counter()
+            rcm_system.recommend_anime_results()
+            first_ms = (time.perf_counter() - start) * 1000
+            results, median, p95 = timed_runs(opts.runs, rcm_system.recommend_anime_results)
+
+            vectors = rcm_system.get_catalog_vectors()
+            profile = rcm_system.build_user_profile(vectors, ["Romance", "Slice of Life"],
+                                                    [media["genres"] for media in watched])
+            exclude_ids = {media["id"] for media in watched}
+            _, rank_median, rank_p95 = timed_runs(opts.runs, rcm_system.rank_catalog, vectors, profile, k=10,
+                                                  exclude_ids=exclude_ids)
+        finally:
+            os.chdir(ROOT)
+
+    print(f"catalog: {opts.titles} titles x {vectors['matrix'].shape[1]} terms, watchlist: {len(watchlist)} titles")
+    print(f"first call (loads the catalog, builds the vectors): {first_ms:.1f} ms")
+    print(f"recommend_anime_results: median {median:.2f} ms, p95 {p95:.2f} ms over {opts.runs} runs")
+    print(f"  of which rank_catalog: median {rank_median:.2f} ms, p95 {rank_p95:.2f} ms")
+    failed = False
+    if {result["id"] for result in results} & exclude_ids:
+        print("FAIL: a watched title was recommended")
+        failed = True
+    if median > opts.max_ms:
+        print(f"FAIL: over budget ({opts.max_ms:.0f} ms)")
+        failed = True
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
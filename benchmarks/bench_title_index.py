@@ -0,0 +1,120 @@
+"""Benchmark for the local fuzzy title index (features/title_index.py).
+
+Remembers --titles synthetic titles, each with an English alias, in a
+scratch titles.db, then times ranked lookups for exact titles, titles with a
+typo and partial titles, and reports how often the intended title ranked
+first. Also times near_duplicates() against a watchlist of --watchlist
+entries.
+
+Usage:
+    python benchmarks/bench_title_index.py [--titles 50000] [--queries 500] [--watchlist 10000]
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SYLLABLES = ("ka ki ku ke ko sa shi su se so ta chi tsu te to na ni nu ne no ha hi fu he ho ma mi mu me mo "
+             "ya yu yo ra ri ru re ro wa ga gi gu ge go za ji zu ze zo ba bi bu be bo pa pi pu pe po "
+             "kyo sho ryu n").split()
+PARTICLES = ("no", "wa", "to", "ga", "ni", "de", "mo")
+ENGLISH = ("attack titan journey end academy demon slayer sorcery fullmetal alchemist reincarnated magical girl "
+           "love war place further universe promised land volleyball basketball saga legend story tale the of "
+           "my hero blue lock spy family chainsaw man dungeon apothecary diaries stone punch psycho hunter "
+           "abyss violet golden kamuy rock school life world sword art online dragon maid").split()
+
+
+def make_titles(count, seed=7):
+    """Returns (romaji-like title, English alias) pairs; ~2k romaji words give realistic trigram spread."""
+    rng = random.Random(seed)
+    vocabulary = sorted({"".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))) for _ in range(2500)})
+    titles = {}
+    while len(titles) < count:
+        words = [rng.choice(vocabulary).title() for _ in range(rng.randint(1, 4))]
+        if len(words) > 1 and rng.random() < 0.5:
+            words.insert(rng.randint(1, len(words) - 1), rng.choice(PARTICLES))
+        title = " ".join(words)
+        if rng.random() < 0.2:
+            title += f" Season {rng.randint(2, 4)}"
+        titles[title] = " ".join(rng.choice(ENGLISH).title() for _ in range(rng.randint(2, 4)))
+    return list(titles.items())
+
+
+def typo(title, rng):
+    i = rng.randrange(1, len(title) - 1)
+    return title[:i] + title[i + 1:] if rng.random() < 0.5 else title[:i] + title[i + 1] + title[i] + title[i + 2:]
+
+
+def timed(samples, func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    samples.append((time.perf_counter() - start) * 1000)
+    return result
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--titles", type=int, default=50000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--watchlist", type=int, default=10000)
+    opts = parser.parse_args()
+
+    titles = make_titles(opts.titles)
+    rng = random.Random(11)
+    picks = [rng.choice(titles)[0] for _ in range(opts.queries)]
+    cases = {
+        "exact": picks,
+        "typo": [typo(title, rng) for title in picks],
+        "partial": [" ".join(title.split()[:max(2, len(title.split()) - 1)]) for title in picks],
+    }
+
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        from features import storage, title_index
+        from features.title_index import fold_title
+
+        start = time.perf_counter()
+        for i in range(0, len(titles), 1000):
+            title_index.remember([{"title": title, "aliases": [english]} for title, english in titles[i:i + 1000]])
+        build = time.perf_counter() - start
+        print(f"{opts.titles} titles (+ English aliases) remembered in {build:.2f}s "
+              f"({build / opts.titles * 1e6:.0f} us per title), titles.db {os.path.getsize('titles.db') / 1e6:.0f} MB")
+        print(f"{'lookup':<10}{'p50 ms':>9}{'p95 ms':>9}{'max ms':>9}{'top-1':>8}")
+        for label, queries in cases.items():
+            samples, correct = [], 0
+            for query, wanted in zip(queries, picks):
+                hits = timed(samples, title_index.lookup, query)
+                # Several titles can fold to the same words; any of them counts.
+                correct += bool(hits) and fold_title(hits[0][1]) == fold_title(wanted)
+            print(f"{label:<10}{percentile(samples, 50):>9.2f}{percentile(samples, 95):>9.2f}{max(samples):>9.2f}"
+                  f"{correct / len(queries):>8.0%}")
+
+        start = time.perf_counter()
+        storage.add_entries("watchlist", [{"title": title} for title, _ in titles[:opts.watchlist]])
+        stored = time.perf_counter() - start
+        samples = []
+        flagged = 0
+        for title, _ in titles[opts.watchlist:opts.watchlist + opts.queries]:
+            flagged += bool(timed(samples, title_index.near_duplicates, "watchlist", title))
+        typos = sum(bool(title_index.near_duplicates("watchlist", typo(title, rng)))
+                    for title, _ in titles[:opts.queries])
+        os.chdir(ROOT)
+    print(f"near_duplicates on a {opts.watchlist}-entry watchlist (stored in {stored:.2f}s): "
+          f"p50 {percentile(samples, 50):.2f} ms, p95 {percentile(samples, 95):.2f} ms, max {max(samples):.2f} ms")
+    print(f"  flagged {typos / opts.queries:.0%} of typo'd titles already on the list, "
+          f"{flagged / opts.queries:.0%} of new titles")
+
+
+if __name__ == "__main__":
+    main()
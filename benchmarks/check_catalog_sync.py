@@ -0,0 +1,148 @@
+"""Check for the paginated catalog crawl and the incremental refresh (features/catalog_index.py).
+
+Serves a catalog of --size media from the AniList stand-in in offline_bench.py,
+runs a first sync_catalog() over it and compares the local catalog with the
+served one. Then it changes some media upstream (new genres and tags, a
+removed genre, new titles), runs an incremental sync and checks that only the
+changed media were fetched, the catalog matches again and postings of removed
+genres are gone. A last sync with nothing new must stop after one page.
+
+Usage:
+    python benchmarks/check_catalog_sync.py [--size 230] [--per-page 25]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import threading
+from http.server import ThreadingHTTPServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from offline_bench import FakeServices, _fake_media, make_handler  # noqa: E402
+
+GENRES = ("Action", "Comedy", "Drama", "Fantasy", "Romance", "Sci-Fi", "Slice of Life", "Mystery")
+BASE_TIME = 1700000000
+
+
+def make_media(media_id, updated_at):
+    media = _fake_media(media_id, f"Catalog Show {media_id}")
+    return {
+        "id": media_id,
+        "title": {"romaji": media["title"]["romaji"], "english": None if media_id % 3 else f"Show {media_id}"},
+        "genres": [GENRES[media_id % len(GENRES)], GENRES[(media_id // 3) % len(GENRES)]],
+        "tags": [{"name": f"Tag {media_id % 5}"}],
+        "popularity": media["popularity"],
+        "averageScore": media["averageScore"],
+        "updatedAt": updated_at,
+    }
+
+
+def expected_records(catalog):
+    return {
+        media["id"]: {
+            "title": media["title"],
+            "genres": media["genres"],
+            "tags": [tag["name"] for tag in media["tags"]],
+            "popularity": media["popularity"],
+            "averageScore": media["averageScore"],
+        }
+        for media in catalog.values()
+    }
+
+
+def local_records():
+    from features.catalog_index import catalog_media
+    return {
+        media["id"]: {key: media[key] for key in ("title", "genres", "tags", "popularity", "averageScore")}
+        for media in catalog_media()
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=230)
+    parser.add_argument("--per-page", type=int, default=25)
+    opts = parser.parse_args()
+
+    services = FakeServices(0, 0, 0, rate_limit=10000, rate_window=60)
+    services.catalog = {i: make_media(i, BASE_TIME + (i * 7919) % opts.size) for i in range(1, opts.size + 1)}
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(services))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    os.environ["ANILIST_URL"] = f"http://127.0.0.1:{server.server_address[1]}/graphql"
+
+    failures = []
+
+    def check(label, condition, detail=""):
+        print(f"{'ok  ' if condition else 'FAIL'} {label}{f': {detail}' if detail else ''}")
+        if not condition:
+            failures.append(label)
+
+    def requests_during(func, *args, **kwargs):
+        before = services.snapshot()["anilist"]
+        result = func(*args, **kwargs)
+        return result, services.snapshot()["anilist"] - before
+
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        try:
+            from features.catalog_index import query_catalog, sync_catalog
+
+            pages = -(-opts.size // opts.per_page)
+            stored, requests = requests_during(sync_catalog, per_page=opts.per_page)
+            check("first sync stores every media", stored == opts.size, f"{stored} of {opts.size}")
+            check("first sync crawls every page once", requests == pages, f"{requests} requests, {pages} pages")
+            check("catalog matches upstream after the first sync",
+                  local_records() == expected_records(services.catalog))
+
+            # Upstream changes: the newest updates come first in the crawl.
+            changed = [3, opts.size // 2, opts.size]
+            newest = BASE_TIME + opts.size
+            for offset, media_id in enumerate(changed):
+                media = services.catalog[media_id]
+                media["genres"] = ["Horror"]
+                media["tags"] = [{"name": "Time Skip"}]
+                media["popularity"] += 1
+                media["updatedAt"] = newest + offset
+            added = [opts.size + 1, opts.size + 2]
+            for offset, media_id in enumerate(added):
+                services.catalog[media_id] = make_media(media_id, newest + len(changed) + offset)
+
+            stored, requests = requests_during(sync_catalog, per_page=opts.per_page)
+            check("incremental sync fetches only changed and new media", stored == len(changed) + len(added),
+                  f"{stored} stored")
+            check("incremental sync stops after the first page", requests == 1, f"{requests} requests")
+            check("catalog matches upstream after the incremental sync",
+                  local_records() == expected_records(services.catalog))
+            horror = {media["id"] for media in query_catalog(["Horror"], max_results=None)}
+            check("postings follow the new genres", horror == set(changed), f"Horror -> {sorted(horror)}")
+            check("postings of removed genres are gone",
+                  not any(media["id"] in changed
+                          for media in query_catalog(list(GENRES), max_results=None)))
+            check("tag postings follow the new tags",
+                  {media["id"] for media in query_catalog(["tag:Time Skip"], max_results=None)} == set(changed))
+
+            stored, requests = requests_during(sync_catalog, per_page=opts.per_page)
+            check("sync with nothing new stores nothing after one page", (stored, requests) == (0, 1),
+                  f"{stored} stored, {requests} requests")
+
+            stored, requests = requests_during(sync_catalog, full=True, per_page=opts.per_page)
+            pages = -(-len(services.catalog) // opts.per_page)
+            check("--full sync crawls everything again", (stored, requests) == (len(services.catalog), pages),
+                  f"{stored} stored, {requests} requests")
+        finally:
+            os.chdir(ROOT)
+            server.shutdown()
+
+    if failures:
+        print(f"FAIL: {len(failures)} check(s) failed")
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,500 @@
+"""Offline end-to-end benchmarks against local stand-ins for AniList, MAL and Gemini.
+
+One local HTTP server plays all three services:
+
+- POST /graphql answers AniList's Page.media (title searches only get the
+  fields they ask for), aliased Media batches and single Media lookups with
+  deterministic fake titles, after a configurable delay and with
+  X-RateLimit-* headers (429 + Retry-After once the window is used up);
+- GET /anime.php and /manga.php serve a MyAnimeList search results page in the
+  markup the mal scraper parses (mal.config.MAL_ENDPOINT points here);
+- POST /v1beta/models/... is a scripted Gemini: "add A, B" becomes one
+  add_to_watchlist_func call per title, "list", "search X" and "recommend"
+  call the matching tools, function responses get a short text reply.
+
+Scenarios run in a scratch directory with a cold metadata cache:
+
+- search: search_anime_results() for a set of titles, then the same titles
+  misspelled, which the local title index should resolve to the cached
+  searches without a request;
+- recommend: recommend_anime_results() with a large watchlist, cold and then
+  again once the entries carry their stored metadata;
+- bulk_add: add_to_watchlist_func() for many titles, timed per add;
+- chat: a scripted multi-turn chat_with_bot() session with tool calls, timed
+  from submitting each message until the next prompt.
+
+Each scenario reports p50/p95/mean latency and the requests each backend saw
+per iteration. Use --out to save the results as JSON and --compare to print
+the change against a file saved from another commit.
+
+Usage:
+    python benchmarks/offline_bench.py [--iterations 5] [--out results.json]
+        [--compare baseline.json] [--scenarios search,recommend,bulk_add,chat]
+"""
+
+import argparse
+import builtins
+import contextlib
+import hashlib
+import io
+import json
+import math
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+GENRES = ["Action", "Adventure", "Comedy", "Drama", "Fantasy", "Mystery", "Romance", "Sci-Fi", "Slice of Life", "Sports"]
+SEARCH_TITLES = ["Frieren", "Monster", "Mushishi", "Cowboy Bebop", "Haikyu", "Steins Gate", "Bocchi", "Vinland Saga"]
+CHAT_SCRIPT = [
+    "Hi! I like slow fantasy shows.",
+    "add Frieren, Mushishi",
+    "search Monster",
+    "list my watchlist",
+    "recommend me something",
+    "thanks!",
+]
+
+
+def _digest(text):
+    return int(hashlib.sha1(text.lower().encode("utf-8")).hexdigest()[:8], 16)
+
+
+def _genres_for(text):
+    h = _digest(text)
+    return [GENRES[h % len(GENRES)], GENRES[(h // 7) % len(GENRES)]]
+
+
+def _fake_media(media_id, title):
+    return {
+        "id": media_id,
+        "idMal": media_id,
+        "title": {"romaji": title, "english": title},
+        "genres": _genres_for(title),
+        "tags": [{"name": "Fake Tag"}],
+        "episodes": 12 + media_id % 13,
+        "format": "TV",
+        "coverImage": {"large": f"https://example.invalid/{media_id}.jpg"},
+        "popularity": 100000 - media_id,
+        "averageScore": 60 + media_id % 35,
+        "updatedAt": 1700000000 + media_id,
+    }
+
+
+def _mal_page(kind, query, count=10):
+    rows = []
+    for i in range(count):
+        mal_id = 1000 + _digest(query) % 5000 + i
+        title = f"{query.title()} {i + 1}" if i else query.title()
+        rows.append(
+            f'<tr><td><a href="https://myanimelist.net/{kind}/{mal_id}/x">'
+            f'<img data-src="https://cdn.myanimelist.net/r/50x70/images/{kind}/1/{mal_id}.jpg"></a></td>'
+            f'<td><a><strong>{title}</strong></a><div class="pt4">A fake synopsis.read more.</div></td>'
+            f'<td>TV</td><td>{12 + i}</td><td>{7 + (i % 3) / 2:.2f}</td></tr>'
+        )
+    # Pad to roughly the size of a real results page (~200 KB of markup).
+    padding = "<!-- " + "x" * 190000 + " -->"
+    return (f"<html><body>{padding}<div class=\"js-block-list\"><table><tr><td>header</td></tr>"
+            f"{''.join(rows)}</table></div></body></html>").encode("utf-8")
+
+
+class FakeServices:
+    """State shared by the stand-in servers: delays, rate limit and request counts."""
+
+    def __init__(self, anilist_ms, mal_ms, gemini_ms, rate_limit, rate_window):
+        self.delay = {"anilist": anilist_ms / 1000, "mal": mal_ms / 1000, "gemini": gemini_ms / 1000}
+        self.rate_limit = rate_limit
+        self.rate_window = rate_window
+        self.counts = {"anilist": 0, "mal": 0, "gemini": 0, "anilist_429": 0}
+        self.bytes_sent = {"anilist": 0, "mal": 0, "gemini": 0}
+        # {media id: media}; when set, catalog crawls (sort: UPDATED_AT_DESC)
+        # page through it newest-update-first instead of generated titles.
+        self.catalog = None
+        self._window = []
+        self._lock = threading.Lock()
+
+    def count(self, backend):
+        with self._lock:
+            self.counts[backend] += 1
+
+    def add_bytes(self, backend, count):
+        with self._lock:
+            self.bytes_sent[backend] += count
+
+    def take_anilist_slot(self):
+        """Returns (allowed, remaining, retry_after) for one AniList request."""
+        now = time.time()
+        with self._lock:
+            self._window = [t for t in self._window if t > now - self.rate_window]
+            if len(self._window) >= self.rate_limit:
+                self.counts["anilist_429"] += 1
+                return False, 0, max(1, math.ceil(self._window[0] + self.rate_window - now))
+            self._window.append(now)
+            return True, self.rate_limit - len(self._window), 0
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.counts)
+
+
+def _catalog_page(catalog, page, per_page):
+    ordered = sorted(catalog.values(), key=lambda media: (-media["updatedAt"], media["id"]))
+    start = (page - 1) * per_page
+    return {"data": {"Page": {"pageInfo": {"hasNextPage": start + per_page < len(ordered)},
+                              "media": ordered[start:start + per_page]}}}
+
+
+def _anilist_response(query, variables, catalog=None):
+    if "Page(" in query and "UPDATED_AT_DESC" in query and catalog is not None:
+        return _catalog_page(catalog, variables.get("page", 1), variables.get("perPage", 25))
+    if "Page(" in query and variables.get("search"):
+        # Title search: the same titles _mal_page() lists, projected to the requested fields.
+        search = variables["search"]
+        media = []
+        for i in range(variables.get("perPage", 25)):
+            item = _fake_media(1000 + _digest(search) % 5000 + i, f"{search.title()} {i + 1}" if i else search.title())
+            if variables.get("type") == "MANGA":
+                item["format"] = "MANGA"
+            item["siteUrl"] = f"https://anilist.co/{variables.get('type', 'ANIME').lower()}/{item['id']}"
+            media.append({key: item[key] for key in re.findall(r"\w+", query.split("media(")[1].split("{", 1)[1])
+                          if key in item})
+        return {"data": {"Page": {"media": media}}}
+    if "Page(" in query:
+        page = variables.get("page", 1)
+        per_page = variables.get("perPage", 25)
+        label = ",".join(variables.get("genres") or []) or "catalog"
+        start = (page - 1) * per_page
+        media = [_fake_media(start + i + 1, f"{label} Show {start + i + 1}") for i in range(per_page)]
+        return {"data": {"Page": {"pageInfo": {"hasNextPage": page < 20}, "media": media}}}
+    aliases = re.findall(r"(m\d+)\s*:\s*Media\(search:\s*\$(s\d+)", query)
+    if aliases:
+        return {"data": {alias: _fake_media(1 + _digest(variables.get(var, "")) % 90000, variables.get(var, ""))
+                         for alias, var in aliases}}
+    search = variables.get("search") or ""
+    return {"data": {"Media": _fake_media(1 + _digest(search) % 90000, search)}}
+
+
+def _gemini_reply(body):
+    """Scripted model: tool calls for known commands, short text otherwise."""
+    contents = body.get("contents") or []
+    parts = contents[-1].get("parts", []) if contents else []
+    if any("functionResponse" in part or "function_response" in part for part in parts):
+        return [{"text": "Done. Anything else?"}]
+    text = " ".join(part.get("text", "") for part in parts).strip()
+    lowered = text.lower()
+    if lowered.startswith("add "):
+        titles = [t.strip() for t in re.split(r",| and ", text[4:]) if t.strip()]
+        return [{"functionCall": {"name": "add_to_watchlist_func", "args": {"anime_title": t}}} for t in titles]
+    if lowered.startswith("search "):
+        return [{"functionCall": {"name": "search_anime_feature", "args": {"title": text[7:]}}}]
+    if "list" in lowered and "watchlist" in lowered:
+        return [{"functionCall": {"name": "list_watchlist", "args": {}}}]
+    if lowered.startswith("recommend"):
+        return [{"functionCall": {"name": "recommend_anime", "args": {"limit": 5}}}]
+    return [{"text": "Sounds great! "}, {"text": "What else would you like to do?"}]
+
+
+def make_handler(services):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # Headers and body are written separately; without TCP_NODELAY every
+        # keep-alive response stalls ~40 ms on Nagle + delayed ACK.
+        disable_nagle_algorithm = True
+
+        def log_message(self, *args):
+            pass
+
+        def _send(self, status, payload, content_type="application/json", headers=None):
+            data = payload if isinstance(payload, bytes) else json.dumps(payload).encode("utf-8")
+            backend = "anilist" if self.path.startswith("/graphql") else "gemini" if self.path.startswith("/v1beta") else "mal"
+            services.add_bytes(backend, len(data))
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(data)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, str(value))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _body(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            return json.loads(self.rfile.read(length) or b"{}")
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            kind = url.path.strip("/").split(".")[0]
+            if kind not in ("anime", "manga"):
+                self._send(404, {"error": "not found"})
+                return
+            services.count("mal")
+            time.sleep(services.delay["mal"])
+            query = parse_qs(url.query).get("q", [""])[0]
+            self._send(200, _mal_page(kind, query), "text/html; charset=utf-8")
+
+        def do_POST(self):
+            body = self._body()
+            if self.path.startswith("/graphql"):
+                services.count("anilist")
+                allowed, remaining, retry_after = services.take_anilist_slot()
+                time.sleep(services.delay["anilist"])
+                headers = {"X-RateLimit-Limit": services.rate_limit, "X-RateLimit-Remaining": remaining}
+                if not allowed:
+                    headers["Retry-After"] = retry_after
+                    self._send(429, {"errors": [{"message": "Too Many Requests."}]}, headers=headers)
+                    return
+                self._send(200, _anilist_response(body.get("query", ""), body.get("variables") or {}, services.catalog),
+                           headers=headers)
+            elif self.path.startswith("/v1beta/models/"):
+                services.count("gemini")
+                time.sleep(services.delay["gemini"])
+                candidate = {"content": {"role": "model", "parts": _gemini_reply(body)}, "finishReason": 1, "index": 0}
+                usage = {"promptTokenCount": 100, "candidatesTokenCount": 10, "totalTokenCount": 110}
+                if ":streamGenerateContent" in self.path:
+                    # The REST transport streams a JSON array of response chunks.
+                    parts = candidate["content"]["parts"]
+                    chunks = [{"candidates": [dict(candidate, content={"role": "model", "parts": [part]})]}
+                              for part in parts]
+                    chunks[-1]["usageMetadata"] = usage
+                    self._send(200, chunks)
+                else:
+                    self._send(200, {"candidates": [candidate], "usageMetadata": usage})
+            else:
+                self._send(404, {"error": "not found"})
+
+    return Handler
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+def _stats(samples_ms, requests, iterations, extra=None):
+    result = {
+        "n": len(samples_ms),
+        "p50_ms": round(percentile(samples_ms, 50), 2),
+        "p95_ms": round(percentile(samples_ms, 95), 2),
+        "mean_ms": round(sum(samples_ms) / len(samples_ms), 2) if samples_ms else 0.0,
+        "requests_per_iteration": {k: round(v / iterations, 2) for k, v in requests.items() if v},
+    }
+    result.update(extra or {})
+    return result
+
+
+def _requests_since(services, before):
+    after = services.snapshot()
+    return {key: after[key] - before.get(key, 0) for key in after}
+
+
+def _reset_stores():
+    from features import cache, storage, title_index
+    cache.clear_cache()
+    title_index.clear_titles()
+    storage.replace_entries("watchlist", [])
+    storage.clear_genres()
+
+
+def scenario_search(services, opts):
+    from features.search_anime import search_anime_results
+    samples = []
+    before = services.snapshot()
+    for _ in range(opts.iterations):
+        _reset_stores()
+        for title in SEARCH_TITLES:
+            started = time.perf_counter()
+            results = search_anime_results(title)
+            samples.append((time.perf_counter() - started) * 1000)
+            assert results, f"no results for {title}"
+    requests = _requests_since(services, before)
+    # The same titles again, misspelled, once the local title index knows them.
+    local, before = [], services.snapshot()
+    for title in SEARCH_TITLES:
+        started = time.perf_counter()
+        search_anime_results(title[:-2] + title[-1] + title[-2])
+        local.append((time.perf_counter() - started) * 1000)
+    local_requests = sum(_requests_since(services, before).values())
+    return _stats(samples, requests, opts.iterations,
+                  {"local_typo_p50_ms": round(percentile(local, 50), 2), "local_typo_requests": local_requests})
+
+
+def scenario_recommend(services, opts):
+    from features import storage
+    from features.rcm_system import recommend_anime_results
+    samples, stored, stored_requests = [], [], 0
+    before = services.snapshot()
+    for _ in range(opts.iterations):
+        _reset_stores()
+        storage.add_entries("watchlist", [{"title": f"Watched Show {i}", "episodes_watched": i % 12}
+                                          for i in range(opts.watchlist_size)])
+        storage.add_genres(["Fantasy", "Mystery"])
+        started = time.perf_counter()
+        results = recommend_anime_results(10)
+        samples.append((time.perf_counter() - started) * 1000)
+        assert results, "no recommendations"
+        # Second run: entries now carry their stored genres and ids.
+        stored_before = services.snapshot()
+        started = time.perf_counter()
+        recommend_anime_results(10)
+        stored.append((time.perf_counter() - started) * 1000)
+        stored_requests += sum(_requests_since(services, stored_before).values())
+    return _stats(samples, _requests_since(services, before), opts.iterations,
+                  {"watchlist_size": opts.watchlist_size,
+                   "stored_metadata_p50_ms": round(percentile(stored, 50), 2),
+                   "stored_metadata_requests": stored_requests})
+
+
+def scenario_bulk_add(services, opts):
+    from features.watch_list import add_to_watchlist_func
+    samples, totals = [], []
+    before = services.snapshot()
+    for _ in range(opts.iterations):
+        _reset_stores()
+        started_all = time.perf_counter()
+        for i in range(opts.bulk_size):
+            started = time.perf_counter()
+            message = add_to_watchlist_func(f"Bulk Title {i}")
+            samples.append((time.perf_counter() - started) * 1000)
+            assert message.startswith("Added"), message
+        totals.append((time.perf_counter() - started_all) * 1000)
+    return _stats(samples, _requests_since(services, before), opts.iterations,
+                  {"bulk_size": opts.bulk_size, "total_p50_ms": round(percentile(totals, 50), 2)})
+
+
+def scenario_chat(services, opts):
+    from features.chat import chat_with_bot
+    samples = []
+    before = services.snapshot()
+    for _ in range(opts.iterations):
+        _reset_stores()
+        if os.path.exists("history.jsonl"):
+            os.remove("history.jsonl")
+        script = iter(CHAT_SCRIPT + ["quit"])
+        marks = {}
+
+        def scripted_input(prompt=""):
+            now = time.perf_counter()
+            if "sent" in marks:
+                samples.append((now - marks["sent"]) * 1000)
+            marks["sent"] = time.perf_counter()
+            return next(script)
+
+        original_input = builtins.input
+        builtins.input = scripted_input
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                chat_with_bot()
+        finally:
+            builtins.input = original_input
+    return _stats(samples, _requests_since(services, before), opts.iterations,
+                  {"turns_per_iteration": len(CHAT_SCRIPT)})
+
+
+SCENARIOS = {
+    "search": scenario_search,
+    "recommend": scenario_recommend,
+    "bulk_add": scenario_bulk_add,
+    "chat": scenario_chat,
+}
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(results, baseline=None):
+    print(f"\n{'scenario':<12}{'n':>6}{'p50 ms':>10}{'p95 ms':>10}{'mean ms':>10}  requests/iteration")
+    for name, stats in results["scenarios"].items():
+        requests = ", ".join(f"{k}={v:g}" for k, v in stats["requests_per_iteration"].items()) or "-"
+        line = f"{name:<12}{stats['n']:>6}{stats['p50_ms']:>10.2f}{stats['p95_ms']:>10.2f}{stats['mean_ms']:>10.2f}  {requests}"
+        old = (baseline or {}).get("scenarios", {}).get(name)
+        if old:
+            line += f"  (p50 {_delta(old['p50_ms'], stats['p50_ms'])}, p95 {_delta(old['p95_ms'], stats['p95_ms'])})"
+        print(line)
+    if baseline:
+        print(f"compared with {baseline.get('commit') or 'baseline'} from {baseline.get('date', '?')}")
+
+
+def _delta(old, new):
+    if not old:
+        return "n/a"
+    return f"{(new - old) / old * 100:+.0f}%"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=5)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--watchlist-size", type=int, default=300)
+    parser.add_argument("--bulk-size", type=int, default=200)
+    parser.add_argument("--anilist-latency-ms", type=float, default=80)
+    parser.add_argument("--mal-latency-ms", type=float, default=250)
+    parser.add_argument("--gemini-latency-ms", type=float, default=400)
+    parser.add_argument("--rate-limit", type=int, default=90, help="AniList requests allowed per window")
+    parser.add_argument("--rate-window", type=float, default=60.0)
+    parser.add_argument("--out", help="write the results as JSON to this file")
+    parser.add_argument("--compare", help="JSON results from an earlier run to compare with")
+    opts = parser.parse_args()
+
+    names = [name.strip() for name in opts.scenarios.split(",") if name.strip()]
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(unknown)}")
+
+    services = FakeServices(opts.anilist_latency_ms, opts.mal_latency_ms, opts.gemini_latency_ms,
+                            opts.rate_limit, opts.rate_window)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(services))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    # Point every client at the stand-ins before the feature modules load.
+    os.environ["ANILIST_URL"] = f"{base_url}/graphql"
+    os.environ["GEMINI_API_KEY"] = "offline-bench"
+    os.environ["GEMINI_API_ENDPOINT"] = base_url
+    import mal.config
+    mal.config.MAL_ENDPOINT = f"{base_url}/"
+
+    results = {
+        "commit": _git_commit(),
+        "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": sys.version.split()[0],
+        "config": {key: value for key, value in vars(opts).items() if key not in ("out", "compare")},
+        "scenarios": {},
+    }
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        try:
+            for name in names:
+                print(f"running {name}...", file=sys.stderr)
+                results["scenarios"][name] = SCENARIOS[name](services, opts)
+        finally:
+            os.chdir(ROOT)
+            server.shutdown()
+
+    baseline = None
+    if opts.compare:
+        with open(opts.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_results(results, baseline)
+    if opts.out:
+        with open(opts.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"results written to {opts.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""Startup benchmark for main.py based on `python -X importtime`.
+
+Runs each cheap command in a scratch directory, parses the import-time log
+written to stderr and reports the total import cost plus the heaviest modules.
+Exits with status 1 if a command imports one of the heavy SDKs or goes over
+the time budget, so regressions show up in CI or a pre-commit hook.
+
+Usage:
+    python benchmarks/startup_importtime.py [--runs 5] [--max-ms 150]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MAIN = os.path.join(ROOT, "main.py")
+
+# Commands that only touch local data files and must stay light.
+LIGHT_COMMANDS = [
+    ["-l"],
+    ["-a", "Benchmark Title"],
+    ["-h"],
+]
+
+# Packages that must never be imported by a light command.
+FORBIDDEN = ("google.generativeai", "grpc", "mal", "dotenv", "requests", "bs4")
+
+
+def parse_importtime(stderr):
+    """Returns ({module: cumulative_us}, total_us) for one -X importtime log."""
+    modules = {}
+    total = 0
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        # Nested imports are indented below their parent; only the outermost
+        # ones add up to the real total.
+        name = name[1:]
+        if not name.startswith(" "):
+            total += int(cumulative_us)
+        modules[name.strip()] = int(cumulative_us)
+    return modules, total
+
+
+def is_forbidden(module):
+    return any(module == name or module.startswith(name + ".") for name in FORBIDDEN)
+
+
+def run_once(args, workdir):
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", MAIN] + args,
+        cwd=workdir,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+    return parse_importtime(proc.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-ms", type=float, default=150.0,
+                        help="fail if the median import time exceeds this")
+    parser.add_argument("--top", type=int, default=5)
+    opts = parser.parse_args()
+
+    failed = False
+    with tempfile.TemporaryDirectory() as workdir:
+        for args in LIGHT_COMMANDS:
+            totals = []
+            modules = {}
+            for _ in range(opts.runs):
+                modules, total = run_once(args, workdir)
+                totals.append(total)
+            median_ms = statistics.median(totals) / 1000
+            label = " ".join(args)
+            print(f"main.py {label}: median import time {median_ms:.1f} ms over {opts.runs} runs")
+
+            heaviest = sorted(modules.items(), key=lambda item: item[1], reverse=True)
+            for name, cumulative_us in heaviest[:opts.top]:
+                print(f"    {cumulative_us / 1000:8.1f} ms  {name.strip()}")
+
+            leaked = sorted(name for name in modules if is_forbidden(name))
+            if leaked:
+                print(f"    FAIL: imports heavy modules: {', '.join(leaked[:5])}")
+                failed = True
+            if median_ms > opts.max_ms:
+                print(f"    FAIL: over budget ({opts.max_ms:.0f} ms)")
+                failed = True
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Stress test for concurrent writers to the watchlist store.
+
+Starts N processes in a scratch directory that each add M distinct titles
+(plus a few shared ones that everybody tries to add) and then checks that
+every distinct title was stored exactly once. A legacy watchlist.json is put
+in place first so the one-time import races as well.
+
+Usage:
+    python benchmarks/stress_concurrent_adds.py [--procs 8] [--titles 50]
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SHARED_TITLES = ["Frieren", "Bocchi the Rock!", "Mushishi"]
+
+
+def worker(workdir, proc_id, count, results):
+    os.chdir(workdir)
+    from features.watch_list import add_to_watchlist_func
+    from features import storage
+
+    failures = 0
+    for i in range(count):
+        message = add_to_watchlist_func(f"Title {proc_id}-{i}")
+        if not message.startswith("Added"):
+            failures += 1
+        if i % 10 == 0:
+            storage.update_entry("watchlist", f"Title {proc_id}-{i}", {"episodes_watched": i})
+    for title in SHARED_TITLES:
+        add_to_watchlist_func(title)
+    results.put((proc_id, failures))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--procs", type=int, default=8)
+    parser.add_argument("--titles", type=int, default=50)
+    opts = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        with open(os.path.join(workdir, "watchlist.json"), "w") as f:
+            json.dump({"watchlist": [{"title": "Legacy Entry", "episodes_watched": 1}]}, f)
+
+        ctx = multiprocessing.get_context("spawn")
+        results = ctx.Queue()
+        procs = [ctx.Process(target=worker, args=(workdir, p, opts.titles, results)) for p in range(opts.procs)]
+        start = time.perf_counter()
+        for proc in procs:
+            proc.start()
+        for proc in procs:
+            proc.join()
+        elapsed = time.perf_counter() - start
+        failures = sum(results.get()[1] for _ in procs)
+
+        os.chdir(workdir)
+        from features import storage
+        titles = [entry["title"] for entry in storage.list_entries("watchlist")]
+        os.chdir(ROOT)
+
+    expected = opts.procs * opts.titles + len(SHARED_TITLES) + 1
+    writes = opts.procs * (opts.titles + len(SHARED_TITLES))
+    print(f"{opts.procs} processes, {writes} add calls in {elapsed:.2f}s")
+    print(f"stored {len(titles)} titles (expected {expected}), {len(titles) - len(set(titles))} duplicates, "
+          f"{failures} failed adds")
+    if len(titles) != expected or len(set(titles)) != len(titles) or failures:
+        print("FAIL: lost or duplicated updates")
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
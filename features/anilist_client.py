@@ -0,0 +1,162 @@
+"""Shared HTTP client for the AniList GraphQL API.
+
+All AniList calls go through post_query(), which reuses one pooled
+requests.Session (keep-alive, no TLS handshake per call), applies timeouts,
+retries 429/5xx responses with jittered exponential backoff and paces requests
+ahead of time using AniList's X-RateLimit-* headers.
+"""
+
+import os
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from features.profiling import span
+
+ANILIST_URL = os.environ.get("ANILIST_URL", "https://graphql.anilist.co")
+TIMEOUT = (5, 20)  # (connect, read) seconds
+MAX_RETRIES = 4
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 30.0
+POOL_SIZE = 10
+# Once fewer than this many requests are left in the current window, requests
+# are spread out evenly instead of being sent back to back.
+LOW_WATERMARK = 5
+RATE_WINDOW = 60.0
+
+
+class AniListError(Exception):
+    """Raised when AniList keeps failing after all retries."""
+
+
+_session = None
+_session_lock = threading.Lock()
+
+_rate_lock = threading.Lock()
+_rate_limit = None
+_rate_remaining = None
+_rate_reset_at = 0.0
+_next_slot = 0.0
+
+
+def get_session():
+    """Returns the process-wide pooled session, creating it on first use."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            session.headers.update({"Content-Type": "application/json", "Accept": "application/json"})
+            _session = session
+    return _session
+
+
+def _backoff(attempt):
+    delay = min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt))
+    # Full jitter keeps parallel workers from retrying in lockstep.
+    return random.uniform(0, delay)
+
+
+def _retry_after(response):
+    value = response.headers.get("Retry-After")
+    if value is None:
+        reset = response.headers.get("X-RateLimit-Reset")
+        if reset is not None:
+            try:
+                return max(0.0, float(reset) - time.time())
+            except ValueError:
+                return None
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        return None
+
+
+def _record_rate_limit(response):
+    global _rate_limit, _rate_remaining, _rate_reset_at
+    headers = response.headers
+    with _rate_lock:
+        try:
+            if "X-RateLimit-Limit" in headers:
+                _rate_limit = int(headers["X-RateLimit-Limit"])
+            if "X-RateLimit-Remaining" in headers:
+                _rate_remaining = int(headers["X-RateLimit-Remaining"])
+                if _rate_remaining >= LOW_WATERMARK:
+                    _rate_reset_at = 0.0
+        except ValueError:
+            return
+        if response.status_code == 429:
+            _rate_remaining = 0
+            _rate_reset_at = time.time() + (_retry_after(response) or RATE_WINDOW)
+
+
+def _wait_for_slot():
+    """Sleeps as needed so we stay under the advertised rate limit."""
+    global _next_slot, _rate_remaining
+    with _rate_lock:
+        now = time.time()
+        wait = 0.0
+        if _rate_remaining is not None and _rate_remaining <= 0 and _rate_reset_at > now:
+            wait = _rate_reset_at - now
+        elif _rate_remaining is not None and _rate_remaining < LOW_WATERMARK and _rate_limit:
+            wait = max(0.0, _next_slot - now)
+            _next_slot = max(now, _next_slot) + RATE_WINDOW / _rate_limit
+        if _rate_remaining is not None and _rate_remaining > 0:
+            # Reserve a request so concurrent callers don't overshoot.
+            _rate_remaining -= 1
+    if wait > 0:
+        time.sleep(wait)
+
+
+def only_not_found(data):
+    """True if every error in a response body is AniList's "Not Found", so null fields mean no match."""
+    return all(error.get("status") == 404 for error in data.get("errors") or [])
+
+
+def data_or_raise(body):
+    """Returns the "data" of a response body, raising AniListError with AniList's message if it has none."""
+    if not body.get("data"):
+        errors = body.get("errors") or [{}]
+        raise AniListError(errors[0].get("message", "AniList returned no data"))
+    return body["data"]
+
+
+def post_query(query, variables=None):
+    """Sends a GraphQL query to AniList and returns the decoded JSON body.
+
+    The body is returned as-is for 2xx and non-retryable 4xx responses, since
+    AniList reports "Not Found" as a 404 that still carries partial data.
+    """
+    session = get_session()
+    payload = {"query": query, "variables": variables or {}}
+    last_error = None
+
+    for attempt in range(MAX_RETRIES + 1):
+        with span("anilist.rate_limit_wait"):
+            _wait_for_slot()
+        try:
+            with span("anilist.request", attempt=attempt):
+                response = session.post(ANILIST_URL, json=payload, timeout=TIMEOUT)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            last_error = e
+            time.sleep(_backoff(attempt))
+            continue
+
+        _record_rate_limit(response)
+        if response.status_code == 429 or response.status_code >= 500:
+            last_error = AniListError(f"AniList returned HTTP {response.status_code}")
+            delay = _retry_after(response) if response.status_code == 429 else None
+            time.sleep(delay + random.uniform(0, BACKOFF_BASE) if delay is not None else _backoff(attempt))
+            continue
+
+        try:
+            return response.json()
+        except ValueError as e:
+            raise AniListError(f"AniList returned invalid JSON (HTTP {response.status_code})") from e
+
+    raise AniListError(f"AniList request failed after {MAX_RETRIES + 1} attempts: {last_error}")
@@ -0,0 +1,217 @@
+"""Tab completion for titles and genres at the terminal prompts.
+
+Completions come from PrefixTrie, a prefix index over folded names (see
+title_index.fold_title, so case, accents and punctuation don't matter). It is
+kept flat: the folded names are one sorted array, and the names under a
+prefix are the contiguous run found with a binary search, which is what
+walking down a trie gives, at the memory cost of two lists instead of a dict
+per character. That keeps 100k+ titles in a few tens of MB, and a lookup
+costs a binary search plus the matches returned, well under one frame.
+
+The title completions hold every name the local title index knows (list
+entries, catalog titles with their English names, earlier search results).
+They are built on a background thread as soon as a prompt opens, so the
+work overlaps with typing, and new titles are added incrementally as they
+are remembered or added to a list (titles that arrive while the completions
+are being built are queued and added once they are ready). After titles
+are added in bulk (--import) they are built again on next use. Genres are
+completed from AniList's genre list plus any other genre already in use.
+
+Completion uses the readline module where it is available (Linux, macOS);
+elsewhere the prompts fall back to plain input().
+"""
+
+import bisect
+import threading
+
+from features import title_index
+from features.title_index import fold_title
+
+MAX_SUGGESTIONS = 50
+ANILIST_GENRES = (
+    "Action", "Adventure", "Comedy", "Drama", "Ecchi", "Fantasy", "Horror", "Mahou Shoujo", "Mecha", "Music",
+    "Mystery", "Psychological", "Romance", "Sci-Fi", "Slice of Life", "Sports", "Supernatural", "Thriller",
+)
+
+_lock = threading.Lock()
+_tries = None
+_loader = None
+# Bumped when titles are added in bulk, so a load already under way is discarded.
+_generation = 0
+_pending = []
+
+
+class PrefixTrie:
+    """Names by folded prefix, as a sorted array of (folded name, name)."""
+
+    def __init__(self, names=()):
+        pairs = sorted({(fold_title(name), str(name).strip()) for name in names})
+        self.keys = [key for key, _ in pairs if key]
+        self.names = [name for key, name in pairs if key]
+
+    @classmethod
+    def from_folded(cls, pairs):
+        """Builds from (folded name, name) pairs that are already folded."""
+        trie = cls()
+        pairs = sorted(set(pairs))
+        trie.keys = [key for key, _ in pairs]
+        trie.names = [name for _, name in pairs]
+        return trie
+
+    def __len__(self):
+        return len(self.keys)
+
+    def add(self, name):
+        """Inserts a name in place; returns False if it was already there."""
+        key = fold_title(name)
+        name = str(name).strip()
+        if not key:
+            return False
+        i = bisect.bisect_left(self.keys, key)
+        while i < len(self.keys) and self.keys[i] == key:
+            if self.names[i] == name:
+                return False
+            if self.names[i] > name:
+                break
+            i += 1
+        self.keys.insert(i, key)
+        self.names.insert(i, name)
+        return True
+
+    def complete(self, prefix, limit=MAX_SUGGESTIONS):
+        """Returns up to limit distinct names starting with prefix (after folding), in order."""
+        key = fold_title(prefix)
+        if not key:
+            return []
+        results = []
+        seen = set()
+        i = bisect.bisect_left(self.keys, key)
+        keys, names = self.keys, self.names
+        while i < len(keys) and len(results) < limit and keys[i].startswith(key):
+            if names[i] not in seen:
+                seen.add(names[i])
+                results.append(names[i])
+            i += 1
+        return results
+
+
+def _add_titles(tries, kind, names):
+    trie = tries.setdefault(kind, PrefixTrie())
+    for name in names:
+        trie.add(name)
+
+
+def _on_new_titles(kind, names):
+    with _lock:
+        if _tries is not None:
+            _add_titles(_tries, kind, names)
+        elif _loader is not None:
+            # A load is under way and its snapshot may have missed these.
+            _pending.append((kind, names))
+
+
+def _on_invalidate():
+    global _tries, _loader, _generation
+    with _lock:
+        _tries = None
+        _loader = None
+        _generation += 1
+        _pending.clear()
+
+
+def _load_titles(generation):
+    global _tries
+    pairs = {kind: [] for kind in title_index.LIST_KINDS.values()}
+    for kind, folded, name in title_index.known_names():
+        pairs.setdefault(kind, []).append((folded, name))
+    tries = {kind: PrefixTrie.from_folded(kind_pairs) for kind, kind_pairs in pairs.items()}
+    with _lock:
+        if generation != _generation:
+            return
+        for kind, names in _pending:
+            _add_titles(tries, kind, names)
+        _pending.clear()
+        _tries = tries
+
+
+# Registered before any snapshot is taken, so no new title can fall in between.
+title_index.add_listener(_on_new_titles, _on_invalidate)
+
+
+def preload_titles():
+    """Starts building the title completions on a background thread, unless they are built or being built."""
+    global _loader
+    with _lock:
+        if _loader is None:
+            _loader = threading.Thread(target=_load_titles, args=(_generation,), daemon=True)
+            _loader.start()
+        return _loader
+
+
+def complete_title(prefix, kind="ANIME"):
+    """Returns title completions, waiting for the background load if it hasn't finished yet."""
+    preload_titles().join()
+    with _lock:
+        trie = (_tries or {}).get(kind)
+        return trie.complete(prefix) if trie is not None else []
+
+
+def _known_genres(only_liked=False):
+    from features import storage
+    liked = storage.list_genres()
+    if only_liked:
+        return liked
+    genres = set(ANILIST_GENRES) | set(liked)
+    for name in title_index.LIST_KINDS:
+        for entry in storage.list_entries(name):
+            genres.update(entry.get("genres") or ())
+    return sorted(genres)
+
+
+def _read_line(message, complete):
+    """input() with complete(text) bound to Tab, completing the whole line."""
+    try:
+        import readline
+    except ImportError:
+        return input(message)
+
+    matches = []
+
+    def completer(text, state):
+        nonlocal matches
+        if state == 0:
+            try:
+                matches = complete(text)
+            except Exception:
+                # A failing completion must never break the prompt.
+                matches = []
+        return matches[state] if state < len(matches) else None
+
+    old_completer = readline.get_completer()
+    old_delims = readline.get_completer_delims()
+    readline.set_completer(completer)
+    # Titles contain spaces and punctuation, so the whole line is one word.
+    readline.set_completer_delims("")
+    if "libedit" in (readline.__doc__ or ""):
+        readline.parse_and_bind("bind ^I rl_complete")
+    else:
+        readline.parse_and_bind("tab: complete")
+        readline.parse_and_bind("set completion-ignore-case on")
+        readline.parse_and_bind("set show-all-if-ambiguous on")
+    try:
+        return input(message)
+    finally:
+        readline.set_completer(old_completer)
+        readline.set_completer_delims(old_delims)
+
+
+def input_title(message, kind="ANIME"):
+    """Prompts for an anime (or manga, with kind="MANGA") title with Tab completion."""
+    preload_titles()
+    return _read_line(message, lambda text: complete_title(text, kind))
+
+
+def input_genre(message, only_liked=False):
+    """Prompts for a genre with Tab completion (only the liked genres with only_liked)."""
+    genres = PrefixTrie(_known_genres(only_liked))
+    return _read_line(message, genres.complete)
@@ -0,0 +1,110 @@
+"""Persistent metadata cache for AniList and MyAnimeList responses.
+
+Entries live in a small SQLite database keyed by backend and normalized query.
+Each entry has its own expiry time, the table is capped at MAX_ENTRIES with
+least-recently-used eviction, and empty results are cached too (for a shorter
+time) so repeated misses don't go back to the network.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+
+CACHE_FILE = "cache.db"
+DEFAULT_TTL = 7 * 24 * 60 * 60
+NEGATIVE_TTL = 24 * 60 * 60
+MAX_ENTRIES = 5000
+
+_lock = threading.Lock()
+_conn = None
+
+
+def _connect():
+    global _conn
+    if _conn is None:
+        _conn = sqlite3.connect(CACHE_FILE, timeout=10.0, check_same_thread=False)
+        _conn.execute("PRAGMA journal_mode=WAL")
+        _conn.execute(
+            """CREATE TABLE IF NOT EXISTS cache (
+                   key TEXT PRIMARY KEY,
+                   value TEXT NOT NULL,
+                   expires_at REAL NOT NULL,
+                   last_access REAL NOT NULL
+               )"""
+        )
+        _conn.execute("CREATE INDEX IF NOT EXISTS cache_last_access ON cache (last_access)")
+        _conn.commit()
+    return _conn
+
+
+def normalize_query(query):
+    """Turns a query (string, list or dict) into a stable cache key fragment."""
+    if isinstance(query, str):
+        return " ".join(query.lower().split())
+    return json.dumps(query, sort_keys=True, ensure_ascii=False).lower()
+
+
+def _key(backend, query):
+    return f"{backend}:{normalize_query(query)}"
+
+
+def cache_get(backend, query):
+    """Returns (True, value) for a fresh entry, (False, None) otherwise."""
+    key = _key(backend, query)
+    now = time.time()
+    with _lock:
+        conn = _connect()
+        row = conn.execute("SELECT value, expires_at FROM cache WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return False, None
+        if row[1] < now:
+            conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+            conn.commit()
+            return False, None
+        conn.execute("UPDATE cache SET last_access = ? WHERE key = ?", (now, key))
+        conn.commit()
+    return True, json.loads(row[0])
+
+
+def cache_set(backend, query, value, ttl=None):
+    """Stores a JSON-serializable value, evicting the least recently used entries."""
+    if ttl is None:
+        ttl = DEFAULT_TTL if value else NEGATIVE_TTL
+    now = time.time()
+    with _lock:
+        conn = _connect()
+        conn.execute(
+            "INSERT OR REPLACE INTO cache (key, value, expires_at, last_access) VALUES (?, ?, ?, ?)",
+            (_key(backend, query), json.dumps(value, ensure_ascii=False), now + ttl, now),
+        )
+        (count,) = conn.execute("SELECT COUNT(*) FROM cache").fetchone()
+        if count > MAX_ENTRIES:
+            conn.execute(
+                "DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY last_access LIMIT ?)",
+                (count - MAX_ENTRIES,),
+            )
+        conn.commit()
+
+
+def cached(backend, query, fetch, ttl=None):
+    """Returns the cached value for (backend, query), calling fetch() on a miss.
+
+    Empty results are cached with NEGATIVE_TTL unless ttl is given. When
+    fetch() raises, the error propagates and nothing is cached, so fetch()
+    should only return an empty value for a real "no results".
+    """
+    hit, value = cache_get(backend, query)
+    if hit:
+        return value
+    value = fetch()
+    cache_set(backend, query, value, ttl)
+    return value
+
+
+def clear_cache():
+    """Removes every cached entry."""
+    with _lock:
+        conn = _connect()
+        conn.execute("DELETE FROM cache")
+        conn.commit()
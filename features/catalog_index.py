@@ -0,0 +1,224 @@
+"""Local AniList catalog with an inverted genre/tag index.
+
+sync_catalog() crawls AniList's anime catalog page by page into a SQLite file.
+Every genre and tag is stored as a posting (term -> media id) next to the
+popularity and score columns, so genre queries can be answered in memory
+without a network round trip. Later syncs are incremental: they walk the
+catalog newest-update-first and stop at the last sync point.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+
+from features.anilist_client import post_query, data_or_raise
+
+CATALOG_FILE = "catalog.db"
+PER_PAGE = 50
+
+CRAWL_QUERY = """
+query ($page: Int, $perPage: Int) {
+  Page(page: $page, perPage: $perPage) {
+    pageInfo {
+      hasNextPage
+    }
+    media(type: ANIME, sort: [UPDATED_AT_DESC, ID]) {
+      id
+      title {
+        romaji
+        english
+      }
+      genres
+      tags {
+        name
+      }
+      popularity
+      averageScore
+      updatedAt
+    }
+  }
+}
+"""
+
+_lock = threading.Lock()
+_index = None
+
+
+def _connect():
+    conn = sqlite3.connect(CATALOG_FILE)
+    conn.executescript(
+        """
+        CREATE TABLE IF NOT EXISTS media (
+            id INTEGER PRIMARY KEY,
+            romaji TEXT,
+            english TEXT,
+            genres TEXT NOT NULL,
+            tags TEXT NOT NULL,
+            popularity INTEGER,
+            average_score INTEGER,
+            updated_at INTEGER
+        );
+        CREATE TABLE IF NOT EXISTS postings (
+            term TEXT NOT NULL,
+            media_id INTEGER NOT NULL,
+            PRIMARY KEY (term, media_id)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS postings_media ON postings (media_id);
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        );
+        """
+    )
+    return conn
+
+
+def _store_page(conn, media_list):
+    for media in media_list:
+        genres = media.get("genres") or []
+        tags = [tag["name"] for tag in media.get("tags") or [] if tag.get("name")]
+        conn.execute(
+            "INSERT OR REPLACE INTO media VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                media["id"],
+                media["title"].get("romaji"),
+                media["title"].get("english"),
+                json.dumps(genres),
+                json.dumps(tags),
+                media.get("popularity") or 0,
+                media.get("averageScore"),
+                media.get("updatedAt") or 0,
+            ),
+        )
+        # Replace the postings so genres/tags removed upstream disappear too.
+        conn.execute("DELETE FROM postings WHERE media_id = ?", (media["id"],))
+        conn.executemany(
+            "INSERT OR IGNORE INTO postings VALUES (?, ?)",
+            [(term.lower(), media["id"]) for term in genres + [f"tag:{tag}" for tag in tags]],
+        )
+
+
+def sync_catalog(full=False, max_pages=None, per_page=PER_PAGE):
+    """Crawls AniList into the local catalog and returns the number of media stored.
+
+    Unless full is True, only media updated since the previous sync are
+    fetched. max_pages limits how far a crawl goes (useful for a first,
+    partial sync).
+    """
+    global _index
+    conn = _connect()
+    try:
+        row = conn.execute("SELECT value FROM meta WHERE key = 'last_sync'").fetchone()
+        since = 0 if full or row is None else int(row[0])
+        newest = since
+        stored = 0
+        page = 1
+        finished = False
+
+        while max_pages is None or page <= max_pages:
+            data = post_query(CRAWL_QUERY, {"page": page, "perPage": per_page})
+            result = data_or_raise(data)["Page"]
+            fresh = [m for m in result["media"] if (m.get("updatedAt") or 0) > since]
+            if fresh:
+                with conn:
+                    _store_page(conn, fresh)
+                stored += len(fresh)
+                newest = max(newest, max(m.get("updatedAt") or 0 for m in fresh))
+            # Results are sorted by update time, so anything older than the
+            # last sync means the rest of the catalog is already up to date.
+            if len(fresh) < len(result["media"]) or not result["pageInfo"]["hasNextPage"]:
+                finished = True
+                break
+            page += 1
+
+        # A crawl cut short by max_pages leaves a gap behind it, so the sync
+        # point only moves once everything newer than it has been fetched.
+        if finished:
+            with conn:
+                conn.execute("INSERT OR REPLACE INTO meta VALUES ('last_sync', ?)", (str(newest),))
+    finally:
+        conn.close()
+
+    with _lock:
+        _index = None
+    return stored
+
+
+def _load_index():
+    """Loads the postings and media rows into memory once per process."""
+    global _index
+    with _lock:
+        if _index is not None:
+            return _index
+        postings = {}
+        media = {}
+        if not os.path.exists(CATALOG_FILE):
+            _index = (postings, media)
+            return _index
+        conn = _connect()
+        try:
+            for row in conn.execute(
+                "SELECT id, romaji, english, genres, tags, popularity, average_score FROM media"
+            ):
+                media[row[0]] = {
+                    "id": row[0],
+                    "title": {"romaji": row[1], "english": row[2]},
+                    "genres": json.loads(row[3]),
+                    "tags": json.loads(row[4]),
+                    "popularity": row[5],
+                    "averageScore": row[6],
+                }
+            for term, media_id in conn.execute("SELECT term, media_id FROM postings"):
+                postings.setdefault(term, set()).add(media_id)
+        finally:
+            conn.close()
+        _index = (postings, media)
+        return _index
+
+
+def catalog_titles():
+    """Returns (id, romaji, english, average score) for every catalog entry, without loading the index."""
+    if not os.path.exists(CATALOG_FILE):
+        return []
+    conn = _connect()
+    try:
+        return conn.execute("SELECT id, romaji, english, average_score FROM media").fetchall()
+    finally:
+        conn.close()
+
+
+def catalog_size():
+    """Returns the number of media in the local catalog."""
+    return len(_load_index()[1])
+
+
+def catalog_media():
+    """Returns every media record in the local catalog."""
+    return list(_load_index()[1].values())
+
+
+def query_catalog(terms, max_results=10, match_all=False):
+    """Returns catalog media matching the given genres/tags, most popular first.
+
+    Tags are looked up with a "tag:" prefix (e.g. "tag:Time Skip") so they
+    never collide with genre names.
+
+    By default a media matches if it has any of the terms (like AniList's
+    genre_in); with match_all=True it must have all of them. max_results=None
+    returns every match.
+    """
+    postings, media = _load_index()
+    if not media or not terms:
+        return []
+    sets = [postings.get(term.lower(), set()) for term in terms]
+    if match_all:
+        # Intersect starting from the rarest term to keep the work small.
+        sets.sort(key=len)
+        ids = set(sets[0])
+        for other in sets[1:]:
+            ids &= other
+    else:
+        ids = set().union(*sets)
+    ranked = sorted(ids, key=lambda media_id: media[media_id]["popularity"] or 0, reverse=True)
+    return [media[media_id] for media_id in ranked[:max_results]]
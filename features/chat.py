@@ -13,556 +13,430 @@ See the License for the specific language governing permissions and
 limitations under the License."""
 
 import os
-import json
+import threading
+import time
 from dotenv import load_dotenv
 import google.generativeai as genai
-from google.generativeai import types
-from features.watch_list import get_watchlist, save_watchlist, add_to_watchlist_func
-from features.watch_anime import watch_anime
-from mal import AnimeSearch
-from features.manga_manager import add_to_readlist, list_readlist, search_manga, recommend_manga
-from features.genre_manager import add_genre, clear_genres, list_genres, remove_genre
-from features.rcm_system import recommend_anime
-from features.read_light_novel import read_light_novel
-from features.search_anime import search_anime
-from features.watch_list import list_watchlist, update_watchlist
-
-# Define tool functions
-
-get_user_like_genre_func = {
-    "name": "get_user_like_genre",
-    "description": "Get the anime genres the user likes.",
-    "parameters": {
-        "type": "object",
-        "properties": {
-            "genres": {
-                "type": "array",
-                "items": {"type": "string"},
-                "description": "List of genres the user likes."
-            }
-        },
-        "required": ["genres"]
-    }
-}
-
-add_to_watchlist_declaration = {
-    "name": "add_to_watchlist_func",
-    "description": "Add an anime to the watchlist.",
-    "parameters": {
-        "type": "object",
-        "properties": {
-            "anime_title": {
-                "type": "string",
-                "description": "The title of the anime to add to the watchlist."
-            }
-        },
-        "required": ["anime_title"]
-    }
-}
-quit_func = {
-    "name": "quit_chat",
-    "description": "End the chat session with the anime assistant.",
-    "parameters": {
-        "type": "object",
-        "properties": {}
-    }
-}
-watch_anime_func = {
-    "name": "watch_anime",
-    "description": "Start watching an anime.",
-    "parameters": {
-        "type": "object",
-        "properties": {
-            "anime_title": {
-                "type": "string",
-                "description": "The title of the anime to watch."
-            }
-        },
-        "required": ["anime_title"]
-    }
-}                
-search_anime_declaration = {
-    "name": "search_anime_feature",
-    "description": "Search for an anime.",
-    "parameters": {
-        "type": "object",
-        "properties": {
-            "title": {
-                "type": "string",
-                "description": "The title of the anime to search for."
-            }
-        },
-        "required": ["title"]
-    }
-}
-
-read_light_novel_declaration = {
-    "name": "read_light_novel_feature",
-    "description": "Search for a light novel to read.",
-    "parameters": {
-        "type": "object",
-        "properties": {
-            "title": {
-                "type": "string",
-                "description": "The title of the light novel."
-            }
-        },
-        "required": ["title"]
-    }
-}
-
-list_genres_declaration = {
-    "name": "list_genres",
-    "description": "List the user's preferred anime genres.",
-    "parameters": {"type": "object", "properties": {}}
-}
-
-remove_genre_declaration = {
-    "name": "remove_genre",
-    "description": "Remove a genre from the user's preferred anime genres.",
-    "parameters": {"type": "object", "properties": {}}
-}
-
-add_genre_declaration = {
-    "name": "add_genre",
-    "description": "Add a genre to the user's preferred anime genres.",
-    "parameters": {"type": "object", "properties": {}}
-}
-
-clear_genres_declaration = {
-    "name": "clear_genres",
-    "description": "Clear all of the user's preferred anime genres.",
-    "parameters": {"type": "object", "properties": {}}
-}
-
-recommend_anime_declaration = {
-    "name": "recommend_anime",
-    "description": "Recommend anime to the user based on their preferences.",
-    "parameters": {"type": "object", "properties": {}}
-}
-
-list_watchlist_declaration = {
-    "name": "list_watchlist",
-    "description": "List all anime in the user's watchlist.",
-    "parameters": {"type": "object", "properties": {}}
-}
-
-update_watchlist_declaration = {
-    "name": "update_watchlist",
-    "description": "Update the number of episodes watched for an anime in the watchlist.",
-    "parameters": {"type": "object", "properties": {}}
-}
-
-def search_anime_wrapper(title):
-    import sys
-    sys.argv = ["", ""] + title.split(" ")
-    search_anime()
-    return "Interactive anime search started."
-
-def read_light_novel_wrapper(title):
-    import sys
-    sys.argv = ["", ""] + title.split(" ")
-    read_light_novel()
-    return f"Searching for light novel '{title}'."
-
-def find_n_watch_anime(anime_title):
-    """Find and open an anime to watch."""
-    try:
-        watch_anime(anime_title)
-        return f"Opening anime '{anime_title}' to watch."
-    except Exception as e:
-        # If opening fails, try to search and fallback to the first result
-        search = AnimeSearch(anime_title)
-        if search.results:
-            first_result = search.results[0]
-            title = first_result.title
-            print(f"Could not open '{anime_title}'. However, I found: {title}")
-            watch_anime(title)
-            return f"Opening anime '{title}' to watch."
+from features.tool_registry import registry
+from features import chat_tools  # noqa: F401 - importing registers the chat tools
+from features.chat_history import load_tail, append_messages
+from features import profiling
+from features.profiling import span, traced
+
+# Declarations for every registered tool, grouped into a single Tool once.
+CHAT_TOOL = registry.gemini_tool()
+
+class MissingApiKeyError(Exception):
+    """Raised by prepare_chat() when GEMINI_API_KEY isn't set."""
+
+
+# Token budget for the history sent with each message. Older turns are folded
+# into a rolling summary once the recent ones no longer fit.
+CONTEXT_TOKEN_BUDGET = int(os.environ.get("CHAT_TOKEN_BUDGET", "8000"))
+# Rough characters-per-token ratio for Gemini models, used to count history
+# tokens locally instead of a count_tokens round trip per message.
+CHARS_PER_TOKEN = 4
+SUMMARY_PROMPT = (
+    "Summarize the conversation below between a user and an anime assistant in at most "
+    "150 words. Keep the user's stated preferences, titles mentioned, actions taken "
+    "(watchlist/readlist changes) and any instructions the assistant was given.\n\n"
+)
+
+
+def estimate_tokens(message):
+    """Estimates the number of tokens in a protos.Content message."""
+    chars = sum(len(str(type(part).to_dict(part))) for part in message.parts)
+    return max(1, chars // CHARS_PER_TOKEN)
+
+
+class ContextWindow:
+    """Keeps the history sent to Gemini within a token budget.
+
+    The full conversation is kept in `messages`. Before each send, the most
+    recent turns that fit in the budget are sent verbatim and everything older
+    is replaced by a summary, which is cached and only regenerated when the
+    window slides past more messages.
+    """
+
+    def __init__(self, summarizer, messages=None, budget=CONTEXT_TOKEN_BUDGET):
+        self.summarizer = summarizer
+        self.budget = budget
+        self.messages = list(messages or [])
+        self.tokens = [estimate_tokens(m) for m in self.messages]
+        self.summary = ""
+        self.summarized_upto = 0
+        self.last_stats = None
+        self._pending = None
+
+    @staticmethod
+    def _starts_turn(message):
+        # Only a user text message is a safe place to cut the history; a cut
+        # anywhere else could separate a function call from its response.
+        return message.role == "user" and any(part.text for part in message.parts)
+
+    def _split_point(self):
+        """Returns the index of the oldest message that still fits in the budget."""
+        available = self.budget - len(self.summary) // CHARS_PER_TOKEN
+        cut = None
+        used = 0
+        for i in range(len(self.messages) - 1, -1, -1):
+            used += self.tokens[i]
+            if used > available:
+                break
+            if self._starts_turn(self.messages[i]):
+                cut = i
+        if cut is None:
+            # Even the latest turn is over budget; send it whole anyway.
+            cut = next((i for i in range(len(self.messages) - 1, -1, -1)
+                        if self._starts_turn(self.messages[i])), 0)
+        return cut
+
+    def _refresh_summary(self, cut):
+        if cut <= self.summarized_upto:
+            return
+        lines = [f"Earlier summary: {self.summary}"] if self.summary else []
+        for message in self.messages[self.summarized_upto:cut]:
+            for part in message.parts:
+                if part.text:
+                    lines.append(f"{message.role}: {part.text}")
+                elif part.function_call.name:
+                    lines.append(f"{message.role} called {part.function_call.name}")
+        try:
+            with span("gemini.summarize"):
+                response = self.summarizer.generate_content(SUMMARY_PROMPT + "\n".join(lines))
+            self.summary = response.text.strip()
+            self.summarized_upto = cut
+        except Exception as e:
+            # Keep sending the unsummarized messages rather than losing them.
+            print(f"Could not summarize older messages: {e}")
+
+    def window(self):
+        """Returns the history to send: the summary (if any) plus recent turns."""
+        self._refresh_summary(self._split_point())
+        recent = self.messages[self.summarized_upto:]
+        if not self.summary:
+            return list(recent)
+        return [
+            {"role": "user", "parts": [{"text": f"Summary of our earlier conversation: {self.summary}"}]},
+            {"role": "model", "parts": [{"text": "Got it, I'll keep that in mind."}]},
+        ] + list(recent)
+
+    def stream(self, chat, content, prefix="assistant: "):
+        """Sends content with the budgeted history and returns a StreamedTurn.
+
+        Text is printed as it arrives while the caller iterates over the
+        turn's function calls.
+        """
+        self.finish_pending()
+        chat.history = self.window()
+        sent_history = len(chat.history)
+        estimated = sum(estimate_tokens(m) for m in chat.history)
+        started = time.perf_counter()
+        response = chat.send_message(content, stream=True)
+        self._pending = StreamedTurn(self, chat, response, sent_history, estimated, started, prefix)
+        return self._pending
+
+    def send(self, chat, content, prefix="assistant: "):
+        """Sends content and streams the reply text to the terminal until it is done."""
+        turn = self.stream(chat, content, prefix)
+        for _ in turn.function_calls():
+            pass
+        self.finish_pending()
+        return turn
+
+    def finish_pending(self):
+        """Waits for the turn in progress (if any) and records it."""
+        turn, self._pending = self._pending, None
+        if turn is not None:
+            turn.finish()
+
+    def record(self, chat, sent_history, estimated, response):
+        """Adds the turn's new messages to the full history and logs token usage."""
+        new_messages = chat.history[sent_history:]
+        self.messages.extend(new_messages)
+        self.tokens.extend(estimate_tokens(m) for m in new_messages)
+
+        usage = getattr(response, "usage_metadata", None)
+        self.last_stats = {
+            "history_messages": sent_history,
+            "history_tokens_estimated": estimated,
+            # Includes the new message and the tool declarations.
+            "prompt_tokens": getattr(usage, "prompt_token_count", None),
+            "summarized_messages": self.summarized_upto,
+        }
+        if os.environ.get("CHAT_SHOW_TOKENS"):
+            print(f"[context] prompt tokens: {self.last_stats['prompt_tokens']} "
+                  f"(history ~{estimated} tokens in {sent_history} messages, "
+                  f"{self.summarized_upto} older messages summarized, budget {self.budget})")
+
+
+class StreamedTurn:
+    """One streamed model reply.
+
+    Text chunks are printed as soon as they arrive. When a chunk carries a
+    function call, the rest of the stream is drained on a background thread so
+    the caller can start the tool right away instead of waiting for the model
+    to finish.
+    """
+
+    def __init__(self, context, chat, response, sent_history, estimated, started, prefix):
+        self.context = context
+        self.chat = chat
+        self.response = response
+        self.sent_history = sent_history
+        self.estimated = estimated
+        self.started = started
+        self.prefix = prefix
+        self.first_chunk_at = None
+        self.late_calls = []
+        self._chunks = iter(response)
+        self._line_open = False
+        self._late_text = []
+        self._drainer = None
+        self._finished = False
+
+    def _print_text(self, text):
+        if self.prefix is None:
+            # Quiet turn: the caller shows the reply text later.
+            return
+        if not self._line_open:
+            print(self.prefix, end="", flush=True)
+            self._line_open = True
+        print(text, end="", flush=True)
+
+    def _end_line(self):
+        if self._line_open:
+            print()
+            self._line_open = False
+
+    def _split(self, chunk):
+        if self.first_chunk_at is None:
+            self.first_chunk_at = time.perf_counter()
+        texts, calls = [], []
+        for candidate in chunk.candidates:
+            for part in candidate.content.parts:
+                if part.text:
+                    texts.append(part.text)
+                if part.function_call.name:
+                    calls.append(part)
+        return texts, calls
+
+    def _drain(self):
+        # Runs while a tool executes, so any text is buffered rather than
+        # printed into the middle of the tool's own output.
+        for chunk in self._chunks:
+            texts, calls = self._split(chunk)
+            self._late_text.extend(texts)
+            self.late_calls.extend(calls)
+
+    def function_calls(self):
+        """Yields function-call parts as soon as they are streamed."""
+        for chunk in self._chunks:
+            texts, calls = self._split(chunk)
+            for text in texts:
+                self._print_text(text)
+            if calls:
+                self._end_line()
+                self._drainer = threading.Thread(target=self._drain, daemon=True)
+                self._drainer.start()
+                yield from calls
+                self._drainer.join()
+                yield from self.late_calls
+                return
+
+    def finish(self):
+        """Consumes whatever is left of the stream and records the turn."""
+        if self._finished:
+            return
+        self._finished = True
+        if self._drainer is not None:
+            self._drainer.join()
         else:
-            return f"Could not find anime '{anime_title}'."
-
-        
-
+            self._drain()
+        for text in self._late_text:
+            self._print_text(text)
+        self._end_line()
+        finished = time.perf_counter()
+        profiling.record("gemini.turn", self.started * 1e6, finished * 1e6,
+                         first_token_ms=round(((self.first_chunk_at or finished) - self.started) * 1000))
+        self.context.record(self.chat, self.sent_history, self.estimated, self.response)
+        first = self.first_chunk_at or finished
+        self.context.last_stats["time_to_first_token_ms"] = round((first - self.started) * 1000)
+        self.context.last_stats["turn_ms"] = round((finished - self.started) * 1000)
+        if os.environ.get("CHAT_SHOW_LATENCY") and self.prefix is not None:
+            print(f"[latency] first token: {self.context.last_stats['time_to_first_token_ms']} ms, "
+                  f"turn: {self.context.last_stats['turn_ms']} ms")
+
+    @property
+    def text(self):
+        return self.response.text
+
+
+INITIAL_PROMPT = (
+    "You are an anime assistant. You can help users with many things"
+    "like adding anime to the watch list, searching and suggesting anime based on interests and automatically stop when user wants to quit. You can call functions to open an anime when the user requests it. " \
+    "dont answer after calling a function, these functions will handle the user requests. "
+    "To start, ask the user what types of anime they like?"
+)
+
+
+class ChatSession:
+    """A configured chat, ready for the user's first prompt."""
+
+    def __init__(self, chat, context, logged):
+        self.chat = chat
+        self.context = context
+        # Messages of the full history before this index are already in the log
+        self.logged = logged
+        # (prefix, text) replies from the opening exchange not yet shown
+        self.opening = []
+
+    def send(self, content, prefix="assistant: ", echo=True):
+        turn = self.context.send(self.chat, content, prefix if echo else None)
+        if not echo:
+            try:
+                self.opening.append((prefix, turn.text))
+            except ValueError:
+                # The reply was only a function call; there is no text to show.
+                pass
+        return turn
+
+    def show_opening(self):
+        for prefix, text in self.opening:
+            print(f"{prefix}{text}")
+        self.opening = []
+
+
+@traced("chat.prepare")
+def prepare_chat(echo=True):
+    """Configures Gemini, loads the history and runs the opening exchange.
+
+    Returns a ChatSession, and raises MissingApiKeyError when no API key is
+    set. With echo=False nothing is printed, so this can run on a background
+    thread while the user types; the opening replies are kept for
+    show_opening().
+    """
+    load_dotenv()
+    api_key = os.environ.get("GEMINI_API_KEY")
+    if not api_key:
+        raise MissingApiKeyError("Please create a .env file and add your GEMINI_API_KEY to it.")
+
+    endpoint = os.environ.get("GEMINI_API_ENDPOINT")
+    if endpoint:
+        # A proxy or a local stand-in server (see benchmarks/offline_bench.py).
+        genai.configure(api_key=api_key, transport="rest", client_options={"api_endpoint": endpoint})
+    else:
+        genai.configure(api_key=api_key)
 
-def save_user_like_genre(genres):
-    """Saves the user's liked genres to a JSON file."""
-    
-    # Load existing genres or create empty list
+    # Initialize model
+    model = genai.GenerativeModel(model_name="gemini-2.5-flash-lite", tools=[CHAT_TOOL])
+
+    # Load only the recent tail of the chat history log
+    with span("chat.load_history"):
+        initial_history_from_file = load_tail()
+    context = ContextWindow(genai.GenerativeModel(model_name="gemini-2.5-flash-lite"),
+                            initial_history_from_file)
+
+    if not initial_history_from_file:
+        # Start chat without history, then send the initial prompt
+        session = ChatSession(model.start_chat(), context, 0)
+        session.send(INITIAL_PROMPT, echo=echo)
+    else:
+        # Start chat with loaded history
+        session = ChatSession(model.start_chat(history=initial_history_from_file), context,
+                              len(initial_history_from_file))
+        # If there is history, show the last message so the user knows the state
+        last_message = session.chat.history[-1]
+        if last_message.role == 'model' and last_message.parts:
+            session.opening.append(("assistant (continuing): ", last_message.parts[0].text))
+        elif last_message.role == 'user' and last_message.parts:
+            # If the last message is from the user, wait for model response
+            session.send("...", prefix="assistant (continuing): ", echo=echo) # Send an empty message to trigger a response
+    if echo:
+        session.show_opening()
+    return session
+
+
+def chat_with_bot(first_prompt: str = None, session: ChatSession = None):
+    """Start a chat session with the anime assistant powered by Gemini.
+
+    A session prepared in the background by prepare_chat(echo=False) can be
+    passed in; otherwise it is prepared here.
+    """
     try:
-        with open("user_like_genre.json", 'r', encoding='utf-8') as f:
-            existing_genres = json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        existing_genres = []
+        print("Anime assistant is ready. You can start chatting.")
+        if session is None:
+            try:
+                session = prepare_chat()
+            except MissingApiKeyError as e:
+                print(e)
+                return
+        else:
+            session.show_opening()
+        chat, context = session.chat, session.context
 
-    # Convert new genres to strings and add only unique ones
-    for g in genres:
-        try:
-            genre = str(g)
-            if genre not in existing_genres:
-                existing_genres.append(genre)
-        except Exception:
-            continue
+        def send(content, prefix="assistant: "):
+            return context.send(chat, content, prefix)
 
-    try:
-        with open("user_like_genre.json", 'w', encoding='utf-8') as f:
-            json.dump(existing_genres, f, indent=4, ensure_ascii=False)
-        return "Your genre preferences have been saved."
-    except Exception as e:
-        print(f"Error saving genres: {e}")
-        return f"Failed to save genre preferences: {e}"
-def chat_with_bot(first_prompt: str = None):
-    """Start a chat session with the anime assistant powered by Gemini."""
-    try:
-        load_dotenv()
-        api_key = os.environ.get("GEMINI_API_KEY")
-        if not api_key:
-            print("Please create a .env file and add your GEMINI_API_KEY to it.")
-            return
+        # handle first prompt if provided
+        if first_prompt:
+            send(first_prompt)
 
-        genai.configure(api_key=api_key)
+        def log_new_messages():
+            context.finish_pending()
+            append_messages(context.messages[session.logged:])
+            session.logged = len(context.messages)
 
-        # Define tools
-        tools = [
-            types.Tool(function_declarations=[get_user_like_genre_func]),
-            types.Tool(function_declarations=[add_to_watchlist_declaration]),
-            types.Tool(function_declarations=[quit_func]),
-            types.Tool(function_declarations=[watch_anime_func])
-        ]
-
-        # Manga related function declarations for the model
-        add_to_readlist_declaration = {
-            "name": "add_to_readlist",
-            "description": "Add a manga to the readlist.",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "manga_title": {"type": "string", "description": "Title of the manga to add."}
-                },
-                "required": ["manga_title"]
-            }
-        }
-        list_readlist_declaration = {
-            "name": "list_readlist",
-            "description": "List items in the user's manga readlist.",
-            "parameters": {"type": "object", "properties": {}}
-        }
-        search_manga_declaration = {
-            "name": "search_manga",
-            "description": "Search for a manga by title.",
-            "parameters": {"type": "object", "properties": {"query": {"type": "string"}}, "required": ["query"]}
-        }
-        recommend_manga_declaration = {
-            "name": "recommend_manga",
-            "description": "Recommend manga based on a keyword or preferences. ",
-            "parameters": {"type": "object", "properties": {"keyword": {"type": "string"}}}
-        }
-
-        # add manga tools to toolset
-        tools.extend([
-            types.Tool(function_declarations=[add_to_readlist_declaration]),
-            types.Tool(function_declarations=[list_readlist_declaration]),
-            types.Tool(function_declarations=[search_manga_declaration]),
-            types.Tool(function_declarations=[recommend_manga_declaration]),
-            types.Tool(function_declarations=[search_anime_declaration]),
-            types.Tool(function_declarations=[read_light_novel_declaration]),
-            types.Tool(function_declarations=[list_genres_declaration]),
-            types.Tool(function_declarations=[remove_genre_declaration]),
-            types.Tool(function_declarations=[add_genre_declaration]),
-            types.Tool(function_declarations=[clear_genres_declaration]),
-            types.Tool(function_declarations=[recommend_anime_declaration]),
-            types.Tool(function_declarations=[list_watchlist_declaration]),
-            types.Tool(function_declarations=[update_watchlist_declaration]),
-        ])
-
-        # Initialize model
-        model = genai.GenerativeModel(model_name="gemini-2.5-flash-lite", tools=tools)
-
-        # Open chat history file
-        initial_history_from_file = []
-        try:
-            with open("history.json", 'r', encoding='utf-8') as f:
-                loaded_history = json.load(f)
-                # Convert loaded history to Message format
-                for item in loaded_history:
-                    role = item['role']
-                    parts = []
-                    for part_data in item['parts']:
-                        if isinstance(part_data, str):
-                            parts.append(part_data)
-                        elif isinstance(part_data, dict):
-                            if 'function_call' in part_data:
-                                fc_data = part_data['function_call']
-                                try:
-                                    parts.append(types.FunctionCall(name=fc_data['name'], args=fc_data['args']))
-                                except Exception as e:
-                                    print(f"Error loading FunctionCall from history: {e}")
-                                    continue
-                            elif 'function_response' in part_data:
-                                fr_data = part_data['function_response']
-                                parts.append(types.FunctionResponse(name=fr_data['name'], response=fr_data['response']))
-                    initial_history_from_file.append(types.Message(role=role, parts=parts))
-
-        except (FileNotFoundError, json.JSONDecodeError):
-            initial_history_from_file = []
+        log_new_messages()
 
-        print("Anime assistant is ready. You can start chatting.")
-
-        
-        if not initial_history_from_file:
-            initial_prompt = (
-                "You are an anime assistant. You can help users with many things"
-                "like adding anime to the watch list, searching and suggesting anime based on interests and automatically stop when user wants to quit. You can call functions to open an anime when the user requests it. " \
-                "dont answer after calling a function, these functions will handle the user requests. "
-                "To start, ask the user what types of anime they like?"
-            )
-            # Start chat without history, then send the initial prompt
-            chat = model.start_chat()
-            response = chat.send_message(initial_prompt)
-            print(f"assistant: {response.text}")
-            # first prompt handled here
-            if first_prompt:
-                response = chat.send_message(first_prompt)
-                print(f"assistant: {response.text}")
-            else:
-                # No first prompt, continue as normal
-                pass
-            # Chat manages its own history
-        else:
-            # Start chat with loaded history
-            chat = model.start_chat(history=initial_history_from_file)
-            # If there is history, print the last message so the user knows the state
-            if chat.history:
-                last_message = chat.history[-1]
-                if last_message.role == 'model' and last_message.parts:
-                    print(f"assistant (continuing): {last_message.parts[0].text}")
-                elif last_message.role == 'user' and last_message.parts:
-                     # If the last message is from the user, wait for model response
-                    response = chat.send_message("...") # Send an empty message to trigger a response
-                    print(f"assistant (continuing): {response.text}")
-            # handle first prompt if provided
-            if first_prompt:
-                response = chat.send_message(first_prompt)
-                print(f"assistant: {response.text}")
-            else:
-                # No first prompt, continue as normal
-                pass
-        
         while True:
             user_input = input("You: ")
             if user_input.lower() == 'quit':
                 print("Ending the chat. Goodbye!")
+                if os.environ.get("CHAT_SHOW_LATENCY"):
+                    for name, stats in registry.stats.items():
+                        if stats["calls"]:
+                            print(f"[tools] {name}: {stats['calls']} calls, {stats['errors']} errors, "
+                                  f"{stats['total_ms'] / stats['calls']:.0f} ms avg")
                 break
 
-            response = chat.send_message(user_input)
-            
+            response = context.stream(chat, user_input)
+
             # Handle function calls if present
             try:
-                # Check for function_call in response parts
-                function_call_handled = False
-                for part in response.parts:
-                    if hasattr(part, 'function_call') and part.function_call:
+                # Start each call as soon as it is streamed; calls sharing a
+                # resource still run in the order given.
+                with registry.batch() as batch:
+                    for part in response.function_calls():
                         fc = part.function_call
-                        function_name = fc.name
                         try:
-                            function_args = dict(fc.args) # Convert args to dict
+                            args = type(fc).to_dict(fc).get("args", {}) # Convert args to dict
                         except Exception as e:
                             print(f"Error parsing function_call args: {e}")
-                            break
-                        if function_name == "get_user_like_genre":
-                            genres = function_args.get("genres", [])
-                            result = save_user_like_genre(genres)
-                            print(f"assistant: {result}")
-                            # Send function result back to the model
-                            follow = chat.send_message([{"function_response": {"name": "get_user_like_genre", "response": {"result": result}}}])
-                            # Print the model's follow-up response immediately if present
-                            if getattr(follow, 'text', None):
-                                print(f"assistant: {follow.text}")
-                            function_call_handled = True
-                            break
-                        elif function_name == "add_to_watchlist_func":
-                            anime_title = function_args.get("anime_title", "")
-                            result = add_to_watchlist_func(anime_title)
-                            print(f"assistant: {result}")
-                            # Send function result back to the model
-                            follow = chat.send_message([{"function_response": {"name": "add_to_watchlist_func", "response": {"result": result}}}])
-                            if getattr(follow, 'text', None):
-                                print(f"assistant: {follow.text}")
-                            function_call_handled = True
-                            break
-                        elif function_name == "quit_chat":
-                            print("Assistant: Ending the chat per your request. Goodbye!")
-                            chat.send_message([{"function_response": {"name": "quit_chat", "response": {"result": "Chat ended by user request."}}}])
-                            function_call_handled = True
-                            return
-                        elif function_name == "watch_anime":
-                            anime_title = function_args.get("anime_title", "")
-                            result = find_n_watch_anime(anime_title)
-                            print(f"assistant: {result}")
-                            # Send function result back to the model
-                            follow = chat.send_message([{"function_response": {"name": "watch_anime", "response": {"result": "Watch anime sucsesful"}}}])
-                            if getattr(follow, 'text', None):
-                                print(f"assistant: {follow.text}")
-                            function_call_handled = True
-                            break
-                        elif function_name == "add_to_readlist":
-                            manga_title = function_args.get("manga_title", "")
-                            result = add_to_readlist(manga_title)
-                            print(f"assistant: {result}")
-                            follow = chat.send_message([{"function_response": {"name": "add_to_readlist", "response": {"result": result}}}])
-                            if getattr(follow, 'text', None):
-                                print(f"assistant: {follow.text}")
-                            function_call_handled = True
-                            break
-                        elif function_name == "list_readlist":
-                            # Execute list and send an empty response back
-                            list_readlist()
-                            follow = chat.send_message([{"function_response": {"name": "list_readlist", "response": {"result": "Listed readlist."}}}])
-                            if getattr(follow, 'text', None):
-                                print(f"assistant: {follow.text}")
-                            function_call_handled = True
-                            break
-                        elif function_name == "search_manga":
-                            query = function_args.get("query", "")
-                            # search_manga interacts with user; if a query provided, run search flow
-                            if query:
-                                # We'll call the simple search flow by opening the interactive search
-                                print("Running interactive manga search...")
-                                search_manga()
-                                follow = chat.send_message([{"function_response": {"name": "search_manga", "response": {"result": "Search completed."}}}])
-                                if getattr(follow, 'text', None):
-                                    print(f"assistant: {follow.text}")
-                            else:
-                                search_manga()
-                            function_call_handled = True
-                            break
-                        elif function_name == "recommend_manga":
-                            keyword = function_args.get("keyword", "")
-                            if keyword:
-                                print(f"Finding manga recommendations for: {keyword}")
-                            recommend_manga()
-                            follow = chat.send_message([{"function_response": {"name": "recommend_manga", "response": {"result": "Recommendations displayed."}}}])
-                            if getattr(follow, 'text', None):
-                                print(f"assistant: {follow.text}")
-                            function_call_handled = True
-                            break
-                        elif function_name == "search_anime_feature":
-                            title = function_args.get("title", "")
-                            result = search_anime_wrapper(title)
+                            continue
+                        batch.submit(fc.name, args)
+                    calls, results = batch.calls, batch.results()
+                if calls:
+                    for (function_name, _), result in zip(calls, results):
+                        # Structured results are summarized by the model's reply instead
+                        if function_name not in registry.ends_chat and isinstance(result, str):
                             print(f"assistant: {result}")
-                            follow = chat.send_message([{"function_response": {"name": "search_anime_feature", "response": {"result": result}}}])
-                            if getattr(follow, 'text', None):
-                                print(f"assistant: {follow.text}")
-                            function_call_handled = True
-                            break
-                        elif function_name == "read_light_novel_feature":
-                            title = function_args.get("title", "")
-                            result = read_light_novel_wrapper(title)
-                            print(f"assistant: {result}")
-                            follow = chat.send_message([{"function_response": {"name": "read_light_novel_feature", "response": {"result": result}}}])
-                            if getattr(follow, 'text', None):
-                                print(f"assistant: {follow.text}")
-                            function_call_handled = True
-                            break
-                        elif function_name == "list_genres":
-                            list_genres()
-                            result = "Listed user's preferred genres."
-                            print(f"assistant: {result}")
-                            follow = chat.send_message([{"function_response": {"name": "list_genres", "response": {"result": result}}}])
-                            if getattr(follow, 'text', None):
-                                print(f"assistant: {follow.text}")
-                            function_call_handled = True
-                            break
-                        elif function_name == "remove_genre":
-                            remove_genre()
-                            result = "Interactive genre removal started."
-                            print(f"assistant: {result}")
-                            follow = chat.send_message([{"function_response": {"name": "remove_genre", "response": {"result": result}}}])
-                            if getattr(follow, 'text', None):
-                                print(f"assistant: {follow.text}")
-                            function_call_handled = True
-                            break
-                        elif function_name == "add_genre":
-                            add_genre()
-                            result = "Interactive genre adding started."
-                            print(f"assistant: {result}")
-                            follow = chat.send_message([{"function_response": {"name": "add_genre", "response": {"result": result}}}])
-                            if getattr(follow, 'text', None):
-                                print(f"assistant: {follow.text}")
-                            function_call_handled = True
-                            break
-                        elif function_name == "clear_genres":
-                            clear_genres()
-                            result = "Cleared all preferred genres."
-                            print(f"assistant: {result}")
-                            follow = chat.send_message([{"function_response": {"name": "clear_genres", "response": {"result": result}}}])
-                            if getattr(follow, 'text', None):
-                                print(f"assistant: {follow.text}")
-                            function_call_handled = True
-                            break
-                        elif function_name == "recommend_anime":
-                            recommend_anime()
-                            result = "Anime recommendation process started."
-                            print(f"assistant: {result}")
-                            follow = chat.send_message([{"function_response": {"name": "recommend_anime", "response": {"result": result}}}])
-                            if getattr(follow, 'text', None):
-                                print(f"assistant: {follow.text}")
-                            function_call_handled = True
-                            break
-                        elif function_name == "list_watchlist":
-                            list_watchlist()
-                            result = "Listed anime in watchlist."
-                            print(f"assistant: {result}")
-                            follow = chat.send_message([{"function_response": {"name": "list_watchlist", "response": {"result": result}}}])
-                            if getattr(follow, 'text', None):
-                                print(f"assistant: {follow.text}")
-                            function_call_handled = True
-                            break
-                        elif function_name == "update_watchlist":
-                            update_watchlist()
-                            result = "Interactive watchlist update process started."
-                            print(f"assistant: {result}")
-                            follow = chat.send_message([{"function_response": {"name": "update_watchlist", "response": {"result": result}}}])
-                            if getattr(follow, 'text', None):
-                                print(f"assistant: {follow.text}")
-                            function_call_handled = True
-                            break
-                        else:
-                            print(f"assistant called an unknown function: {function_name}")
-                            function_call_handled = True
-                            break
-
-                # If no function call was handled and there is text, print assistant text
-                if not function_call_handled and response.text:
-                    print(f"assistant: {response.text}")
+                    # Send all function results back to the model in one message
+                    send([{"function_response": {"name": name, "response": {"result": result}}}
+                          for (name, _), result in zip(calls, results)])
+                    if any(name in registry.ends_chat for name, _ in calls):
+                        log_new_messages()
+                        return
+
+                # Text replies were already printed while streaming
+                context.finish_pending()
 
             except Exception as e:
                 print(f"Error handling function_call or text response: {e}")
-                if response.text: # Print text if there was an error in function_call handling
-                    print(f"assistant: {response.text}")
-
-        # Save full conversation history before exiting
-        final_history = chat.history
-        serialized_history = []
-        for message in final_history:
-            parts_list = []
-            for part in message.parts:
-                if isinstance(part, str):
-                    parts_list.append(part)
-                
-                #elif isinstance(part, types.FunctionCalled):
-                #    parts_list.append({"function_call": {"name": part.name, "args": dict(part.args)}})
-                #
-                #elif isinstance(part, types.FunctionResponse):
-                #    parts_list.append({"function_response": {"name": part.name, "response": part.response}})
-                else:
-                    # Handle other part types if present
-                    parts_list.append(str(part)) # Fallback to store as string
-            serialized_history.append({"role": message.role, "parts": parts_list})
-
-        with open("history.json", 'w', encoding='utf-8') as f:
-            json.dump(serialized_history, f, ensure_ascii=False, indent=4)
-            print("Chat history saved to 'history.json'.")
+
+            # Append this turn to the history log as soon as it completes
+            log_new_messages()
+
     except Exception as e:
         print(f"An error occurred: {e}")
 
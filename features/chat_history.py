@@ -0,0 +1,127 @@
+"""Append-only JSONL log of the chat history.
+
+Each message is written as one JSON line as soon as its turn completes, so a
+crash loses at most the turn in progress and nothing is ever rewritten.
+Function calls and responses are stored as structured parts and load back
+as real function_call/function_response parts. On startup only the tail of
+the log is read, by seeking backwards from the end of the file.
+"""
+
+import json
+import os
+
+from google.generativeai import protos
+
+HISTORY_FILE = "history.jsonl"
+LEGACY_HISTORY_FILE = "history.json"
+# Messages replayed into a new chat session at most.
+TAIL_MESSAGES = 200
+_BLOCK_SIZE = 64 * 1024
+
+
+def serialize_message(message):
+    """Converts a protos.Content (or a plain dict) into a JSON-safe dict."""
+    if isinstance(message, dict):
+        return message
+    return type(message).to_dict(message)
+
+
+def deserialize_message(data):
+    """Rebuilds a protos.Content from a dict written by serialize_message()."""
+    return protos.Content(data)
+
+
+def append_messages(messages, path=HISTORY_FILE):
+    """Appends messages to the log, one JSON line each, and flushes them to disk."""
+    if not messages:
+        return
+    lines = "".join(json.dumps(serialize_message(m), ensure_ascii=False) + "\n" for m in messages)
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(lines)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def _read_tail_lines(path, count):
+    """Returns up to the last count lines of a file, reading it backwards in blocks."""
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        position = f.tell()
+        buffer = b""
+        while position > 0 and buffer.count(b"\n") <= count:
+            step = min(_BLOCK_SIZE, position)
+            position -= step
+            f.seek(position)
+            buffer = f.read(step) + buffer
+    lines = buffer.splitlines()
+    # Unless we reached the start of the file, the first line may be partial.
+    if position > 0:
+        lines = lines[1:]
+    return [line.decode('utf-8', errors='replace') for line in lines[-count:]]
+
+
+def _starts_turn(data):
+    """True for a user message with text, i.e. a safe place to start a history."""
+    return data.get("role") == "user" and any("text" in part for part in data.get("parts", []))
+
+
+def load_tail(max_messages=TAIL_MESSAGES, path=HISTORY_FILE):
+    """Returns the most recent messages of the log as protos.Content objects."""
+    migrate_legacy_history(path)
+    try:
+        lines = _read_tail_lines(path, max_messages)
+    except FileNotFoundError:
+        return []
+
+    messages = []
+    for line in lines:
+        try:
+            messages.append(json.loads(line))
+        except json.JSONDecodeError:
+            # A line cut short by a crash mid-write; skip it.
+            continue
+
+    # Gemini expects the history to open with a user turn, and a function
+    # response must follow its call, so drop anything before the first one.
+    while messages and not _starts_turn(messages[0]):
+        messages.pop(0)
+    return [deserialize_message(m) for m in messages]
+
+
+def _recover_text(part):
+    """Recovers the text of a part stored by old versions with str(part)."""
+    part = part.strip()
+    if part.startswith(("function_call", "function_response")):
+        # The protobuf text dump of a function part can't be loaded back.
+        return None
+    if part.startswith("text: "):
+        try:
+            return json.loads(part[len("text: "):])
+        except json.JSONDecodeError:
+            return part[len("text: "):].strip('"')
+    return part
+
+
+def migrate_legacy_history(path=HISTORY_FILE):
+    """Converts the old whole-file history.json into the JSONL log, once."""
+    if os.path.exists(path) or not os.path.exists(LEGACY_HISTORY_FILE):
+        return
+    try:
+        with open(LEGACY_HISTORY_FILE, 'r', encoding='utf-8') as f:
+            legacy = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return
+
+    messages = []
+    for item in legacy if isinstance(legacy, list) else []:
+        parts = []
+        for part in item.get("parts", []):
+            if isinstance(part, dict) and ("function_call" in part or "function_response" in part):
+                parts.append(part)
+            elif isinstance(part, str):
+                text = _recover_text(part)
+                if text is not None:
+                    parts.append({"text": text})
+        if parts and item.get("role") in ("user", "model"):
+            messages.append({"role": item["role"], "parts": parts})
+    append_messages(messages, path)
@@ -0,0 +1,234 @@
+"""Functions the chat assistant can call.
+
+Each tool is registered with @tool; its Gemini declaration is generated from
+the signature and docstring, so adding a tool only means adding a function
+here. Tools that prompt the user claim the "terminal" resource and tools that
+change a data store claim its name, so parallel calls never interleave them.
+
+Lookup tools run headless and return the data itself (titles, ids, scores,
+progress) so the model can act on it in the same turn. Their results are
+capped by capped_results() to keep the chat context small.
+"""
+
+import json
+
+from features.tool_registry import tool
+from features.watch_list import add_to_watchlist_func, update_watchlist, watchlist_summary
+from features.watch_anime import watch_anime
+from features.manga_manager import add_to_readlist, readlist_summary, search_manga_results, recommend_manga
+from features.genre_manager import add_genre, clear_genres, remove_genre
+from features.rcm_system import recommend_anime_results
+from features.read_light_novel import read_light_novel
+from features.search_anime import search_anime_results
+from features.search_backend import search_titles
+from features import storage
+
+# Upper bounds on what one tool result adds to the chat history.
+MAX_TOOL_RESULTS = 10
+MAX_RESULT_CHARS = 2000
+
+
+def capped_results(items, limit=MAX_TOOL_RESULTS):
+    """Wraps a list of result dicts, trimmed to limit items and MAX_RESULT_CHARS."""
+    total = len(items)
+    items = list(items[:max(1, min(int(limit or MAX_TOOL_RESULTS), MAX_TOOL_RESULTS))])
+    while items and len(json.dumps(items, ensure_ascii=False)) > MAX_RESULT_CHARS:
+        items.pop()
+    return {"total": total, "returned": len(items), "items": items}
+
+
+def read_light_novel_wrapper(title):
+    read_light_novel(title)
+    return f"Searching for light novel '{title}'."
+
+
+def find_n_watch_anime(anime_title):
+    """Find and open an anime to watch."""
+    try:
+        watch_anime(anime_title)
+        return f"Opening anime '{anime_title}' to watch."
+    except Exception as e:
+        # If opening fails, try to search and fallback to the first result
+        results = search_titles(anime_title)
+        if results:
+            title = results[0]["title"]
+            print(f"Could not open '{anime_title}'. However, I found: {title}")
+            watch_anime(title)
+            return f"Opening anime '{title}' to watch."
+        else:
+            return f"Could not find anime '{anime_title}'."
+
+
+def save_user_like_genre(genres):
+    """Saves the user's liked genres to the data store."""
+
+    # Convert new genres to strings; the store only adds unique ones
+    new_genres = []
+    for g in genres:
+        try:
+            new_genres.append(str(g))
+        except Exception:
+            continue
+
+    try:
+        storage.add_genres(new_genres)
+        return "Your genre preferences have been saved."
+    except Exception as e:
+        print(f"Error saving genres: {e}")
+        return f"Failed to save genre preferences: {e}"
+
+
+@tool(name="get_user_like_genre", resources=("genres",))
+def get_user_like_genre_tool(genres: list[str]):
+    """Get the anime genres the user likes.
+
+    Args:
+        genres: List of genres the user likes.
+    """
+    return save_user_like_genre(genres)
+
+
+@tool(name="add_to_watchlist_func", resources=("watchlist",))
+def add_to_watchlist_tool(anime_title: str):
+    """Add an anime to the watchlist.
+
+    Args:
+        anime_title: The title of the anime to add to the watchlist.
+    """
+    return add_to_watchlist_func(anime_title, resolve_in_background=True)
+
+
+@tool(name="quit_chat", ends_chat=True)
+def quit_chat_tool():
+    """End the chat session with the anime assistant."""
+    print("Assistant: Ending the chat per your request. Goodbye!")
+    return "Chat ended by user request."
+
+
+@tool(name="watch_anime", resources=("terminal",))
+def watch_anime_tool(anime_title: str):
+    """Start watching an anime.
+
+    Args:
+        anime_title: The title of the anime to watch.
+    """
+    return find_n_watch_anime(anime_title)
+
+
+@tool(name="add_to_readlist", resources=("readlist",))
+def add_to_readlist_tool(manga_title: str):
+    """Add a manga to the readlist.
+
+    Args:
+        manga_title: Title of the manga to add.
+    """
+    return add_to_readlist(manga_title, resolve_in_background=True)
+
+
+@tool(name="list_readlist")
+def list_readlist_tool(limit: int = MAX_TOOL_RESULTS):
+    """List the manga in the user's readlist with their reading progress.
+
+    Args:
+        limit: Maximum number of entries to return.
+    """
+    return capped_results(readlist_summary(), limit)
+
+
+@tool(name="search_manga")
+def search_manga_tool(query: str, limit: int = MAX_TOOL_RESULTS):
+    """Search for a manga by title and return matching titles with scores.
+
+    Args:
+        query: The manga title to search for.
+        limit: Maximum number of results to return.
+    """
+    return capped_results(search_manga_results(query, MAX_TOOL_RESULTS), limit)
+
+
+@tool(name="recommend_manga", resources=("terminal",))
+def recommend_manga_tool(keyword: str = ""):
+    """Recommend manga based on a keyword or preferences.
+
+    Args:
+        keyword: Optional keyword to base the recommendations on.
+    """
+    if keyword:
+        print(f"Finding manga recommendations for: {keyword}")
+    recommend_manga()
+    return "Recommendations displayed."
+
+
+@tool(name="search_anime_feature")
+def search_anime_tool(title: str, limit: int = MAX_TOOL_RESULTS):
+    """Search for an anime and return matching titles with scores and MyAnimeList ids.
+
+    Args:
+        title: The title of the anime to search for.
+        limit: Maximum number of results to return.
+    """
+    return capped_results(search_anime_results(title, MAX_TOOL_RESULTS), limit)
+
+
+@tool(name="read_light_novel_feature", resources=("terminal",))
+def read_light_novel_tool(title: str):
+    """Search for a light novel to read.
+
+    Args:
+        title: The title of the light novel.
+    """
+    return read_light_novel_wrapper(title)
+
+
+@tool(name="list_genres")
+def list_genres_tool():
+    """List the user's preferred anime genres."""
+    return {"genres": storage.list_genres()}
+
+
+@tool(name="remove_genre", resources=("terminal", "genres"))
+def remove_genre_tool():
+    """Remove a genre from the user's preferred anime genres."""
+    remove_genre()
+    return "Interactive genre removal started."
+
+
+@tool(name="add_genre", resources=("terminal", "genres"))
+def add_genre_tool():
+    """Add a genre to the user's preferred anime genres."""
+    add_genre()
+    return "Interactive genre adding started."
+
+
+@tool(name="clear_genres", resources=("genres",))
+def clear_genres_tool():
+    """Clear all of the user's preferred anime genres."""
+    clear_genres()
+    return "Cleared all preferred genres."
+
+
+@tool(name="recommend_anime")
+def recommend_anime_tool(limit: int = MAX_TOOL_RESULTS):
+    """Recommend anime based on the user's liked genres and watchlist.
+
+    Args:
+        limit: Maximum number of recommendations to return.
+    """
+    return capped_results(recommend_anime_results(MAX_TOOL_RESULTS), limit)
+
+
+@tool(name="list_watchlist")
+def list_watchlist_tool(limit: int = MAX_TOOL_RESULTS):
+    """List the anime in the user's watchlist with the episodes watched.
+
+    Args:
+        limit: Maximum number of entries to return.
+    """
+    return capped_results(watchlist_summary(), limit)
+
+
+@tool(name="update_watchlist", resources=("terminal", "watchlist"))
+def update_watchlist_tool():
+    """Update the number of episodes watched for an anime in the watchlist."""
+    update_watchlist()
+    return "Interactive watchlist update process started."
@@ -0,0 +1,138 @@
+"""Optional resident daemon that runs non-interactive commands for main.py.
+
+`python main.py --daemon` keeps one interpreter alive on a Unix domain socket
+in the working directory, with the feature modules imported, the data store
+open and the AniList connection pool warm. main.py then forwards commands
+such as `-l` and `-a` to it and streams the output back, and runs them
+in-process as before when no daemon is listening.
+
+The protocol is one JSON line from the client ({"argv": [...]}) followed by
+the command's raw output from the daemon until it closes the connection.
+"""
+
+import io
+import json
+import os
+import signal
+import socket
+import sys
+
+SOCKET_FILE = ".anime-daemon.sock"
+_CHUNK = 64 * 1024
+
+
+def forward(argv, path=SOCKET_FILE):
+    """Runs argv on the daemon and copies its output to stdout.
+
+    Returns False, without side effects, when no daemon is listening.
+    """
+    if not os.path.exists(path):
+        return False
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.connect(path)
+    except OSError:
+        client.close()
+        return False
+    with client:
+        client.sendall(json.dumps({"argv": argv}).encode("utf-8") + b"\n")
+        client.shutdown(socket.SHUT_WR)
+        out = sys.stdout.buffer
+        while True:
+            chunk = client.recv(_CHUNK)
+            if not chunk:
+                break
+            out.write(chunk)
+            out.flush()
+    return True
+
+
+class _SocketWriter(io.TextIOBase):
+    """Text stream that sends everything written to it to a client socket."""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.closed_by_client = False
+
+    def writable(self):
+        return True
+
+    def write(self, text):
+        if not self.closed_by_client:
+            try:
+                self.conn.sendall(text.encode("utf-8"))
+            except OSError:
+                # The client went away (e.g. Ctrl-C); finish the command quietly.
+                self.closed_by_client = True
+        return len(text)
+
+
+def _warm_up():
+    """Imports the feature modules and opens the connections commands reuse."""
+    from features import storage
+    from features.anilist_client import get_session
+    from features import watch_list, catalog_index  # noqa: F401
+    storage.list_entries("watchlist")
+    get_session()
+
+
+def _remove_stale_socket(path):
+    """Removes a socket left behind by a daemon that is no longer running."""
+    if not os.path.exists(path):
+        return True
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(path)
+    except OSError:
+        os.unlink(path)
+        return True
+    finally:
+        probe.close()
+    return False
+
+
+def _stop(signum, frame):
+    raise KeyboardInterrupt
+
+
+def serve(commands, remote_commands, path=SOCKET_FILE):
+    """Serves remote_commands from the commands table until interrupted.
+
+    Requests are handled one at a time, since each one temporarily redirects
+    this process's stdout and stderr to its client.
+    """
+    import socketserver
+    from contextlib import redirect_stderr, redirect_stdout
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            try:
+                argv = json.loads(self.rfile.readline())["argv"]
+            except (ValueError, KeyError, TypeError):
+                return
+            writer = _SocketWriter(self.connection)
+            with redirect_stdout(writer), redirect_stderr(writer):
+                if not argv or argv[0] not in remote_commands:
+                    print(f"The daemon can't run {argv[:1]}; run it without the daemon.")
+                    return
+                try:
+                    commands[argv[0]](argv[1:])
+                except Exception as e:
+                    print(f"An error occurred: {e}")
+
+    if not _remove_stale_socket(path):
+        print(f"A daemon is already listening on {path}.")
+        return
+    _warm_up()
+    # Stop cleanly, removing the socket, on `kill` as well as on Ctrl-C.
+    signal.signal(signal.SIGTERM, _stop)
+    with socketserver.UnixStreamServer(path, Handler) as server:
+        os.chmod(path, 0o600)
+        print(f"Daemon listening on {path} (Ctrl-C to stop).")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            os.unlink(path)
+    print("Daemon stopped.")
@@ -0,0 +1,144 @@
+"""AniList metadata for watchlist and readlist entries.
+
+When a title is added, it is resolved once to its AniList id, genres, episode
+(or chapter) count, format and cover image, and those fields are stored with
+the entry. The lookup runs on a background thread so adding stays instant. If
+the process exits before the lookup finishes, or AniList is unreachable, the
+entry is resolved lazily the next time recommendations need it, or by
+`python main.py --backfill`. Code that reads the lists then uses the stored
+fields without any network calls.
+"""
+
+import threading
+from functools import partial
+
+from features import storage
+from features.anilist_client import post_query, only_not_found, data_or_raise
+from features.cache import cache_get, cache_set
+from features.fetcher import fetch_concurrently
+from features.profiling import traced
+from features.title_index import remember
+
+# AniList rejects documents above its query-complexity limit, so large lists
+# are split into several aliased requests of this size.
+BATCH_SIZE = 25
+MEDIA_TYPES = {"watchlist": "ANIME", "readlist": "MANGA"}
+MEDIA_FIELDS = "id title { romaji english } genres episodes chapters format coverImage { large }"
+
+
+def _metadata(media):
+    """Turns an AniList Media object into the fields stored with an entry."""
+    return {
+        "anilist_id": media["id"],
+        "genres": media.get("genres") or [],
+        "episodes": media.get("episodes") if media.get("episodes") is not None else media.get("chapters"),
+        "format": media.get("format"),
+        "cover": (media.get("coverImage") or {}).get("large"),
+    }
+
+
+@traced("enrich.resolve")
+def resolve_titles(titles, media_type="ANIME", batch_size=BATCH_SIZE, quiet=False, retry_unmatched=False):
+    """Resolves titles to entry metadata with batched, aliased AniList queries.
+
+    Returns a dict mapping each title to its metadata, or to None when AniList
+    has no match. Titles whose batch failed (e.g. no network) are left out.
+    With retry_unmatched, titles cached as having no match are asked again.
+    """
+    resolved = {}
+    missing = []
+    for title in dict.fromkeys(titles):
+        hit, metadata = cache_get(f"anilist:metadata:{media_type}", title)
+        if hit and (metadata or not retry_unmatched):
+            resolved[title] = metadata or None
+        else:
+            missing.append(title)
+
+    def fetch_chunk(chunk):
+        params = ", ".join(f"$s{i}: String" for i in range(len(chunk)))
+        fields = "\n".join(
+            f"  m{i}: Media(search: $s{i}, type: {media_type}) {{ {MEDIA_FIELDS} }}" for i in range(len(chunk))
+        )
+        data = post_query(f"query ({params}) {{\n{fields}\n}}", {f"s{i}": title for i, title in enumerate(chunk)})
+        return data_or_raise(data), only_not_found(data)
+
+    chunks = [tuple(missing[start:start + batch_size]) for start in range(0, len(missing), batch_size)]
+    for chunk, result, error in fetch_concurrently({chunk: partial(fetch_chunk, chunk) for chunk in chunks}):
+        if error is not None:
+            if not quiet:
+                print(f"Could not look up {len(chunk)} titles on AniList: {error}")
+            continue
+        # Titles without a match come back as null aliases. If errors other
+        # than "Not Found" came with them, a null alias may be a failure, so
+        # it is left out like a failed batch instead of cached as no match.
+        data, not_found = result
+        names = []
+        for i, title in enumerate(chunk):
+            media = data.get(f"m{i}")
+            if not media and not not_found:
+                continue
+            metadata = _metadata(media) if media else None
+            resolved[title] = metadata
+            cache_set(f"anilist:metadata:{media_type}", title, metadata or {})
+            if media:
+                # Lets local searches find the entry by its romaji or English name too.
+                names.append({"title": title, "aliases": list((media.get("title") or {}).values()),
+                              "anilist_id": media["id"]})
+        remember(names, media_type)
+    return resolved
+
+
+def _needs_lookup(entry, include_unmatched):
+    if "anilist_id" not in entry:
+        return True
+    return include_unmatched and entry["anilist_id"] is None
+
+
+def enrich_list(name, titles=None, include_unmatched=False, quiet=False):
+    """Stores metadata for entries of a list that don't have it yet.
+
+    Only the given titles are considered when titles is set, and entries
+    AniList had no match for are only looked up again with include_unmatched.
+    Returns the number of entries updated.
+    """
+    wanted = None if titles is None else {storage.normalize_title(t) for t in titles}
+    pending = [
+        entry["title"] for entry in storage.list_entries(name)
+        if _needs_lookup(entry, include_unmatched)
+        and (wanted is None or storage.normalize_title(entry["title"]) in wanted)
+    ]
+    if not pending:
+        return 0
+    resolved = resolve_titles(pending, MEDIA_TYPES[name], quiet=quiet, retry_unmatched=include_unmatched)
+    # Unmatched titles are stored with anilist_id None so they aren't looked up
+    # again on every run; --backfill tries them once more.
+    updates = {title: metadata or {"anilist_id": None} for title, metadata in resolved.items()}
+    return storage.update_entries(name, updates)
+
+
+def enrich_in_background(name, title):
+    """Resolves one newly added entry on a daemon thread, without printing."""
+    def run():
+        try:
+            enrich_list(name, [title], quiet=True)
+        except Exception:
+            # Best effort: the entry is resolved lazily later instead.
+            pass
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread
+
+
+def entries_with_metadata(name):
+    """Returns the entries of a list, resolving any that lack metadata first."""
+    entries = storage.list_entries(name)
+    if any("anilist_id" not in entry for entry in entries):
+        enrich_list(name)
+        entries = storage.list_entries(name)
+    return entries
+
+
+def backfill():
+    """Resolves every stored entry without metadata; returns {list: entries updated}."""
+    return {name: enrich_list(name, include_unmatched=True) for name in MEDIA_TYPES}
@@ -0,0 +1,36 @@
+"""Bounded-concurrency executor for independent network requests."""
+
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# Upper bound on simultaneous requests; AniList allows ~90 requests/minute, so
+# a handful of workers is plenty and keeps us clear of the rate limiter.
+MAX_CONCURRENCY = int(os.environ.get("ANIME_MAX_CONCURRENCY", "4"))
+
+
+def fetch_concurrently(tasks, max_workers=None):
+    """Runs independent zero-argument callables in parallel.
+
+    tasks is a dict of key -> callable. Yields (key, result, error) tuples in
+    completion order, with error set to the raised exception (and result None)
+    when a task fails, so one failing request doesn't cancel the rest.
+    """
+    if not tasks:
+        return
+    workers = max(1, min(max_workers or MAX_CONCURRENCY, len(tasks)))
+    if workers == 1:
+        for key, task in tasks.items():
+            try:
+                yield key, task(), None
+            except Exception as e:
+                yield key, None, e
+        return
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(task): key for key, task in tasks.items()}
+        for future in as_completed(futures):
+            key = futures[future]
+            try:
+                yield key, future.result(), None
+            except Exception as e:
+                yield key, None, e
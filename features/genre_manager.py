@@ -14,17 +14,13 @@ limitations under the License."""
 
 
 from simple_term_menu import TerminalMenu
-import json
-from mal import AnimeSearch
+from features import storage
+from features.autocomplete import input_genre
 def list_genres():
     """
-    This function lists the user's preferred genres stored in 'user_like_genre.json'.
+    This function lists the user's preferred genres from the data store.
     """
-    try:
-        with open("user_like_genre.json", 'r') as f:
-            selected_genres = json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        selected_genres = []
+    selected_genres = storage.list_genres()
 
     if selected_genres:
         print("Your preferred genres are:")
@@ -34,53 +30,34 @@ def list_genres():
         print("You have no preferred genres saved.")
 def remove_genre():
     list_genres()
-    genre_to_remove = input("Enter the genre you want to remove: ").strip()
+    genre_to_remove = input_genre("Enter the genre you want to remove: ", only_liked=True).strip()
     if not genre_to_remove:
         print("No genre entered. Operation cancelled.")
         return
     """
-    This function removes a genre from the user's preferred genres list stored in 'user_like_genre.json'.
+    This function removes a genre from the user's preferred genres list in the data store.
     """
-    try:
-        with open("user_like_genre.json", 'r') as f:
-            selected_genres = json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        selected_genres = []
-
-    if genre_to_remove in selected_genres:
-        selected_genres.remove(genre_to_remove)
-        with open("user_like_genre.json", 'w') as f:
-            json.dump(selected_genres, f)
+    if storage.remove_genre(genre_to_remove):
         print(f"Removed genre: {genre_to_remove}")
     else:
         print(f"Genre '{genre_to_remove}' not found in your preferences.")
 def add_genre():
     list_genres()
-    genre_to_add = input("Enter the genre you want to add: ").strip()
+    genre_to_add = input_genre("Enter the genre you want to add: ").strip()
     if not genre_to_add:
         print("No genre entered. Operation cancelled.")
         return
     """
-    This function adds a genre to the user's preferred genres list stored in 'user_like_genre.json'.
+    This function adds a genre to the user's preferred genres list in the data store.
     """
-    try:
-        with open("user_like_genre.json", 'r') as f:
-            selected_genres = json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        selected_genres = []
-
-    if genre_to_add not in selected_genres:
-        selected_genres.append(genre_to_add)
-        with open("user_like_genre.json", 'w') as f:
-            json.dump(selected_genres, f)
+    if storage.add_genres([genre_to_add]):
         print(f"Added genre: {genre_to_add}")
     else:
         print(f"Genre '{genre_to_add}' is already in your preferences.")
 
 def clear_genres():
     """
-    This function clears all genres from the user's preferred genres list stored in 'user_like_genre.json'.
+    This function clears all genres from the user's preferred genres list in the data store.
     """
-    with open("user_like_genre.json", 'w') as f:
-        json.dump([], f)
+    storage.clear_genres()
     print("Cleared all preferred genres.")
\ No newline at end of file
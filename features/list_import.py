@@ -0,0 +1,202 @@
+"""Bulk import of MyAnimeList and AniList list exports.
+
+Both formats are parsed as a stream, one entry at a time, so memory stays
+flat however large the export is:
+
+- MyAnimeList XML exports (optionally .gz) go through lxml's iterparse, and
+  every <anime>/<manga> element is freed as soon as it has been read;
+- AniList JSON exports (a MediaListCollection with "entries" arrays, or a
+  plain array of entries) are read in blocks and decoded one entry object at
+  a time with json's raw_decode.
+
+The parsed entries feed a single storage transaction. The unique index on
+(list, normalized title) drops titles already on the list, and duplicates
+inside the file, as they are inserted, so nothing is read back or rewritten.
+Anime entries go to the watchlist and manga entries to the readlist.
+"""
+
+import gzip
+import json
+
+from features import storage, title_index
+from features.profiling import traced
+
+_BLOCK_SIZE = 256 * 1024
+
+
+def _open(path, text=False):
+    """Opens a file, transparently decompressing gzip (detected by its magic bytes)."""
+    with open(path, "rb") as f:
+        opener = gzip.open if f.read(2) == b"\x1f\x8b" else open
+    if text:
+        return opener(path, "rt", encoding="utf-8-sig")
+    return opener(path, "rb")
+
+
+def _int(text, default=0):
+    try:
+        return int(text)
+    except (TypeError, ValueError):
+        return default
+
+
+def iter_mal_xml(path):
+    """Yields (list name, entry) pairs from a MyAnimeList XML export."""
+    from lxml import etree
+
+    with _open(path) as f:
+        for _, elem in etree.iterparse(f, events=("end",), tag=("anime", "manga")):
+            fields = {child.tag: (child.text or "").strip() for child in elem}
+            if elem.tag == "anime":
+                entry = {
+                    "title": fields.get("series_title", ""),
+                    "episodes_watched": _int(fields.get("my_watched_episodes")),
+                    "mal_id": _int(fields.get("series_animedb_id"), None),
+                    "status": fields.get("my_status") or None,
+                }
+                if _int(fields.get("series_episodes")):
+                    entry["episodes"] = _int(fields.get("series_episodes"))
+                yield "watchlist", entry
+            else:
+                yield "readlist", {
+                    "title": fields.get("manga_title", ""),
+                    "progress": str(_int(fields.get("my_read_chapters"))),
+                    "mal_id": _int(fields.get("manga_mangadb_id"), None),
+                    "status": fields.get("my_status") or None,
+                }
+            # Free the element and everything parsed before it.
+            elem.clear(keep_tail=True)
+            while elem.getprevious() is not None:
+                del elem.getparent()[0]
+
+
+def _iter_json_objects(f):
+    """Yields the objects of every "entries" array (or a top-level array) in a JSON stream."""
+    decoder = json.JSONDecoder()
+    buffer = f.read(_BLOCK_SIZE)
+    pos = 0
+    eof = not buffer
+
+    def fill():
+        nonlocal buffer, pos, eof
+        chunk = f.read(_BLOCK_SIZE)
+        if not chunk:
+            eof = True
+            return False
+        buffer = buffer[pos:] + chunk
+        pos = 0
+        return True
+
+    def skip_space():
+        nonlocal pos
+        while True:
+            while pos < len(buffer) and buffer[pos] in " \t\r\n":
+                pos += 1
+            if pos < len(buffer) or not fill():
+                return
+
+    skip_space()
+    in_array = pos < len(buffer) and buffer[pos] == "["
+    if in_array:
+        pos += 1
+    while True:
+        if not in_array:
+            # Look for the next "entries" array, keeping a short tail in case
+            # the key is split across two blocks.
+            start = buffer.find('"entries"', pos)
+            while start == -1:
+                pos = max(pos, len(buffer) - 16)
+                if not fill():
+                    return
+                start = buffer.find('"entries"', pos)
+            pos = start + len('"entries"')
+            skip_space()
+            if pos >= len(buffer) or buffer[pos] != ":":
+                continue
+            pos += 1
+            skip_space()
+            if pos >= len(buffer) or buffer[pos] != "[":
+                continue
+            pos += 1
+            in_array = True
+
+        skip_space()
+        if pos >= len(buffer):
+            return
+        if buffer[pos] == "]":
+            pos += 1
+            in_array = False
+            continue
+        if buffer[pos] == ",":
+            pos += 1
+            skip_space()
+        while True:
+            try:
+                obj, end = decoder.raw_decode(buffer, pos)
+                break
+            except json.JSONDecodeError:
+                # The object runs past the end of the block.
+                if eof or not fill():
+                    raise
+        pos = end
+        yield obj
+
+
+def _anilist_title(title):
+    if isinstance(title, str):
+        return title
+    title = title or {}
+    return title.get("english") or title.get("romaji") or title.get("userPreferred") or title.get("native") or ""
+
+
+def iter_anilist_json(path):
+    """Yields (list name, entry) pairs from an AniList JSON export."""
+    with _open(path, text=True) as f:
+        for raw in _iter_json_objects(f):
+            media = raw.get("media") or raw
+            media_type = (media.get("type") or raw.get("type") or "ANIME").upper()
+            title = _anilist_title(media.get("title"))
+            progress = _int(raw.get("progress"))
+            if media_type == "MANGA":
+                entry = {"title": title, "progress": str(progress)}
+            else:
+                entry = {"title": title, "episodes_watched": progress}
+            if raw.get("status"):
+                entry["status"] = raw["status"]
+            if media.get("id"):
+                # Same fields as features/enrich.py stores, so no lookup is needed later.
+                entry.update({
+                    "anilist_id": media["id"],
+                    "genres": media.get("genres") or [],
+                    "episodes": media.get("episodes") if media_type != "MANGA" else media.get("chapters"),
+                    "format": media.get("format"),
+                    "cover": (media.get("coverImage") or {}).get("large"),
+                })
+            yield ("readlist" if media_type == "MANGA" else "watchlist"), entry
+
+
+def detect_format(path):
+    """Returns "mal-xml" or "anilist-json" from the first non-blank character of the file."""
+    with _open(path, text=True) as f:
+        head = f.read(1024).lstrip()
+    if head.startswith("<"):
+        return "mal-xml"
+    if head.startswith(("{", "[")):
+        return "anilist-json"
+    raise ValueError("Unrecognized export format: expected MyAnimeList XML or AniList JSON.")
+
+
+@traced("import.lists")
+def import_lists(path):
+    """Imports an export file; returns {list name: (entries read, entries added)}."""
+    parser = iter_mal_xml if detect_format(path) == "mal-xml" else iter_anilist_json
+    seen = {}
+
+    def entries():
+        for name, entry in parser(path):
+            seen[name] = seen.get(name, 0) + 1
+            yield name, {key: value for key, value in entry.items() if value is not None}
+
+    added = storage.add_entries_to_lists(entries())
+    title_index.invalidate()
+    return {name: (count, added.get(name, 0)) for name, count in seen.items()}
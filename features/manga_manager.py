@@ -1,23 +1,20 @@
 """Manga manager feature: search, recommend, readlist management."""
-import json
 import webbrowser
 from simple_term_menu import TerminalMenu
-from mal import AnimeSearch
-
-READLIST_FILE = "readlist.json"
+from features.search_backend import search_titles
+from features.autocomplete import input_title
+from features import storage
+from features.title_index import note_list_entry
+from features.profiling import span, traced
 
 
+@traced("readlist.read")
 def load_readlist():
-    try:
-        with open(READLIST_FILE, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        return {"readlist": []}
+    return {"readlist": storage.list_entries("readlist")}
 
 
 def save_readlist(readlist):
-    with open(READLIST_FILE, 'w', encoding='utf-8') as f:
-        json.dump(readlist, f, indent=4, ensure_ascii=False)
+    storage.replace_entries("readlist", readlist.get("readlist", []))
 
 
 def list_readlist():
@@ -25,12 +22,20 @@ def list_readlist():
     if readlist.get("readlist"):
         print("Your manga readlist:")
         for item in readlist["readlist"]:
-            print(f"- {item.get('title')} (Progress: {item.get('progress', '')})")
+            total = f"/{item['episodes']}" if item.get("episodes") else ""
+            print(f"- {item.get('title')} (Progress: {item.get('progress', '')}{total})")
     else:
         print("Your readlist is empty.")
 
 
-def add_to_readlist(manga_title):
+def readlist_summary():
+    """Returns the readlist as compact dicts, without printing."""
+    return [{"title": item.get("title"), "progress": item.get("progress", "")} for item in storage.list_entries("readlist")]
+
+
+@traced("readlist.add")
+def add_to_readlist(manga_title, resolve_in_background=False):
+    """Adds a manga to the readlist, optionally looking up its AniList metadata in the background."""
     if not manga_title or not isinstance(manga_title, str):
         return "Invalid manga title."
 
@@ -38,48 +43,52 @@ def add_to_readlist(manga_title):
     if not title:
         return "Manga title is empty."
 
-    readlist = load_readlist()
-    if "readlist" not in readlist or not isinstance(readlist["readlist"], list):
-        readlist["readlist"] = []
-
-    for item in readlist["readlist"]:
-        existing = item.get("title", "")
-        if existing.strip().lower() == title.lower():
-            return f"'{title}' is already in your readlist."
-
-    readlist["readlist"].append({"title": title, "progress": "0"})
     try:
-        save_readlist(readlist)
+        if not storage.add_entry("readlist", title, {"progress": "0"}):
+            return f"'{title}' is already in your readlist."
     except Exception as e:
         return f"Failed to save readlist: {e}"
+    note_list_entry("readlist", title)
+
+    if resolve_in_background:
+        from features.enrich import enrich_in_background
+        enrich_in_background("readlist", title)
 
     return f"Added '{title}' to your readlist."
 
 
+@traced("manga.search_results")
+def search_manga_results(query, limit=10):
+    """Returns up to limit manga search results as compact dicts, without any prompts."""
+    return [{"title": r["title"], "score": r.get("score"), "mal_id": r.get("mal_id")} for r in search_titles(query, "MANGA")[:limit]]
+
+
+@traced("manga.search")
 def search_manga():
     try:
-        query = input("Enter manga title to search: ").strip()
+        query = input_title("Enter manga title to search: ", "MANGA").strip()
         if not query:
             print("No query provided.")
             return
 
-        # Reuse AnimeSearch for basic title search (works for manga in MAL wrapper)
-        search = AnimeSearch(query)
-        if not search.results:
+        results = search_titles(query, "MANGA")
+        if not results:
             print(f"No results found for '{query}'.")
             return
 
-        options = [f"{r.title} (Score: {getattr(r, 'score', 'N/A')})" for r in search.results]
+        options = [f"{r['title']} (Score: {r.get('score', 'N/A')})" for r in results]
         options.append("(exit)")
         menu = TerminalMenu(options)
-        idx = menu.show()
+        with span("menu"):
+            idx = menu.show()
         if options[idx] == "(exit)":
             return
 
         chosen = options[idx]
         choice = ["view on web", "add to readlist", "(exit)"]
         cmenu = TerminalMenu(choice)
-        ci = cmenu.show()
+        with span("menu"):
+            ci = cmenu.show()
         if choice[ci] == "view on web":
             title = chosen.split(" (Score:")[0]
             url = f"https://myanimelist.net/manga.php?q={title.replace(' ', '+')}"
@@ -94,18 +103,19 @@ def search_manga():
         print(f"An error occurred: {e}")
 
 
+@traced("manga.recommend")
 def recommend_manga():
     # Very simple recommend: suggest from user's readlist genres is not available, so suggest top results for 'manga'
     try:
-        query = input("Enter a keyword or leave blank for popular manga: ").strip()
-        search = AnimeSearch(query or "manga")
-        if not search.results:
+        query = input_title("Enter a keyword or leave blank for popular manga: ", "MANGA").strip()
+        results = search_titles(query or "manga", "MANGA")
+        if not results:
             print("No recommendations found.")
             return
 
         print("Recommendations:")
-        for r in search.results[:10]:
-            print(f"- {r.title} (Score: {getattr(r, 'score', 'N/A')})")
+        for r in results[:10]:
+            print(f"- {r['title']} (Score: {r.get('score', 'N/A')})")
 
     except Exception as e:
         print(f"An error occurred while recommending manga: {e}")
@@ -0,0 +1,191 @@
+"""Lightweight span-based profiling for the CLI.
+
+Code marks phases with `with span("anilist.request"):` or the @traced
+decorator. Nothing is recorded until enable() is called (main.py does this
+for --profile, --trace and --cprofile); until then span() hands back a shared
+no-op context manager, so instrumented code pays one global lookup per call.
+
+Recorded spans can be printed as a per-phase breakdown (report()) or written
+as a Chrome trace (write_trace()), which chrome://tracing and Perfetto show as
+nested spans per thread. Imports of modules that weren't loaded yet are
+recorded as "import <module>" spans.
+"""
+
+import builtins
+import contextlib
+import functools
+import json
+import os
+import sys
+import threading
+import time
+
+_enabled = False
+_events = []
+_events_lock = threading.Lock()
+_local = threading.local()
+_started = None
+_profiler = None
+_original_import = None
+_NULL_SPAN = contextlib.nullcontext()
+
+
+def enabled():
+    return _enabled
+
+
+def _now_us():
+    return time.perf_counter_ns() / 1000
+
+
+class _Span:
+    __slots__ = ("name", "args", "start", "depth")
+
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.depth = getattr(_local, "depth", 0)
+        _local.depth = self.depth + 1
+        self.start = _now_us()
+        return self
+
+    def __exit__(self, *exc):
+        end = _now_us()
+        _local.depth = self.depth
+        record(self.name, self.start, end, self.depth, **self.args)
+        return False
+
+
+def span(name, **args):
+    """Context manager timing one phase; extra keyword args go into the trace."""
+    if not _enabled:
+        return _NULL_SPAN
+    return _Span(name, args)
+
+
+def traced(name=None):
+    """Decorator wrapping every call of a function in a span."""
+    def decorator(func):
+        span_name = name or f"{func.__module__}.{func.__qualname__}"
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with _Span(span_name, {}):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def record(name, start_us, end_us, depth=None, **args):
+    """Adds a finished span, e.g. one whose start and end happen in different calls."""
+    if not _enabled:
+        return
+    event = {
+        "name": name,
+        "cat": name.split(" ")[0].split(".")[0],
+        "ph": "X",
+        "ts": start_us,
+        "dur": end_us - start_us,
+        "pid": os.getpid(),
+        "tid": threading.get_ident(),
+        "depth": getattr(_local, "depth", 0) if depth is None else depth,
+    }
+    if args.pop("_nested", False):
+        event["_nested"] = True
+    if args:
+        event["args"] = {key: str(value) for key, value in args.items()}
+    with _events_lock:
+        _events.append(event)
+
+
+def _already_loaded(name, fromlist):
+    module = sys.modules.get(name)
+    if module is None:
+        return False
+    # `from package import submodule` may still load the submodule.
+    return all(item == "*" or hasattr(module, item) for item in fromlist or ())
+
+
+def _timed_import(name, globals=None, locals=None, fromlist=(), level=0):
+    if level or _already_loaded(name, fromlist):
+        return _original_import(name, globals, locals, fromlist, level)
+    outer = getattr(_local, "importing", False)
+    _local.importing = True
+    try:
+        with _Span(f"import {name}", {"_nested": outer} if outer else {}):
+            return _original_import(name, globals, locals, fromlist, level)
+    finally:
+        _local.importing = outer
+
+
+def enable(cprofile=False):
+    """Starts recording spans (and module imports); optionally runs cProfile too."""
+    global _enabled, _started, _profiler, _original_import
+    if _enabled:
+        return
+    _enabled = True
+    _started = _now_us()
+    _original_import = builtins.__import__
+    builtins.__import__ = _timed_import
+    if cprofile:
+        import cProfile
+        _profiler = cProfile.Profile()
+        _profiler.enable()
+
+
+def disable():
+    """Stops recording; spans recorded so far are kept for report()/write_trace()."""
+    global _enabled
+    if not _enabled:
+        return
+    _enabled = False
+    builtins.__import__ = _original_import
+    if _profiler is not None:
+        _profiler.disable()
+
+
+def summary():
+    """Returns {phase: (calls, total_ms)}; nested imports are folded into "import"."""
+    phases = {}
+    for event in list(_events):
+        name = event["name"]
+        if name.startswith("import "):
+            # Only outermost imports count, so nested ones aren't added twice.
+            if event.get("_nested"):
+                continue
+            name = "import"
+        calls, total = phases.get(name, (0, 0.0))
+        phases[name] = (calls + 1, total + event["dur"] / 1000)
+    return phases
+
+
+def report(file=None):
+    """Prints the per-phase timing breakdown, slowest first."""
+    file = file or sys.stderr
+    wall = ((_now_us() if _enabled else _last_event_end()) - (_started or 0)) / 1000
+    print(f"\nProfile (wall {wall:.1f} ms; phases are inclusive of nested ones):", file=file)
+    print(f"  {'phase':<36}{'calls':>7}{'total ms':>12}{'% wall':>9}", file=file)
+    for name, (calls, total) in sorted(summary().items(), key=lambda item: -item[1][1]):
+        share = 100 * total / wall if wall else 0.0
+        print(f"  {name[:36]:<36}{calls:>7}{total:>12.1f}{share:>8.1f}%", file=file)
+
+
+def _last_event_end():
+    return max((event["ts"] + event["dur"] for event in _events), default=_started or 0)
+
+
+def write_trace(path):
+    """Writes the recorded spans as a Chrome trace-event JSON file."""
+    events = [{key: value for key, value in event.items() if key not in ("depth", "_nested")} for event in _events]
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+
+def dump_cprofile(path):
+    """Writes the cProfile statistics (readable with pstats or snakeviz)."""
+    if _profiler is not None:
+        _profiler.dump_stats(path)
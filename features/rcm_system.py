@@ -12,32 +12,176 @@ WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 See the License for the specific language governing permissions and
 limitations under the License."""
 
-import json
-from mal import AnimeSearch
+from functools import partial
+import numpy as np
 from simple_term_menu import TerminalMenu
-from features.search_by_genres import fetch_anime_by_genres, collect_genres_from_anime
+from features.search_by_genres import iter_anime_by_genres
+from features.enrich import entries_with_metadata
+from features.fetcher import fetch_concurrently
+from features.catalog_index import catalog_media
+from features import storage
+from features.profiling import span, traced
 
+# Weight of a genre the user explicitly likes, relative to one watchlist title
+# having that genre.
+LIKED_GENRE_WEIGHT = 2.0
+# Share of the final ranking that comes from AniList's average score; the
+# rest is cosine similarity between the title and the user's profile.
+SCORE_WEIGHT = 0.2
+
+_catalog_vectors = None
+
+
+def build_catalog_vectors(catalog):
+    """Builds L2-normalized genre/tag vectors for every title in the catalog.
+
+    Returns a dict with the term -> column map, the (titles x terms) matrix,
+    normalized scores, media ids, a lowercased title -> media ids map and the
+    media records themselves.
+    """
+    terms = {}
+    title_ids = {}
+    rows, cols = [], []
+    for i, media in enumerate(catalog):
+        for term in media.get("genres", []) + [f"tag:{tag}" for tag in media.get("tags", [])]:
+            col = terms.setdefault(term.lower(), len(terms))
+            rows.append(i)
+            cols.append(col)
+        for title in (media.get("title") or {}).values():
+            if title:
+                title_ids.setdefault(title.strip().lower(), []).append(media["id"])
+
+    matrix = np.zeros((len(catalog), max(len(terms), 1)), dtype=np.float32)
+    matrix[rows, cols] = 1.0
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    np.divide(matrix, norms, out=matrix, where=norms > 0)
+
+    scores = np.array([media.get("averageScore") or 0 for media in catalog], dtype=np.float32) / 100.0
+    ids = np.array([media["id"] for media in catalog], dtype=np.int64)
+    return {"terms": terms, "matrix": matrix, "scores": scores, "ids": ids, "title_ids": title_ids, "media": catalog}
+
+
+@traced("rcm.catalog_vectors")
+def get_catalog_vectors():
+    """Returns the vectors for the local catalog, building them once per process."""
+    global _catalog_vectors
+    if _catalog_vectors is None:
+        _catalog_vectors = build_catalog_vectors(catalog_media())
+    return _catalog_vectors
+
+
+def build_user_profile(vectors, liked_genres, watchlist_genres):
+    """Builds a normalized preference vector in the catalog's term space.
+
+    watchlist_genres is a list of genre lists, one per watchlist title.
+    """
+    profile = np.zeros(vectors["matrix"].shape[1], dtype=np.float32)
+    terms = vectors["terms"]
+    for genre in liked_genres:
+        col = terms.get(genre.lower())
+        if col is not None:
+            profile[col] += LIKED_GENRE_WEIGHT
+    for genres in watchlist_genres:
+        for genre in genres:
+            col = terms.get(genre.lower())
+            if col is not None:
+                profile[col] += 1.0
+    norm = np.linalg.norm(profile)
+    return profile / norm if norm > 0 else profile
+
+
+def watched_catalog_ids(vectors, watched_titles, watched_ids):
+    """Returns the ids of catalog titles that are watched, by AniList id or by (lowercased) title."""
+    title_ids = vectors["title_ids"]
+    return set(watched_ids).union(*(title_ids.get(title, ()) for title in watched_titles))
+
+
+@traced("rcm.rank")
+def rank_catalog(vectors, profile, k=10, exclude_ids=()):
+    """Returns the top-k catalog media for a profile, best match first.
+
+    Each title is scored by cosine similarity blended with its average score,
+    and titles in exclude_ids (e.g. already watched) are skipped.
+    """
+    n = len(vectors["media"])
+    if n == 0 or not profile.any():
+        return []
+    blended = (1.0 - SCORE_WEIGHT) * (vectors["matrix"] @ profile) + SCORE_WEIGHT * vectors["scores"]
+    if exclude_ids:
+        blended[np.isin(vectors["ids"], np.fromiter(exclude_ids, dtype=np.int64))] = -np.inf
+    k = min(k, n)
+    top = np.argpartition(-blended, k - 1)[:k]
+    top = top[np.argsort(-blended[top])]
+    return [vectors["media"][i] for i in top if np.isfinite(blended[i])]
+
+
+def _compact_media(anime):
+    title = anime["title"].get("english") or anime["title"].get("romaji")
+    return {"id": anime.get("id"), "title": title, "score": anime.get("averageScore"), "genres": anime.get("genres", [])[:4]}
+
+
+@traced("rcm.results")
+def recommend_anime_results(limit=10):
+    """Returns recommendations as compact dicts, without any prompts.
+
+    Ranks the local catalog when it has been synced, and otherwise asks
+    AniList for popular titles in the user's liked and watchlist genres.
+    """
+    liked_genres = storage.list_genres()
+    entries = entries_with_metadata("watchlist")
+    watched_titles = {entry["title"].strip().lower() for entry in entries}
+    watched_ids = {entry["anilist_id"] for entry in entries if entry.get("anilist_id")}
+    genres_by_title = {entry["title"]: entry.get("genres") or [] for entry in entries}
+
+    def is_watched(anime):
+        return anime.get("id") in watched_ids or any(
+            title and title.strip().lower() in watched_titles for title in anime["title"].values())
+
+    vectors = get_catalog_vectors()
+    if vectors["media"]:
+        profile = build_user_profile(vectors, liked_genres, list(genres_by_title.values()))
+        exclude_ids = watched_catalog_ids(vectors, watched_titles, watched_ids)
+        return [_compact_media(anime) for anime in rank_catalog(vectors, profile, k=limit, exclude_ids=exclude_ids)]
+
+    genres = list(dict.fromkeys(liked_genres + [g for gs in genres_by_title.values() for g in gs]))
+    results = []
+    if genres:
+        # Liked genres come first, so AniList matches the strongest preferences.
+        for anime in iter_anime_by_genres(genres[:3], per_page=limit * 2, max_pages=5, limit=limit):
+            if not is_watched(anime):
+                results.append(_compact_media(anime))
+                if len(results) >= limit:
+                    break
+    return results
+
+
+@traced("rcm.recommend")
 def recommend_anime():
     """Helps users find anime recommendations based on their genre preferences and watchlist."""
     
     def load_user_genres():
-        try:
-            with open("user_like_genre.json", 'r') as f:
-                return json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError):
-            return []
+        return storage.list_genres()
 
     def load_watchlist():
-        try:
-            with open("watchlist.json", 'r') as f:
-                return json.load(f)
-            
-        except (FileNotFoundError, json.JSONDecodeError):
-            return []
+        # Genres and AniList ids are stored with each entry; only entries
+        # added before that (or while offline) are looked up here.
+        return {"watchlist": entries_with_metadata("watchlist")}
 
-    def get_recommendations(genres, is_single_genre=True):
+    def is_watched(anime):
+        titles = anime["title"].values()
+        return anime.get("id") in watched_ids or any(
+            title and title.strip().lower() in watched_titles for title in titles)
+
+    def get_recommendations(genres, is_single_genre=True, limit=5):
         try:
-            search = fetch_anime_by_genres(genres=genres, max_results=5)
+            # Walk the popularity-sorted results page by page and stop as soon
+            # as we have enough titles that aren't already on the watchlist.
+            search = []
+            for anime in iter_anime_by_genres(genres, per_page=limit * 2, max_pages=5, limit=limit):
+                if not is_watched(anime):
+                    search.append(anime)
+                    if len(search) >= limit:
+                        break
             if not search:
                 genre_str = genres[0] if is_single_genre else ", ".join(genres)
                 print(f"No recommendations found for {genre_str}.")
@@ -59,19 +203,23 @@ def recommend_anime():
     # Main execution
     selected_genres = load_user_genres()
     watchlist = load_watchlist()
+    watched_titles = set()
+    watched_ids = set()
     if "watchlist" in watchlist and isinstance(watchlist["watchlist"], list):
-        watchlist = [anime["title"] for anime in watchlist["watchlist"]]
+        entries = watchlist["watchlist"]
+        watchlist = [anime["title"] for anime in entries]
+        watched_titles = {title.strip().lower() for title in watchlist}
+        watched_ids = {anime["anilist_id"] for anime in entries if anime.get("anilist_id")}
         print(f"DEBUG: Watchlist loaded successfully.{watchlist}")
         watchlist_genres = set()
-        for anime_name in watchlist:
-            print("DEBUG: Collecting genres for anime:", anime_name)
-            genres = collect_genres_from_anime(anime_name)
-            if genres:
-                watchlist_genres.update(genres)
+        genres_by_title = {anime["title"]: anime.get("genres") or [] for anime in entries}
+        for genres in genres_by_title.values():
+            watchlist_genres.update(genres)
         print("DEBUG: Collected genres from watchlist:", watchlist_genres)
         watchlist = list(watchlist_genres)
     else:
         watchlist = []
+        genres_by_title = {}
         print("DEBUG: No watchlist found or invalid format.")
 
 
@@ -86,40 +234,63 @@ def recommend_anime():
     print(f"Watchlist items: {len(watchlist)}")
     
     # Setup recommendation options
-    options = ["Recommend by genres", "Recommend by watchlist", "Combined recommendations", "Exit"]
-    choice = options[TerminalMenu(options).show()]
+    options = ["Recommend by genres", "Recommend by watchlist", "Combined recommendations", "Best matches from local catalog", "Exit"]
+    with span("menu"):
+        choice = options[TerminalMenu(options).show()]
     
     if choice == "Exit":
         return
 
-    recommendations = []
-    
-    # Get genre-based recommendations
-    if choice in ["Recommend by genres", "Combined recommendations"] and selected_genres:
-        genre_recs = get_recommendations(selected_genres, False)
-        if genre_recs:
-            print(f"\n------Anime Recommendations for your liked genres({genres})------")
-            for anime in genre_recs:
+    if choice == "Best matches from local catalog":
+        vectors = get_catalog_vectors()
+        if not vectors["media"]:
+            print("\nThe local catalog is empty. Run 'python main.py --sync-catalog' first.")
+            return
+        profile = build_user_profile(vectors, selected_genres, list(genres_by_title.values()))
+        exclude_ids = watched_catalog_ids(vectors, watched_titles, watched_ids)
+        matches = rank_catalog(vectors, profile, k=10, exclude_ids=exclude_ids)
+        if matches:
+            print("\n------Best matches for your genres and watchlist------")
+            for anime in matches:
                 print(f"{anime['title']['romaji']} ({anime['title']['english']})")
                 print(f"  + Genres: {', '.join(anime['genres'])}")
                 print(f"  + Score: {anime['averageScore']}\n")
-            recommendations.append(genre_recs)
+            with span("menu"):
+                save_option = TerminalMenu(["Yes", "No"], title="Save recommendations to 'recommendations.txt'?").show()
+            if save_option == 0:
+                save_recommendations(choice, selected_genres, [matches])
+                print("\nRecommendations saved successfully to recommendations.txt")
+        else:
+            print("\nNo matches found in the local catalog.")
+        return
 
-    # Get watchlist-based recommendations
+    # Queue every independent AniList query, then run them concurrently and
+    # print each block as soon as its request completes.
+    tasks = {}
+    if choice in ["Recommend by genres", "Combined recommendations"] and selected_genres:
+        heading = f"\n------Anime Recommendations for your liked genres({', '.join(selected_genres)})------"
+        tasks[heading] = partial(get_recommendations, selected_genres, False)
     if choice in ["Recommend by watchlist", "Combined recommendations"] and watchlist:
-        if watchlist_genres:
-            watchlist_recs = get_recommendations(list(watchlist_genres), False)
-            if watchlist_recs:
-                print(f"\n------Anime Recommendations based on your Watchlist------")
-                for anime in watchlist_recs:
-                    print(f"{anime['title']['romaji']} ({anime['title']['english']})")
-                    print(f"  + Genres: {', '.join(anime['genres'])}")
-                    print(f"  + Score: {anime['averageScore']}\n")
-                recommendations.append(watchlist_recs)
+        heading = "\n------Anime Recommendations based on your Watchlist------"
+        tasks[heading] = partial(get_recommendations, list(watchlist_genres), False)
+
+    recommendations = []
+    for heading, recs, error in fetch_concurrently(tasks):
+        if error is not None:
+            print(f"An error occurred while searching: {error}")
+            continue
+        if recs:
+            print(heading)
+            for anime in recs:
+                print(f"{anime['title']['romaji']} ({anime['title']['english']})")
+                print(f"  + Genres: {', '.join(anime['genres'])}")
+                print(f"  + Score: {anime['averageScore']}\n")
+            recommendations.append(recs)
 
     # Handle recommendations output
     if recommendations:
-        save_option = TerminalMenu(["Yes", "No"], title="Save recommendations to 'recommendations.txt'?").show()
+        with span("menu"):
+            save_option = TerminalMenu(["Yes", "No"], title="Save recommendations to 'recommendations.txt'?").show()
         if save_option == 0:
             save_recommendations(choice, selected_genres, recommendations)
             print("\nRecommendations saved successfully to recommendations.txt")
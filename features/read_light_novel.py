@@ -15,10 +15,11 @@ limitations under the License."""
 
 import sys
 import webbrowser
-def read_light_novel():
+def read_light_novel(ln_title=None):
     """Opens a web browser to search for a light novel."""
-    if len(sys.argv) > 2:
+    if ln_title is None and len(sys.argv) > 2:
         ln_title = ' '.join(sys.argv[2:])
+    if ln_title:
         print(f"Searching for light novel '{ln_title}'...")
         query = f"{ln_title} light novel"
         url = f"https://www.google.com/search?q={query.replace(' ', '+')}"
@@ -16,27 +16,39 @@ limitations under the License."""
 import sys
 import time
 import webbrowser
-from mal import AnimeSearch
 from simple_term_menu import TerminalMenu
 from features.watch_anime import watch_anime
 from features.watch_list import add_to_watchlist_func
+from features.search_backend import search_titles
+from features.autocomplete import input_title
+from features.profiling import span
 
 
-def search_anime():
+def search_anime_results(anime_title, limit=10):
+    """Returns up to limit search results as compact dicts, without any prompts."""
+    return [
+        {"title": r["title"], "score": r["score"], "mal_id": r["mal_id"]}
+        for r in search_titles(anime_title)[:limit]
+    ]
+
+
+def search_anime(anime_title=None):
     """
-    This function takes an anime title as a command-line argument, searches for it using the MyAnimeList API,
+    This function takes an anime title (or the command-line arguments), searches for it with the configured search backend,
     and displays the search results.
     """
     try:
         # Get the anime title from the command-line arguments
-        if len(sys.argv) > 2:
+        if anime_title is None and len(sys.argv) > 2:
             anime_title = ' '.join(sys.argv[2:])
-        else:
+        if not anime_title:
+            anime_title = input_title("Enter anime title to search: ").strip()
+        if not anime_title:
             print("Please provide an anime title to search.")
             return
 
         # Search for the anime
-        search = AnimeSearch(anime_title)
+        results = search_titles(anime_title)
 
         # Display the search results
         c = 0
@@ -46,22 +58,24 @@ def search_anime():
             print("Invalid input. Displaying 10 results by default.")
             max_results = 10
         options = []
-        if search.results:
+        if results:
             print(f"Search results for \"{anime_title}\":")
-            for result in search.results:
-                #print(f"{c}. {result.title} (Score: {result.score})")
-                options.append(f"{result.title} (Score: {result.score})")
+            for result in results:
+                #print(f"{c}. {result['title']} (Score: {result['score']})")
+                options.append(f"{result['title']} (Score: {result['score']})")
                 c += 1
                 if c >= max_results:
                     break
             options.append("(exit)")
             terminal_menu = TerminalMenu(options)
-            menu_entry_index = terminal_menu.show()
+            with span("menu"):
+                menu_entry_index = terminal_menu.show()
             print(f"You selected: {options[menu_entry_index]}")
             if options[menu_entry_index] != "(exit)":
                 choice = ["watch", "view on web", "add to watchlist", "(exit)"]
                 terminal_menu = TerminalMenu(choice)
-                choice_index = terminal_menu.show()
+                with span("menu"):
+                    choice_index = terminal_menu.show()
                 print(f"You selected: {choice[choice_index]}")
                 if choice[choice_index] == "view on web":
                     query = options[menu_entry_index].split(" (Score:")[0]
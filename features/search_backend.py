@@ -0,0 +1,132 @@
+"""Title search backends.
+
+Every title search in the app goes through search_titles(), which hands the
+query to one of two interchangeable backends:
+
+- "mal" (the default) scrapes MyAnimeList's search results page with the mal
+  package: one ~200 KB HTML page per query, parsed with BeautifulSoup;
+- "anilist" sends one GraphQL query through the shared AniList client and asks
+  only for the fields the UI shows, a few KB of JSON per query.
+
+Set ANIME_SEARCH_BACKEND=anilist (in the environment or .env) to switch. Both backends search manga with
+their manga search (MAL's manga.php, AniList's type: MANGA) and return the
+same dicts: title, score (0-10 or None), mal_id, anilist_id and url (AniList
+adds the English title as an alias). Results are cached per backend and media
+type, and remembered in the local title index (features/title_index.py) with
+the query, so a later search that misspells the query or one of those titles
+is answered from the cached search for it.
+"""
+
+import os
+from abc import ABC, abstractmethod
+
+from features.cache import cache_get, cache_set
+from features.profiling import span, traced
+from features.title_index import confident_names, remember
+
+DEFAULT_BACKEND = "mal"
+# AniList results per query; MAL's page always holds up to 50.
+ANILIST_PER_PAGE = 25
+
+
+class SearchBackend(ABC):
+    """A title search service; search() returns a list of result dicts."""
+
+    name = None
+
+    @abstractmethod
+    def search(self, query, media_type="ANIME"):
+        """Returns the results for query, with media_type "ANIME" or "MANGA"."""
+
+
+class MalSearchBackend(SearchBackend):
+    name = "mal"
+
+    def search(self, query, media_type="ANIME"):
+        from mal import AnimeSearch, MangaSearch
+
+        try:
+            with span("mal.scrape"):
+                search = (MangaSearch if media_type == "MANGA" else AnimeSearch)(query)
+        except ValueError as e:
+            # The mal wrapper raises ValueError for an empty results page, and
+            # also for queries it refuses; only the former is a real "no results".
+            if str(e) == "No results found":
+                return []
+            raise
+        return [
+            {"title": r.title, "score": r.score, "mal_id": r.mal_id, "anilist_id": None, "url": r.url}
+            for r in search.results
+        ]
+
+
+class AniListSearchBackend(SearchBackend):
+    name = "anilist"
+    QUERY = """
+    query ($search: String, $type: MediaType, $perPage: Int) {
+      Page(perPage: $perPage) {
+        media(search: $search, type: $type, sort: SEARCH_MATCH) {
+          id idMal title { romaji english } averageScore siteUrl
+        }
+      }
+    }
+    """
+
+    def search(self, query, media_type="ANIME"):
+        from features.anilist_client import post_query, data_or_raise
+
+        data = post_query(self.QUERY, {"search": query, "type": media_type, "perPage": ANILIST_PER_PAGE})
+        results = []
+        for media in data_or_raise(data)["Page"]["media"]:
+            title = media.get("title") or {}
+            score = media.get("averageScore")
+            results.append({
+                "title": title.get("romaji") or title.get("english") or "",
+                "aliases": [title["english"]] if title.get("romaji") and title.get("english") else [],
+                # AniList scores are out of 100, MAL's (and the UI's) out of 10.
+                "score": score / 10 if score is not None else None,
+                "mal_id": media.get("idMal"),
+                "anilist_id": media.get("id"),
+                "url": media.get("siteUrl"),
+            })
+        return results
+
+
+BACKENDS = {backend.name: backend for backend in (MalSearchBackend(), AniListSearchBackend())}
+
+
+def get_backend(name=None):
+    """Returns the named backend, or the one selected by ANIME_SEARCH_BACKEND (also read from .env)."""
+    if not name:
+        from dotenv import load_dotenv
+        load_dotenv()
+    name = (name or os.environ.get("ANIME_SEARCH_BACKEND") or DEFAULT_BACKEND).strip().lower()
+    try:
+        return BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"Unknown search backend '{name}' (expected one of: {', '.join(BACKENDS)})") from None
+
+
+@traced("search.titles")
+def search_titles(query, media_type="ANIME", backend=None, local=True):
+    """Searches anime (or manga, with media_type="MANGA") titles.
+
+    Results come from the metadata cache when this query was searched before,
+    or when the local title index recognizes it as (a misspelling of) a query
+    or title whose search is cached. Otherwise the backend is asked, and its results
+    are cached and added to the index.
+    """
+    backend = get_backend(backend)
+    cache_key = f"search:{backend.name}:{media_type.lower()}"
+    hit, results = cache_get(cache_key, query)
+    if hit:
+        return results
+    if local:
+        for name in confident_names(query, media_type):
+            hit, results = cache_get(cache_key, name)
+            if hit and results:
+                return results
+    results = backend.search(query, media_type)
+    remember(results, media_type, query)
+    cache_set(cache_key, query, results)
+    return results
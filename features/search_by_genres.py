@@ -1,58 +1,78 @@
-import requests
-
-def fetch_anime_by_genres(genres=[], max_results=10):
-  url = "https://graphql.anilist.co"
-
-  # GraphQL query: search anime by multiple genres
-  query = """
-  query ($genres: [String], $page: Int, $perPage: Int) {
-    Page(page: $page, perPage: $perPage) {
-      media(genre_in: $genres, type: ANIME, sort: POPULARITY_DESC) {
-        id
-        title {
-          romaji
-          english
-        }
-        genres
-        averageScore
+from concurrent.futures import ThreadPoolExecutor
+from features.anilist_client import post_query, data_or_raise
+from features.cache import cached
+from features.catalog_index import query_catalog
+from features.profiling import traced
+
+GENRE_PAGE_QUERY = """
+query ($genres: [String], $page: Int, $perPage: Int) {
+  Page(page: $page, perPage: $perPage) {
+    pageInfo {
+      hasNextPage
+    }
+    media(genre_in: $genres, type: ANIME, sort: POPULARITY_DESC) {
+      id
+      title {
+        romaji
+        english
       }
+      genres
+      averageScore
     }
   }
-  """
+}
+"""
 
-  # Variables for the query
-  variables = {
-      "genres": genres,  # You can add more genres here
-      "page": 1,
-      "perPage": max_results
-  }
 
-  # Send request
-  response = requests.post(url, json={"query": query, "variables": variables})
-  data = response.json()
+@traced("genres.page")
+def _fetch_genre_page(genres, page, per_page):
+    def fetch():
+        data = post_query(GENRE_PAGE_QUERY, {"genres": genres, "page": page, "perPage": per_page})
+        result = data_or_raise(data)["Page"]
+        return {"media": result["media"], "hasNextPage": result["pageInfo"]["hasNextPage"]}
 
-  return data["data"]["Page"]["media"]
-def collect_genres_from_anime(anime=""):
-    url = "https://graphql.anilist.co"
+    key = {"genres": sorted(genres), "page": page, "per_page": per_page}
+    return cached("anilist:genre_page", key, fetch)
 
-    query = """
-    query ($search: String) {
-      Media(search: $search, type: ANIME) {
-        genres
-      }
-    }
-    """
 
-    variables = {
-        "search": anime
-    }
+def iter_anime_by_genres(genres, per_page=25, max_pages=None, limit=None):
+    """Yields anime matching any of the genres, most popular first, across pages.
 
-    response = requests.post(url, json={"query": query, "variables": variables})
-    data = response.json()
+    Matches in the local catalog index come first; AniList is only asked once
+    the caller has gone through all of them, and titles already yielded are
+    skipped. limit is how many results the caller expects to need: while fewer
+    than that have been fetched, the next page is fetched in the background as
+    the caller works through the current one, and after that only when the
+    caller asks for more. Stop iterating (or close the generator) as soon as
+    you have enough results.
+    """
+    seen = set()
+    for media in query_catalog(genres, max_results=None):
+        seen.add(media["id"])
+        yield media
 
-    if "data" in data and "Media" in data["data"]:
-        genres = data["data"]["Media"]["genres"]
-        return genres
-    else:
-        print(f"No genres found for anime: {anime}")
-        return []
\ No newline at end of file
+    executor = ThreadPoolExecutor(max_workers=1)
+    pending = None
+    try:
+        page, fetched = 1, 0
+        pending = executor.submit(_fetch_genre_page, genres, page, per_page)
+        while pending is not None:
+            result = pending.result()
+            pending = None
+            fetched += len(result["media"])
+            has_next = result["hasNextPage"] and (max_pages is None or page < max_pages)
+            prefetch = has_next and (limit is None or fetched < limit)
+            if prefetch:
+                page += 1
+                pending = executor.submit(_fetch_genre_page, genres, page, per_page)
+            for media in result["media"]:
+                if media["id"] not in seen:
+                    seen.add(media["id"])
+                    yield media
+            if has_next and not prefetch:
+                page += 1
+                pending = executor.submit(_fetch_genre_page, genres, page, per_page)
+    finally:
+        if pending is not None:
+            pending.cancel()
+        executor.shutdown(wait=False)
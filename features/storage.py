@@ -0,0 +1,326 @@
+"""SQLite storage for the watchlist, readlist and liked genres.
+
+Entries are kept in one table with a unique index on (list, normalized title),
+so adds and duplicate checks are index lookups instead of linear scans, and
+every change is a single atomic transaction instead of a whole-file rewrite.
+The old JSON files are imported once, the first time the database is opened.
+Every entry's title trigrams are kept in entry_grams, written in the same
+transaction as the entry, so near-duplicate checks look candidates up in an
+index instead of loading the list.
+
+Several main.py processes may use the database at once (e.g. a scripted `-a`
+loop next to a chat session). The database runs in WAL mode so readers never
+block the writer, every write is a short BEGIN IMMEDIATE transaction that
+updates single rows, and writers that find the database busy wait and retry
+instead of failing or overwriting each other.
+"""
+
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+
+from features.title_index import core_trigrams
+
+DB_FILE = "anime.db"
+# How long SQLite itself waits for a competing writer, in seconds.
+BUSY_TIMEOUT = 10.0
+# Extra attempts when a lock is still held after BUSY_TIMEOUT.
+LOCK_RETRIES = 5
+
+# list name -> (legacy JSON file, key inside that file, default entry fields)
+LISTS = {
+    "watchlist": ("watchlist.json", "watchlist", {"episodes_watched": 0}),
+    "readlist": ("readlist.json", "readlist", {"progress": "0"}),
+}
+GENRES_FILE = "user_like_genre.json"
+
+_lock = threading.RLock()
+_conn = None
+_conn_pid = None
+
+
+def normalize_title(title):
+    """Returns the form of a title used for duplicate detection."""
+    return " ".join(str(title).lower().split())
+
+
+def _with_retry(operation):
+    """Runs operation(), retrying with jittered backoff while the database is locked."""
+    for attempt in range(LOCK_RETRIES + 1):
+        try:
+            return operation()
+        except sqlite3.OperationalError as e:
+            if "locked" not in str(e) and "busy" not in str(e) or attempt == LOCK_RETRIES:
+                raise
+            time.sleep(random.uniform(0, 0.05 * (2 ** attempt)))
+
+
+def _connect():
+    global _conn, _conn_pid
+    # A connection must not be shared with a forked child process.
+    if _conn is None or _conn_pid != os.getpid():
+        conn = sqlite3.connect(DB_FILE, timeout=BUSY_TIMEOUT, check_same_thread=False, isolation_level=None)
+        _with_retry(lambda: conn.execute("PRAGMA journal_mode=WAL"))
+        conn.execute("PRAGMA synchronous=NORMAL")
+        _with_retry(lambda: conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS entries (
+                id INTEGER PRIMARY KEY,
+                list TEXT NOT NULL,
+                norm_title TEXT NOT NULL,
+                title TEXT NOT NULL,
+                data TEXT NOT NULL DEFAULT '{}'
+            );
+            CREATE UNIQUE INDEX IF NOT EXISTS entries_title ON entries (list, norm_title);
+            CREATE TABLE IF NOT EXISTS liked_genres (
+                id INTEGER PRIMARY KEY,
+                genre TEXT NOT NULL UNIQUE
+            );
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            );
+            CREATE TABLE IF NOT EXISTS entry_grams (
+                list TEXT NOT NULL,
+                gram TEXT NOT NULL,
+                entry_id INTEGER NOT NULL,
+                PRIMARY KEY (list, gram, entry_id)
+            ) WITHOUT ROWID;
+            """
+        ))
+        _with_retry(lambda: _import_legacy_files(conn))
+        _with_retry(lambda: _index_existing_entries(conn))
+        _conn = conn
+        _conn_pid = os.getpid()
+    return _conn
+
+
+class _transaction:
+    """Runs a block inside one write transaction on the shared connection."""
+
+    def __enter__(self):
+        _lock.acquire()
+        try:
+            self.conn = _connect()
+            # BEGIN IMMEDIATE takes the write lock up front, so two processes
+            # can never both read and then write stale data.
+            _with_retry(lambda: self.conn.execute("BEGIN IMMEDIATE"))
+        except Exception:
+            _lock.release()
+            raise
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+        finally:
+            _lock.release()
+        return False
+
+
+def _import_legacy_files(conn):
+    """Imports watchlist.json, readlist.json and user_like_genre.json once."""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        for name, (path, key, defaults) in LISTS.items():
+            if conn.execute("SELECT 1 FROM meta WHERE key = ?", (f"imported:{path}",)).fetchone():
+                continue
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    items = json.load(f).get(key, [])
+            except (FileNotFoundError, json.JSONDecodeError, AttributeError):
+                items = []
+            for item in items:
+                if not isinstance(item, dict):
+                    item = {"title": str(item)}
+                _insert(conn, name, item.get("title", ""), {**defaults, **item})
+            conn.execute("INSERT INTO meta VALUES (?, '1')", (f"imported:{path}",))
+
+        if not conn.execute("SELECT 1 FROM meta WHERE key = ?", (f"imported:{GENRES_FILE}",)).fetchone():
+            try:
+                with open(GENRES_FILE, 'r', encoding='utf-8') as f:
+                    genres = json.load(f)
+            except (FileNotFoundError, json.JSONDecodeError):
+                genres = []
+            if isinstance(genres, list):
+                conn.executemany("INSERT OR IGNORE INTO liked_genres (genre) VALUES (?)",
+                                 [(str(g),) for g in genres])
+            conn.execute("INSERT INTO meta VALUES (?, '1')", (f"imported:{GENRES_FILE}",))
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def _index_existing_entries(conn):
+    """Fills entry_grams once for entries stored before it existed."""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        if not conn.execute("SELECT 1 FROM meta WHERE key = 'indexed:entry_grams'").fetchone():
+            for entry_id, name, title in conn.execute("SELECT id, list, title FROM entries").fetchall():
+                _index_entry(conn, entry_id, name, title)
+            conn.execute("INSERT INTO meta VALUES ('indexed:entry_grams', '1')")
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def _index_entry(conn, entry_id, name, title):
+    conn.executemany("INSERT OR IGNORE INTO entry_grams VALUES (?, ?, ?)",
+                     [(name, gram, entry_id) for gram in core_trigrams(title)])
+
+
+def _insert(conn, name, title, fields):
+    title = str(title).strip()
+    if not title:
+        return False
+    data = {k: v for k, v in fields.items() if k != "title"}
+    cursor = conn.execute(
+        "INSERT OR IGNORE INTO entries (list, norm_title, title, data) VALUES (?, ?, ?, ?)",
+        (name, normalize_title(title), title, json.dumps(data, ensure_ascii=False)),
+    )
+    if cursor.rowcount != 1:
+        return False
+    _index_entry(conn, cursor.lastrowid, name, title)
+    return True
+
+
+def list_entries(name):
+    """Returns the entries of a list in insertion order, as dicts with a "title" key."""
+    with _lock:
+        rows = _connect().execute(
+            "SELECT title, data FROM entries WHERE list = ? ORDER BY id", (name,)
+        ).fetchall()
+    return [{"title": title, **json.loads(data)} for title, data in rows]
+
+
+def find_entry(name, title):
+    """Returns the entry with this (normalized) title, or None."""
+    with _lock:
+        row = _connect().execute(
+            "SELECT title, data FROM entries WHERE list = ? AND norm_title = ?",
+            (name, normalize_title(title)),
+        ).fetchone()
+    return {"title": row[0], **json.loads(row[1])} if row else None
+
+
+def add_entry(name, title, fields=None):
+    """Adds an entry; returns False if the list already has that title."""
+    with _transaction() as conn:
+        return _insert(conn, name, title, {**LISTS[name][2], **(fields or {})})
+
+
+def add_entries(name, items):
+    """Adds many entries in one transaction; returns how many were new."""
+    defaults = LISTS[name][2]
+    added = 0
+    with _transaction() as conn:
+        for item in items:
+            added += _insert(conn, name, item.get("title", ""), {**defaults, **item})
+    return added
+
+
+def add_entries_to_lists(pairs):
+    """Adds (list name, entry) pairs, e.g. from a streamed import, in one transaction.
+
+    pairs may be a generator; it is consumed inside the transaction, so nothing
+    is buffered. Returns {list name: entries that were new}.
+    """
+    added = {}
+    with _transaction() as conn:
+        for name, item in pairs:
+            if _insert(conn, name, item.get("title", ""), {**LISTS[name][2], **item}):
+                added[name] = added.get(name, 0) + 1
+    return added
+
+
+def update_entry(name, title, fields):
+    """Merges fields into an existing entry; returns False if it doesn't exist."""
+    with _transaction() as conn:
+        row = conn.execute(
+            "SELECT id, data FROM entries WHERE list = ? AND norm_title = ?",
+            (name, normalize_title(title)),
+        ).fetchone()
+        if row is None:
+            return False
+        data = {**json.loads(row[1]), **{k: v for k, v in fields.items() if k != "title"}}
+        conn.execute("UPDATE entries SET data = ? WHERE id = ?", (json.dumps(data, ensure_ascii=False), row[0]))
+        return True
+
+
+def update_entries(name, fields_by_title):
+    """Merges fields into many existing entries in one transaction; returns how many changed."""
+    updated = 0
+    with _transaction() as conn:
+        for title, fields in fields_by_title.items():
+            row = conn.execute(
+                "SELECT id, data FROM entries WHERE list = ? AND norm_title = ?",
+                (name, normalize_title(title)),
+            ).fetchone()
+            if row is None:
+                continue
+            data = {**json.loads(row[1]), **{k: v for k, v in fields.items() if k != "title"}}
+            conn.execute("UPDATE entries SET data = ? WHERE id = ?", (json.dumps(data, ensure_ascii=False), row[0]))
+            updated += 1
+    return updated
+
+
+def replace_entries(name, items):
+    """Atomically replaces a whole list with the given entries."""
+    defaults = LISTS[name][2]
+    with _transaction() as conn:
+        conn.execute("DELETE FROM entries WHERE list = ?", (name,))
+        conn.execute("DELETE FROM entry_grams WHERE list = ?", (name,))
+        for item in items:
+            _insert(conn, name, item.get("title", ""), {**defaults, **item})
+
+
+def titles_sharing_trigrams(name, grams, count):
+    """Returns the titles on a list having at least count of grams.
+
+    grams are trigrams as indexed by title_index.core_trigrams().
+    """
+    grams = sorted(grams)
+    with _lock:
+        rows = _connect().execute(
+            f"""SELECT title FROM entries WHERE id IN (
+                    SELECT entry_id FROM entry_grams WHERE list = ? AND gram IN ({", ".join("?" * len(grams))})
+                    GROUP BY entry_id HAVING COUNT(*) >= ?
+                )""",
+            (name, *grams, count),
+        ).fetchall()
+    return [title for (title,) in rows]
+
+
+def list_genres():
+    """Returns the liked genres in the order they were added."""
+    with _lock:
+        rows = _connect().execute("SELECT genre FROM liked_genres ORDER BY id").fetchall()
+    return [genre for (genre,) in rows]
+
+
+def add_genres(genres):
+    """Adds genres that aren't already liked; returns the ones that were new."""
+    added = []
+    with _transaction() as conn:
+        for genre in genres:
+            cursor = conn.execute("INSERT OR IGNORE INTO liked_genres (genre) VALUES (?)", (str(genre),))
+            if cursor.rowcount == 1:
+                added.append(str(genre))
+    return added
+
+
+def remove_genre(genre):
+    """Removes a liked genre; returns False if it wasn't there."""
+    with _transaction() as conn:
+        return conn.execute("DELETE FROM liked_genres WHERE genre = ?", (genre,)).rowcount == 1
+
+
+def clear_genres():
+    """Removes every liked genre."""
+    with _transaction() as conn:
+        conn.execute("DELETE FROM liked_genres")
@@ -0,0 +1,364 @@
+"""Local fuzzy title index for instant, typo-tolerant lookups.
+
+Titles are folded to lowercase ASCII-ish words and split into trigrams
+("frieren" -> " fr", "fri", "rie", ...). The trigram postings (trigram ->
+names containing it) are stored in SQLite and updated as titles come in, so
+nothing is loaded into memory and a lookup costs the same however many
+titles are known. A lookup counts shared trigrams for the postings of the
+query's rarest trigrams (within a fixed budget, so common ones like "no "
+don't make it read every row) and ranks the best candidates by Dice
+similarity of the two trigram sets. A typo changes at most a few trigrams,
+so near misses still rank high.
+
+titles.db holds the titles seen in search results, each with its aliases
+(e.g. its romaji and English names), and the queries those results came
+from. search_titles() uses it to recognize a misspelled query or title it
+has searched for before, and answers with that earlier search's cached
+results instead of going to the network.
+
+near_duplicates() spots likely duplicates on the watchlist or readlist (e.g.
+"Frieren Beyond Journeys End" vs "Frieren: Beyond Journey's End") by edit
+distance, while keeping different seasons or parts apart. Its candidates come
+from trigram postings the store keeps next to each entry (see
+core_trigrams()). Near misses are sometimes different shows ("Monster" and
+"Monsters"), so callers only warn about them.
+"""
+
+import json
+import os
+import re
+import sqlite3
+import threading
+import unicodedata
+from collections import Counter
+
+from features.profiling import traced
+
+TITLE_INDEX_FILE = "titles.db"
+# A local hit is trusted without a network search when its trigram (Dice)
+# similarity is at least CONFIDENT_SIMILARITY or it is within the typo budget
+# below.
+CONFIDENT_SIMILARITY = 0.75
+# Lowest similarity returned by lookup().
+MIN_SIMILARITY = 0.3
+# Typo budget: one edit per CHARS_PER_TYPO characters, so short titles must
+# match apart from case and punctuation (short names one letter apart are
+# usually different shows).
+CHARS_PER_TYPO = 8
+# One edit (a swap of two letters at worst) changes at most this many of a
+# title's trigrams.
+TRIGRAMS_PER_EDIT = 4
+# Lookups read at most about this many postings, and then score the
+# MAX_CANDIDATES names sharing the most trigrams exactly.
+POSTINGS_BUDGET = 5000
+MAX_CANDIDATES = 100
+LIST_KINDS = {"watchlist": "ANIME", "readlist": "MANGA"}
+
+_SEQUEL_WORDS = {"season", "part", "cour"}
+_ROMAN_NUMERALS = {"ii", "iii", "iv", "v", "vi", "vii", "viii", "ix", "x"}
+_NUMBER = re.compile(r"\d+")
+_PUNCTUATION = re.compile(r"[\W_]+")
+
+_listeners = []
+
+
+def fold_title(title):
+    """Returns the form of a title that is indexed: lowercase words, no accents or punctuation."""
+    text = str(title).lower()
+    if not text.isascii():
+        text = unicodedata.normalize("NFKD", text)
+        text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return " ".join(_PUNCTUATION.sub(" ", text).split())
+
+
+def trigrams(folded):
+    padded = f"  {folded} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _sequel_markers(folded):
+    """Numbers and roman numerals in order, which tell seasons and parts apart."""
+    return [marker for word in folded.split()
+            for marker in ([word] if word in _ROMAN_NUMERALS else _NUMBER.findall(word))]
+
+
+def _core(folded):
+    """The title without its season/part numbering."""
+    return " ".join(word for word in folded.split()
+                    if word not in _SEQUEL_WORDS and word not in _ROMAN_NUMERALS and not _NUMBER.search(word))
+
+
+def core_trigrams(title):
+    """The trigrams near_duplicates() looks list entries up by: those of the title without its numbering."""
+    core = _core(fold_title(title))
+    return trigrams(core) if core else set()
+
+
+def _edit_distance(a, b, limit):
+    """Optimal string alignment distance (typos incl. swapped letters), or limit + 1 once it exceeds limit."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous2, previous = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return previous[-1]
+
+
+def _connect():
+    conn = sqlite3.connect(TITLE_INDEX_FILE, timeout=10.0, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(
+        """
+        CREATE TABLE IF NOT EXISTS names (
+            id INTEGER PRIMARY KEY,
+            kind TEXT NOT NULL,
+            entry TEXT NOT NULL,
+            folded TEXT NOT NULL,
+            name TEXT NOT NULL,
+            query INTEGER NOT NULL DEFAULT 0,
+            UNIQUE (kind, entry, folded)
+        );
+        CREATE TABLE IF NOT EXISTS grams (
+            kind TEXT NOT NULL,
+            gram TEXT NOT NULL,
+            name_id INTEGER NOT NULL,
+            PRIMARY KEY (kind, gram, name_id)
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS gram_sizes (
+            kind TEXT NOT NULL,
+            gram TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            PRIMARY KEY (kind, gram)
+        ) WITHOUT ROWID;
+        """
+    )
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'titles'").fetchone():
+        # Search results remembered by earlier versions, one row per title.
+        with conn:
+            for kind, title, data in conn.execute("SELECT kind, title, data FROM titles").fetchall():
+                _add_names(conn, kind, title, json.loads(data).get("aliases") or ())
+            conn.execute("DROP TABLE titles")
+    return conn
+
+
+def _add_names(conn, kind, title, aliases=(), query=False):
+    """Indexes a title and its aliases as one entry; query marks a past search query."""
+    entry = fold_title(title)
+    if not entry:
+        return
+    for name in (title, *aliases):
+        folded = fold_title(name or "")
+        if not folded:
+            continue
+        cursor = conn.execute(
+            "INSERT OR IGNORE INTO names (kind, entry, folded, name, query) VALUES (?, ?, ?, ?, ?)",
+            (kind, entry, folded, str(name).strip(), int(query)),
+        )
+        if cursor.rowcount:
+            grams = trigrams(folded)
+            conn.executemany("INSERT INTO grams VALUES (?, ?, ?)", [(kind, gram, cursor.lastrowid) for gram in grams])
+            conn.executemany(
+                "INSERT INTO gram_sizes VALUES (?, ?, 1) ON CONFLICT (kind, gram) DO UPDATE SET size = size + 1",
+                [(kind, gram) for gram in grams],
+            )
+        elif not query:
+            # A title that was also searched for literally is a title first.
+            conn.execute("UPDATE names SET query = 0 WHERE kind = ? AND entry = ? AND folded = ?",
+                         (kind, entry, folded))
+
+
+def remember(results, media_type="ANIME", query=None):
+    """Stores search results (dicts with "title" and optional "aliases"), and the query they came from."""
+    conn = _connect()
+    try:
+        with conn:
+            for result in results:
+                _add_names(conn, media_type, result.get("title", ""), [a for a in result.get("aliases") or () if a])
+            if query and results:
+                _add_names(conn, media_type, query, query=True)
+    finally:
+        conn.close()
+    _notify(media_type, [name for result in results for name in (result.get("title"), *(result.get("aliases") or ()))])
+
+
+def _ranked(conn, query, kind, limit, min_similarity=MIN_SIMILARITY):
+    """Returns up to limit (similarity, entry) pairs, best first; entry is the entry's folded title."""
+    grams = trigrams(fold_title(query))
+    if not grams:
+        return []
+    # Count shared trigrams rarest first. Rare trigrams say the most about a
+    # match, and common ones (" th", "no ") would make the count read most of
+    # the postings, so they are skipped once the budget is spent.
+    marks = ", ".join("?" * len(grams))
+    sizes = dict(conn.execute(f"SELECT gram, size FROM gram_sizes WHERE kind = ? AND gram IN ({marks})",
+                              (kind, *grams)).fetchall())
+    chosen, budget = [], POSTINGS_BUDGET
+    for gram in sorted(sizes, key=sizes.get):
+        if chosen and sizes[gram] > budget:
+            break
+        chosen.append(gram)
+        budget -= sizes[gram]
+    if not chosen:
+        return []
+    marks = ", ".join("?" * len(chosen))
+    rows = conn.execute(
+        f"""SELECT names.entry, names.folded FROM names JOIN (
+                SELECT name_id, COUNT(*) AS shared FROM grams WHERE kind = ? AND gram IN ({marks})
+                GROUP BY name_id ORDER BY shared DESC LIMIT ?
+            ) AS candidates ON names.id = candidates.name_id""",
+        (kind, *chosen, MAX_CANDIDATES),
+    ).fetchall()
+    # The partial counts pick the candidates; their exact similarity is then
+    # computed from their own trigrams.
+    best = Counter()
+    for entry, folded in rows:
+        other = trigrams(folded)
+        similarity = 2 * len(grams & other) / (len(grams) + len(other))
+        if similarity >= min_similarity and similarity > best[entry]:
+            best[entry] = similarity
+    return [(similarity, entry) for entry, similarity in best.most_common(limit)]
+
+
+@traced("titles.lookup")
+def lookup(query, media_type="ANIME", limit=10):
+    """Returns up to limit (similarity, title) pairs from the remembered titles, best first."""
+    if not os.path.exists(TITLE_INDEX_FILE):
+        return []
+    conn = _connect()
+    try:
+        hits = _ranked(conn, query, media_type, limit)
+        return [(similarity, conn.execute("SELECT name FROM names WHERE kind = ? AND entry = ? AND folded = ?",
+                                          (media_type, entry, entry)).fetchone()[0])
+                for similarity, entry in hits]
+    finally:
+        conn.close()
+
+
+@traced("titles.lookup")
+def confident_names(query, media_type="ANIME"):
+    """Returns the names of the known title (or past query) query most likely means, or [] if none is close enough.
+
+    The title itself comes first, then its aliases.
+    """
+    if not os.path.exists(TITLE_INDEX_FILE):
+        return []
+    conn = _connect()
+    try:
+        hits = _ranked(conn, query, media_type, 1)
+        if not hits:
+            return []
+        similarity, entry = hits[0]
+        names = conn.execute("SELECT folded, name FROM names WHERE kind = ? AND entry = ?",
+                             (media_type, entry)).fetchall()
+    finally:
+        conn.close()
+    if similarity < CONFIDENT_SIMILARITY:
+        folded = fold_title(query)
+        allowed = len(folded) // CHARS_PER_TYPO
+        if all(_edit_distance(folded, other, allowed) > allowed for other, _ in names):
+            return []
+    return [name for folded, name in sorted(names, key=lambda row: row[0] != entry)]
+
+
+def known_names():
+    """Returns (kind, folded name, name) for every title the app knows.
+
+    That is remembered search results with their aliases, the local catalog
+    (romaji and English names) and the watchlist and readlist.
+    """
+    names = []
+    if os.path.exists(TITLE_INDEX_FILE):
+        conn = _connect()
+        try:
+            names.extend(conn.execute("SELECT kind, folded, name FROM names WHERE NOT query"))
+        finally:
+            conn.close()
+    from features import storage
+    from features.catalog_index import catalog_titles
+    for _, romaji, english, _ in catalog_titles():
+        names.extend(("ANIME", fold_title(name), name) for name in (romaji, english) if name)
+    for name, kind in LIST_KINDS.items():
+        names.extend((kind, fold_title(entry["title"]), entry["title"]) for entry in storage.list_entries(name))
+    return names
+
+
+def note_list_entry(name, title):
+    """Reports a new watchlist/readlist entry to the listeners."""
+    _notify(LIST_KINDS[name], [title])
+
+
+def add_listener(on_titles, on_invalidate=None):
+    """Calls on_titles(kind, names) whenever titles are remembered or added to a list.
+
+    on_invalidate() is called after titles were added in bulk (e.g. by an
+    import), since those are not reported one by one.
+    """
+    _listeners.append((on_titles, on_invalidate))
+
+
+def _notify(kind, names):
+    names = [name for name in names if name]
+    for on_titles, _ in list(_listeners):
+        on_titles(kind, names)
+
+
+def invalidate():
+    """Tells the listeners that titles were added in bulk, e.g. after an import."""
+    for _, on_invalidate in list(_listeners):
+        if on_invalidate is not None:
+            on_invalidate()
+
+
+def clear_titles():
+    """Forgets remembered search results and queries."""
+    if os.path.exists(TITLE_INDEX_FILE):
+        conn = _connect()
+        try:
+            with conn:
+                conn.execute("DELETE FROM names")
+                conn.execute("DELETE FROM grams")
+                conn.execute("DELETE FROM gram_sizes")
+        finally:
+            conn.close()
+    invalidate()
+
+
+@traced("titles.near_duplicates")
+def near_duplicates(name, title):
+    """Returns titles on a list that are near misses of title, closest first.
+
+    Exact (normalized) matches are left to the store's unique index, and
+    titles whose numbers or roman numerals differ or come in another order
+    (e.g. "Season 2" and "Season 3", "Part 1 Season 2" and "Part 2 Season 1")
+    are never reported, however similar the rest is.
+    """
+    from features import storage
+
+    folded = fold_title(title)
+    core = _core(folded)
+    grams = core_trigrams(title)
+    if not grams:
+        return []
+    markers = _sequel_markers(folded)
+    allowed = len(core) // CHARS_PER_TYPO
+    normalized = storage.normalize_title(title)
+    # A title within `allowed` edits keeps all but TRIGRAMS_PER_EDIT * allowed
+    # of these trigrams.
+    candidates = storage.titles_sharing_trigrams(name, grams, max(len(grams) - TRIGRAMS_PER_EDIT * allowed, 1))
+    hits = []
+    for other in candidates:
+        other_folded = fold_title(other)
+        if storage.normalize_title(other) == normalized or _sequel_markers(other_folded) != markers:
+            continue
+        distance = _edit_distance(core, _core(other_folded), allowed)
+        if distance <= allowed:
+            hits.append((distance, other))
+    return [other for _, other in sorted(hits)[:5]]
@@ -0,0 +1,219 @@
+"""Registry of functions the chat assistant can call.
+
+Tools are registered once with the @tool decorator. Their Gemini function
+declarations are generated from the signature and docstring at registration
+time, and dispatch is a dict lookup that also keeps per-tool call counts,
+error counts and timings.
+
+    @tool()
+    def add_to_watchlist_func(anime_title: str):
+        \"\"\"Add an anime to the watchlist.
+
+        Args:
+            anime_title: The title of the anime to add to the watchlist.
+        \"\"\"
+
+A tool can name the resources it uses (a data store it writes, or the
+terminal for tools that prompt the user). The calls of one model turn go
+into a ToolBatch, which starts each call as soon as it is submitted (while
+the rest of the reply is still streaming) and runs calls concurrently,
+except that a call waits for the earlier calls sharing a resource with it,
+so those run in the order the model asked for them.
+"""
+
+import inspect
+import threading
+import time
+import typing
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from features.profiling import span
+
+# Most calls in a turn are quick local writes or a couple of network lookups.
+MAX_PARALLEL_TOOLS = 4
+
+_JSON_TYPES = {str: "string", int: "integer", float: "number", bool: "boolean", list: "array", dict: "object"}
+
+
+class UnknownToolError(KeyError):
+    """Raised when the model calls a function that isn't registered."""
+
+
+def _schema_for(annotation):
+    origin = typing.get_origin(annotation) or annotation
+    schema = {"type": _JSON_TYPES.get(origin, "string")}
+    if origin is list:
+        args = typing.get_args(annotation)
+        schema["items"] = _schema_for(args[0] if args else str)
+    return schema
+
+
+def _parse_docstring(doc):
+    """Splits a Google-style docstring into (summary, {param: description})."""
+    doc = inspect.cleandoc(doc or "")
+    summary_lines, params = [], {}
+    section = "summary"
+    current = None
+    for line in doc.splitlines():
+        stripped = line.strip()
+        if stripped in ("Args:", "Arguments:", "Parameters:"):
+            section = "args"
+            continue
+        if stripped.endswith(":") and " " not in stripped:
+            section = "other"
+            continue
+        if section == "summary":
+            if not stripped and summary_lines:
+                section = "other"
+            elif stripped:
+                summary_lines.append(stripped)
+        elif section == "args" and stripped:
+            name, sep, text = stripped.partition(":")
+            if sep and line.startswith("    ") and not line.startswith("        "):
+                current = name.split("(")[0].strip()
+                params[current] = text.strip()
+            elif current:
+                params[current] += " " + stripped
+    return " ".join(summary_lines), params
+
+
+def build_declaration(func, name=None):
+    """Builds a Gemini function declaration dict for a Python function."""
+    summary, param_docs = _parse_docstring(func.__doc__)
+    hints = typing.get_type_hints(func)
+    properties, required = {}, []
+    for param in inspect.signature(func).parameters.values():
+        if param.kind in (param.VAR_POSITIONAL, param.VAR_KEYWORD):
+            continue
+        schema = _schema_for(hints.get(param.name, str))
+        if param.name in param_docs:
+            schema["description"] = param_docs[param.name]
+        properties[param.name] = schema
+        if param.default is inspect.Parameter.empty:
+            required.append(param.name)
+
+    parameters = {"type": "object", "properties": properties}
+    if required:
+        parameters["required"] = required
+    return {"name": name or func.__name__, "description": summary, "parameters": parameters}
+
+
+class ToolRegistry:
+    def __init__(self):
+        self._tools = {}
+        self._declarations = {}
+        self._tool = None
+        self._resources = {}
+        self._stats_lock = threading.Lock()
+        self.ends_chat = set()
+        self.stats = {}
+
+    def register(self, name=None, ends_chat=False, resources=()):
+        """Decorator registering a function as a tool the model can call.
+
+        resources names what the tool touches (e.g. "watchlist", "terminal");
+        calls sharing a resource are never run at the same time.
+        """
+        def decorator(func):
+            tool_name = name or func.__name__
+            self._tools[tool_name] = func
+            self._declarations[tool_name] = build_declaration(func, tool_name)
+            self._resources[tool_name] = set(resources)
+            self.stats[tool_name] = {"calls": 0, "errors": 0, "total_ms": 0.0}
+            if ends_chat:
+                self.ends_chat.add(tool_name)
+            self._tool = None
+            return func
+        return decorator
+
+    def declarations(self):
+        return list(self._declarations.values())
+
+    def gemini_tool(self):
+        """Returns all declarations grouped into one types.Tool, built once."""
+        if self._tool is None:
+            from google.generativeai import types
+            self._tool = types.Tool(function_declarations=self.declarations())
+        return self._tool
+
+    def dispatch(self, name, args):
+        """Calls a registered tool with keyword arguments from the model."""
+        func = self._tools.get(name)
+        if func is None:
+            raise UnknownToolError(name)
+        stats = self.stats[name]
+        started = time.perf_counter()
+        failed = False
+        try:
+            accepted = inspect.signature(func).parameters
+            with span(f"tool {name}"):
+                return func(**{k: v for k, v in (args or {}).items() if k in accepted})
+        except Exception:
+            failed = True
+            raise
+        finally:
+            with self._stats_lock:
+                stats["calls"] += 1
+                stats["errors"] += failed
+                stats["total_ms"] += (time.perf_counter() - started) * 1000
+
+    def batch(self):
+        """Returns a ToolBatch for the calls of one model turn."""
+        return ToolBatch(self)
+
+    def dispatch_many(self, calls):
+        """Runs a list of (name, args) calls and returns their results in order (see ToolBatch)."""
+        with self.batch() as batch:
+            for name, args in calls:
+                batch.submit(name, args)
+            return batch.results()
+
+
+class ToolBatch:
+    """Calls from one model turn, each started as soon as it is submitted.
+
+    Independent calls run on a thread pool; a call sharing a resource with
+    earlier calls waits for them. A failing or unknown call yields an
+    "Error: ..." result instead of aborting the others.
+    """
+
+    def __init__(self, registry):
+        self._registry = registry
+        self._executor = ThreadPoolExecutor(max_workers=MAX_PARALLEL_TOOLS)
+        self._latest = {}  # resource -> future of the latest call using it
+        self._futures = []
+        self.calls = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self._executor.shutdown()
+
+    def submit(self, name, args):
+        resources = self._registry._resources.get(name, ())
+        earlier = {self._latest[resource] for resource in resources if resource in self._latest}
+        # The pool starts calls in submission order, so the earlier calls a
+        # call waits for are always running or done, never queued behind it.
+        future = self._executor.submit(self._run, name, args, earlier)
+        for resource in resources:
+            self._latest[resource] = future
+        self.calls.append((name, args))
+        self._futures.append(future)
+
+    def _run(self, name, args, earlier):
+        wait(earlier)
+        try:
+            return self._registry.dispatch(name, args)
+        except UnknownToolError:
+            return f"Error: unknown tool {name}"
+        except Exception as e:
+            return f"Error: {e}"
+
+    def results(self):
+        """Waits for every submitted call and returns their results in order."""
+        return [future.result() for future in self._futures]
+
+
+registry = ToolRegistry()
+tool = registry.register
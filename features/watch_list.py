@@ -12,57 +12,78 @@ WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 See the License for the specific language governing permissions and
 limitations under the License."""
 
-import json
 import sys
 import os
 from simple_term_menu import TerminalMenu
-WATCHLIST_FILE = "watchlist.json"
+from features import storage
+from features.profiling import span, traced
+from features.title_index import near_duplicates, note_list_entry
+
+@traced("watchlist.read")
 def get_watchlist():
-    """Reads the watchlist from the JSON file."""
-    try:
-        with open(WATCHLIST_FILE, 'r') as f:
-            return json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        return {"watchlist": []}
+    """Reads the watchlist from the data store."""
+    return {"watchlist": storage.list_entries("watchlist")}
 
 def save_watchlist(watchlist):
-    """Saves the watchlist to the JSON file."""
-    with open(WATCHLIST_FILE, 'w') as f:
-        json.dump(watchlist, f, indent=4)
+    """Replaces the stored watchlist in one transaction."""
+    storage.replace_entries("watchlist", watchlist.get("watchlist", []))
 
 # error. fix later
+@traced("watchlist.update")
 def update_watchlist():
     """Updates the number of episodes watched for an anime."""
     try:
         watchlist = get_watchlist()
         ter_menu = TerminalMenu([anime["title"] for anime in watchlist["watchlist"]])
-        menu_entry_index = ter_menu.show()
+        with span("menu"):
+            menu_entry_index = ter_menu.show()
         print(f"You selected: {watchlist['watchlist'][menu_entry_index]['title']}")
-        anime_title = watchlist["watchlist"][menu_entry_index]["title"]                 
-        for anime in watchlist["watchlist"]:
-            if anime["title"].lower() == anime_title.lower():
-                episodes = int(input(f"Enter the number of episodes watched for '{anime_title}': "))
-                anime["episodes_watched"] = episodes
-                save_watchlist(watchlist)
-                print(f"Updated '{anime_title}' to {episodes} episodes watched.")
-                return
-        print(f"'{anime_title}' not found in your watchlist.")
+        anime_title = watchlist["watchlist"][menu_entry_index]["title"]
+        episodes = int(input(f"Enter the number of episodes watched for '{anime_title}': "))
+        if storage.update_entry("watchlist", anime_title, {"episodes_watched": episodes}):
+            print(f"Updated '{anime_title}' to {episodes} episodes watched.")
+        else:
+            print(f"'{anime_title}' not found in your watchlist.")
     except ValueError:
         print("Please provide a valid number for episodes watched.")
 
 
+def watchlist_summary():
+    """Returns the watchlist as compact dicts, without printing."""
+    summary = []
+    for anime in storage.list_entries("watchlist"):
+        item = {"title": anime["title"], "episodes_watched": anime.get("episodes_watched", 0)}
+        # Stored AniList metadata, when the entry has been resolved
+        for key in ("anilist_id", "episodes", "format"):
+            if anime.get(key) is not None:
+                item[key] = anime[key]
+        summary.append(item)
+    return summary
+
+@traced("watchlist.list")
 def list_watchlist():
     """Lists all the anime in the watchlist."""
     watchlist = get_watchlist()
     if watchlist["watchlist"]:
         print("Your watchlist:")
         for anime in watchlist["watchlist"]:
-            print(f"- {anime['title']} (Episodes watched: {anime['episodes_watched']})")
+            total = f"/{anime['episodes']}" if anime.get("episodes") else ""
+            kind = f", {anime['format']}" if anime.get("format") else ""
+            print(f"- {anime['title']} (Episodes watched: {anime['episodes_watched']}{total}{kind})")
     else:
         print("Your watchlist is empty.")
 
-def add_to_watchlist_func(anime_title):
-    """Adds an anime to the watchlist."""
+@traced("watchlist.add")
+def add_to_watchlist_func(anime_title, resolve_in_background=False):
+    """Adds an anime to the watchlist.
+
+    With resolve_in_background, long-running callers (such as the chat) look
+    up the entry's AniList metadata right away on a background thread;
+    otherwise it is resolved lazily when it is first needed. Titles that look
+    like one already on the list (but not a different season) are still
+    added, with a note naming the similar title, since near misses are
+    sometimes different shows.
+    """
     # Validate input
     if not isinstance(anime_title, str):
         try:
@@ -74,28 +95,22 @@ def add_to_watchlist_func(anime_title):
     if not title:
         return "Anime title is empty."
 
-    # Load or initialize watchlist structure
-    watchlist = get_watchlist() or {"watchlist": []}
-    if not isinstance(watchlist, dict):
-        watchlist = {"watchlist": []}
-    if "watchlist" not in watchlist or not isinstance(watchlist["watchlist"], list):
-        watchlist["watchlist"] = []
-
-    # Check for duplicates (case-insensitive, trimmed)
-    for anime in watchlist["watchlist"]:
-        existing_title = ""
-        if isinstance(anime, dict):
-            existing_title = str(anime.get("title", "")).strip()
-        else:
-            existing_title = str(anime).strip()
-        if existing_title.lower() == title.lower():
-            return f"'{title}' is already in your watchlist."
-
-    # Append and save
-    watchlist["watchlist"].append({"title": title, "episodes_watched": 0})
+    # The unique index on the normalized title rejects duplicates
+    # (case-insensitive, trimmed) without scanning the list.
     try:
-        save_watchlist(watchlist)
+        if storage.find_entry("watchlist", title) is not None:
+            return f"'{title}' is already in your watchlist."
+        similar = near_duplicates("watchlist", title)
+        if not storage.add_entry("watchlist", title, {"episodes_watched": 0}):
+            return f"'{title}' is already in your watchlist."
     except Exception as e:
         return f"Failed to save watchlist: {e}"
+    note_list_entry("watchlist", title)
+
+    if resolve_in_background:
+        from features.enrich import enrich_in_background
+        enrich_in_background("watchlist", title)
 
+    if similar:
+        return f"Added '{title}' to your watchlist (note: it looks like '{similar[0]}', which is already on it)."
     return f"Added '{title}' to your watchlist."
@@ -13,103 +13,303 @@ See the License for the specific language governing permissions and
 limitations under the License."""
 
 
-import sys
+
 import os
-import subprocess
-from simple_term_menu import TerminalMenu
-from features.chat import chat_with_bot
-from features.search_anime import search_anime
-from features.rcm_system import recommend_anime
-from features.watch_list import update_watchlist, list_watchlist
-from features.watch_anime import watch_anime
-from features.read_light_novel import read_light_novel
-from features.chat import add_to_watchlist_func
-from features.genre_manager import add_genre, remove_genre, list_genres, clear_genres
-from features.manga_manager import search_manga, recommend_manga, list_readlist, add_to_readlist
-# TUI imports
+import sys
+import threading
+import time
+
+# Feature modules are imported inside each command so that cheap commands such
+# as `-l` or `-a` don't pay for the Gemini SDK, grpc or the MAL scraper.
+COMMANDS = {}
+# Commands that don't prompt the user, so a running daemon can serve them.
+REMOTE_COMMANDS = set()
+
+
+def command(*flags, remote=False):
+    """Registers a handler for one or more command-line flags."""
+    def register(func):
+        for flag in flags:
+            COMMANDS[flag] = func
+            if remote:
+                REMOTE_COMMANDS.add(flag)
+        return func
+    return register
+
+
+@command("-s", "--search")
+def run_search(args):
+    from features.search_anime import search_anime
+    search_anime()
+
+
+@command("-rcm", "--recommend")
+def run_recommend(args):
+    from features.rcm_system import recommend_anime
+    recommend_anime()
+
+
+@command("-a", "--add", remote=True)
+def run_add(args):
+    if args:
+        from features.watch_list import add_to_watchlist_func
+        anime_title = ' '.join(args)
+        print(add_to_watchlist_func(anime_title))
+    else:
+        print("Please provide an anime title to add.")
+
+
+@command("-u", "--update")
+def run_update(args):
+    from features.watch_list import update_watchlist
+    update_watchlist()
+
+
+@command("-l", "--list", "-ls", remote=True)
+def run_list(args):
+    from features.watch_list import list_watchlist
+    list_watchlist()
+
+
+@command("-c", "--chat")
+def run_chat(args):
+    from features.chat import chat_with_bot
+    chat_with_bot()
+
+
+@command("-w", "--watch")
+def run_watch(args):
+    import subprocess
+    from features.watch_anime import watch_anime
+    # Ani-cli package check
+    try:
+        subprocess.run(["ani-cli", "--version"], check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    except (subprocess.CalledProcessError, FileNotFoundError):
+        print("Error: 'ani-cli' is not installed or not found in PATH. Please install it from:  https://github.com/pystardust/ani-cli")
+    if args:
+        watch_anime(' '.join(args))
+    else:
+        print("Please provide an anime title to watch.")
+
+
+@command("-r", "--read")
+def run_read(args):
+    from features.read_light_novel import read_light_novel
+    read_light_novel()
+
+
+@command("-g", "--genre")
+def run_genre(args):
+    from simple_term_menu import TerminalMenu
+    from features.genre_manager import add_genre, remove_genre, list_genres, clear_genres
+    choice = ["Add Genre", "Remove Genre", "List Genres", "Clear All Genres", "Exit"]
+    terminal_menu = TerminalMenu(choice)
+    choice_index = terminal_menu.show()
+    print(f"You selected: {choice[choice_index]}")
+    if choice[choice_index] == "Add Genre":
+        add_genre()
+    elif choice[choice_index] == "Remove Genre":
+        remove_genre()
+    elif choice[choice_index] == "List Genres":
+        list_genres()
+    elif choice[choice_index] == "Clear All Genres":
+        run = True
+        while run:
+            confirm_choice = input("Are you sure you want to clear all genres? (Y/n): ").strip().lower()
+            if confirm_choice == 'y' or confirm_choice == '':
+                clear_genres()
+                run = False
+            elif confirm_choice == 'n' or confirm_choice == 'no':
+                run = False
+            else:
+                print("Operation cancelled.")
+    elif choice[choice_index] == "Exit":
+        return
+
 
+@command("--sync-catalog", remote=True)
+def run_sync_catalog(args):
+    from features.catalog_index import sync_catalog, catalog_size
+    full = "--full" in args
+    print("Syncing the local anime catalog from AniList...")
+    try:
+        stored = sync_catalog(full=full)
+    except Exception as e:
+        print(f"Catalog sync failed: {e}")
+        return
+    print(f"Updated {stored} entries. The catalog now holds {catalog_size()} anime.")
 
 
+@command("--backfill", remote=True)
+def run_backfill(args):
+    from features.enrich import backfill
+    print("Looking up AniList metadata for watchlist and readlist entries...")
+    for name, updated in backfill().items():
+        print(f"{name}: {updated} entries updated.")
+
+
+@command("--import", remote=True)
+def run_import(args):
+    from features.list_import import import_lists
+    if not args:
+        print("Please provide a MyAnimeList XML (.xml or .xml.gz) or AniList JSON export to import.")
+        return
+    path = ' '.join(args)
+    try:
+        results = import_lists(path)
+    except (OSError, ValueError, SyntaxError) as e:
+        # A malformed export rolls back the whole import.
+        print(f"Import failed: {e}")
+        return
+    if not results:
+        print("No list entries found in the export.")
+    for name, (read, added) in results.items():
+        print(f"{name}: imported {added} of {read} entries ({read - added} already on the list).")
+
+
+@command("--daemon")
+def run_daemon(args):
+    from features.daemon import serve
+    serve(COMMANDS, REMOTE_COMMANDS)
+
+
+@command("-h", "--help", remote=True)
+def run_help(args):
+    print("usage: python main.py [command]")
+    print("operations:")
+    print("       -s, --search <anime>       Search for an anime")
+    print("       -rcm, --recommend <anime>  Get anime recommendations")
+    print("       -a, --add <anime>          Add an anime to your watchlist")
+    print("       -u, --update <anime>       Update your watchlist(not working yet)")
+    print("       -l, --list, -ls            List your watchlist")
+    print("       -c, --chat                 Chat with the bot")
+    print("       -w, --watch <anime>        Watch an anime")
+    print("       -r, --read <light novel>   Read a light novel")
+    print("       -g, --genre                Manage your preferred genres")
+    print("       --sync-catalog [--full]    Download/refresh the local anime catalog")
+    print("       --backfill                 Store AniList ids/genres for existing list entries")
+    print("       --import <file>            Import a MyAnimeList XML or AniList JSON export")
+    print("       --daemon                   Keep a background process warm for faster -a/-l")
+    print("       -h, --help                 Show this help message")
+    print("global options:")
+    print("       --profile                  Print a timing breakdown per phase")
+    print("       --trace <file>             Write a Chrome trace (JSON) of the run")
+    print("       --cprofile <file>          Write cProfile stats of the run\n")
+    print("Example: python main.py -s Silent Witch")
+
+
+def start_chat_warmup():
+    """Prepares the chat session on a background thread while the user types.
+
+    Importing the Gemini SDK, configuring it, loading the history and the
+    opening exchange with the model all run here instead of after the first
+    prompt. Returns the thread and a dict that receives the session (or the
+    error, or a message for the user when chat isn't set up) once it is done;
+    nothing is printed from the thread.
+    """
+    result = {}
+
+    def warm_up():
+        started = time.perf_counter()
+        try:
+            from features import chat
+            try:
+                result["session"] = chat.prepare_chat(echo=False)
+            except chat.MissingApiKeyError as e:
+                result["message"] = str(e)
+        except Exception as e:
+            result["error"] = e
+        result["ms"] = round((time.perf_counter() - started) * 1000)
+
+    # A daemon thread, so Ctrl-C at the prompt doesn't wait for the model.
+    thread = threading.Thread(target=warm_up, daemon=True)
+    thread.start()
+    return thread, result
+
+
+def pop_profile_flags(argv):
+    """Removes the global --profile, --trace FILE and --cprofile FILE flags from argv.
+
+    Returns the remaining arguments and a dict of the profiling options given.
+    """
+    rest, options = [], {}
+    args = iter(argv)
+    for arg in args:
+        if arg == "--profile":
+            options["profile"] = True
+        elif arg in ("--trace", "--cprofile"):
+            path = next(args, None)
+            if path is None:
+                print(f"{arg} needs a file name.")
+                continue
+            options[arg[2:]] = path
+        else:
+            rest.append(arg)
+    return rest, options
 
 
 def main():
     """
     Main function to handle command-line arguments.
     """
+    args, profile_options = pop_profile_flags(sys.argv[1:])
+    # Commands such as -s still read their arguments from sys.argv.
+    sys.argv = sys.argv[:1] + args
+    if not profile_options:
+        run(args)
+        return
 
-    if len(sys.argv) > 1:
-        command = sys.argv[1]
-        if command == "-s" or command == "--search":
-            search_anime()
-        elif command == "-rcm" or command == "--recommend":
-            recommend_anime()
-        elif command == "-a" or command == "--add":
-            if len(sys.argv) > 2:
-                anime_title = ' '.join(sys.argv[2:])
-                print(add_to_watchlist_func(anime_title))
-            else:
-                print("Please provide an anime title to add.")
-        elif command == "-u" or command == "--update":
-            update_watchlist()
-        elif command == "-l" or command == "--list" or command == "-ls":
-            list_watchlist()
-        elif command == "-c" or command == "--chat":
-            chat_with_bot()
-        elif command == "-w" or command == "--watch":
-            # Ani-cli package check
-            try:
-                subprocess.run(["ani-cli", "--version"], check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-            except (subprocess.CalledProcessError, FileNotFoundError):
-                print("Error: 'ani-cli' is not installed or not found in PATH. Please install it from:  https://github.com/pystardust/ani-cli")
-            if len(sys.argv) > 2:
-                watch_anime(' '.join(sys.argv[2:]))
-            else:
-                print("Please provide an anime title to watch.")
-        elif command == "-r" or command == "--read":
-            read_light_novel()
-        elif command == "-g" or command == "--genre":
-            choice = ["Add Genre", "Remove Genre", "List Genres", "Clear All Genres", "Exit"]
-            terminal_menu = TerminalMenu(choice)
-            choice_index = terminal_menu.show()
-            print(f"You selected: {choice[choice_index]}")
-            if choice[choice_index] == "Add Genre":
-                add_genre()
-            elif choice[choice_index] == "Remove Genre":
-                remove_genre()
-            elif choice[choice_index] == "List Genres":
-                list_genres()
-            elif choice[choice_index] == "Clear All Genres":
-                run = True
-                while run:
-                    confirm_choice = input("Are you sure you want to clear all genres? (Y/n): ").strip().lower()
-                    if confirm_choice == 'y' or confirm_choice == '':
-                        clear_genres()
-                        run = False
-                    elif confirm_choice == 'n' or confirm_choice == 'no':
-                        run = False
-                    else:
-                        print("Operation cancelled.")
-                        
-            elif choice[choice_index] == "Exit":
-                return
-        elif command == "-h" or command == "--help":
-            print("usage: python main.py [command]")
-            print("operations:")
-            print("       -s, --search <anime>       Search for an anime")
-            print("       -rcm, --recommend <anime>  Get anime recommendations")
-            print("       -a, --add <anime>          Add an anime to your watchlist")
-            print("       -u, --update <anime>       Update your watchlist(not working yet)")
-            print("       -l, --list, -ls            List your watchlist")    
-            print("       -c, --chat                 Chat with the bot")
-            print("       -w, --watch <anime>        Watch an anime")
-            print("       -r, --read <light novel>   Read a light novel")
-            print("       -h, --help                 Show this help message\n")
-            print("Example: python main.py -s Silent Witch")
+    from features import profiling
+    profiling.enable(cprofile="cprofile" in profile_options)
+    try:
+        with profiling.span("main", argv=" ".join(args)):
+            # A profiled run has to execute in this process to be measured.
+            run(args, use_daemon=False)
+    finally:
+        profiling.disable()
+        if profile_options.get("profile"):
+            profiling.report()
+        if "trace" in profile_options:
+            profiling.write_trace(profile_options["trace"])
+            print(f"Trace written to {profile_options['trace']} (open it in chrome://tracing or Perfetto).", file=sys.stderr)
+        if "cprofile" in profile_options:
+            profiling.dump_cprofile(profile_options["cprofile"])
+            print(f"cProfile stats written to {profile_options['cprofile']}.", file=sys.stderr)
 
-        else:
+
+def run(args, use_daemon=True):
+    """Runs one command line (without the global profiling flags)."""
+    if args:
+        command = args[0]
+        handler = COMMANDS.get(command)
+        if handler is None:
             print(f"Unknown command: {command}")
+            return
+        if command in REMOTE_COMMANDS and use_daemon:
+            from features.daemon import forward
+            if forward(args):
+                return
+        handler(args[1:])
     else:
         # Launch interactive TUI similar to gemini-cli
-        chat_with_bot(first_prompt=input("You: "))
+        thread, warmup = start_chat_warmup()
+        first_prompt = input("You: ")
+        submitted = time.perf_counter()
+        thread.join()
+        if "error" in warmup:
+            print(f"An error occurred: {warmup['error']}")
+            return
+        if "message" in warmup:
+            print(warmup["message"])
+            return
+        session = warmup["session"]
+        if os.environ.get("CHAT_SHOW_LATENCY"):
+            waited = round((time.perf_counter() - submitted) * 1000)
+            print(f"[latency] chat setup: {warmup['ms']} ms, waited {waited} ms after your first prompt "
+                  f"(saved {warmup['ms'] - waited} ms)")
+        from features.chat import chat_with_bot
+        chat_with_bot(first_prompt=first_prompt, session=session)
+
+
 if __name__ == "__main__":
     main()